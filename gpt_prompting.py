@@ -1,10 +1,14 @@
-import requests
 from dotenv import load_dotenv
 import os
+import sys
 import json
 
 load_dotenv()
 
+# Model calls go through the search engine's shared client (rate limits, retries, deadlines)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_eng"))
+from llm_client import llm_client, LLMError
+
 params = {
     "q": "Amazon UPC B0CW25XR5S",  # query to search
     "format": "json",
@@ -82,9 +86,6 @@ top_n = 1
 
 api_key = os.getenv("API_KEY")  # Replace with your actual key
 
-url = "https://api.openai.com/v1/chat/completions"
-headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-
 content = (
     "You are an environmental impact assessor. "
     "Always return evaluations using this format:\n\n"
@@ -103,18 +104,12 @@ text = "Sample text extracted from the product page."
 query = f"The url to the product is {documents[0]}\nThe contents of the site are as listed: {text}\n\
         Assess the product Amazon UPC B0CW25XR5S."
 
-data = {
-    "model": "gpt-4o-mini",  # Or "gpt-3.5-turbo"
-    "messages": [{"role": "system", "content": content}, {"role": "user", "content": query}],
-    "temperature": 0.7,
-}
-
-response = requests.post(url, headers=headers, json=data)
+messages = [{"role": "system", "content": content}, {"role": "user", "content": query}]
 
-if response.status_code == 200:
-    print(response.json()["choices"][0]["message"]["content"])
-else:
-    print("Error:", response.status_code, response.text)
+try:
+    print(llm_client.complete_sync(api_key, messages, "gpt-4o-mini", temperature=0.7))  # Or "gpt-3.5-turbo"
+except LLMError as e:
+    print("Error:", e.status, e)
 
 # {
 #   "id": "chatcmpl-abc123",
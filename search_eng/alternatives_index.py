@@ -0,0 +1,183 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import Counter
+
+import scoring
+from passages import tokenize
+
+
+# Similar assessed products needed before the recommendation web search is skipped
+ALTERNATIVES_MIN_MATCHES = int(os.getenv("ALTERNATIVES_MIN_MATCHES", 3))
+# Share of the best possible BM25 score a product title needs to count as similar
+ALTERNATIVES_MIN_SIMILARITY = float(os.getenv("ALTERNATIVES_MIN_SIMILARITY", 0.3))
+# Seconds between reloads from the assessment cache, which pick up products assessed by other workers
+ALTERNATIVES_RELOAD_INTERVAL = float(os.getenv("ALTERNATIVES_RELOAD_INTERVAL", 600))
+# Recommendations returned per product, like the LLM's ALT list
+MAX_ALTERNATIVES = 3
+
+logger = logging.getLogger(__name__)
+
+
+def product_scores(sub_metrics):
+    """
+    Returns the 0-100 default-weight category scores of a product and their mean, its product_score.
+    """
+    scores = scoring.score(sub_metrics, None)
+    return scores, sum(scores.values()) / len(scores)
+
+
+class AlternativesIndex:
+    """
+    In-memory BM25 index over the titles of every assessed product, with their default-weight scores.
+
+    Recommendations for a product are the best-scoring indexed products whose titles are similar to
+    its own, so they come with real assessments instead of LLM-invented scores, and most requests
+    no longer need a web search for alternatives. Products assessed by this process are added as
+    they are stored; the whole index is reloaded from the shared assessment cache every
+    reload_interval seconds to pick up the other workers' products.
+
+    Args:
+        cache (AssessmentCache): Store the index is loaded from. Only LLM-assessed entries with a "title" are indexed.
+        min_similarity (float, optional): Share of the best possible score a title needs to match.
+        reload_interval (float, optional): Seconds between reloads from the cache.
+        k1, b (float, optional): BM25 parameters.
+    """
+
+    def __init__(self, cache, min_similarity=ALTERNATIVES_MIN_SIMILARITY, reload_interval=ALTERNATIVES_RELOAD_INTERVAL,
+                 k1=1.5, b=0.75):
+        self.cache = cache
+        self.min_similarity = min_similarity
+        self.reload_interval = reload_interval
+        self.k1 = k1
+        self.b = b
+        self._products = {}
+        self._postings = {}
+        self._total_length = 0
+        self._loaded_at = None
+        self._reloading = None
+
+    def __len__(self):
+        return len(self._products)
+
+    def add(self, product_id, entry):
+        """
+        Indexes a product's title and scores, replacing an earlier version of the product.
+        """
+        title = entry.get("title")
+        if not title or "subMetrics" not in entry:
+            return
+        self._add(product_id, title, *product_scores(entry["subMetrics"]))
+
+    def _add(self, product_id, title, scores, overall):
+        self.remove(product_id)
+        terms = Counter(tokenize(title))
+        if not terms:
+            return
+        length = sum(terms.values())
+        self._products[product_id] = {"title": title, "length": length, "scores": scores, "overall": overall}
+        self._total_length += length
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[product_id] = count
+
+    def remove(self, product_id):
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+        self._total_length -= product["length"]
+        for term in set(tokenize(product["title"])):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def similar(self, title, exclude=None):
+        """
+        Returns the indexed products similar to a title, most similar first, as dicts with
+        "upc", "title", "scores" (per category) and "overall".
+        """
+        terms = Counter(tokenize(title))
+        n = len(self._products)
+        if not terms or not n:
+            return []
+        avg_length = self._total_length / n
+        query_length = sum(terms.values())
+
+        hits = Counter()
+        best = 0.0
+        for term, query_count in terms.items():
+            postings = self._postings.get(term)
+            # Words only the excluded product has, e.g. its own model number, cannot match anything
+            if not postings or len(postings) == (exclude in postings):
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            # The score a title made of exactly the query's words would get
+            best += query_count * idf * (self.k1 + 1) / (1 + self.k1 * (1 - self.b + self.b * query_length / avg_length))
+            for product_id, count in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._products[product_id]["length"] / avg_length)
+                hits[product_id] += query_count * idf * count * (self.k1 + 1) / (count + norm)
+
+        threshold = best * self.min_similarity
+        return [
+            {"upc": product_id, **{key: self._products[product_id][key] for key in ("title", "scores", "overall")}}
+            for product_id, score in hits.most_common()
+            if score >= threshold and product_id != exclude
+        ]
+
+    def recommend(self, similar, sub_metrics, fallback=()):
+        """
+        Picks up to MAX_ALTERNATIVES recommendations from similar products that score better than
+        the assessed product, best first, in the format of the LLM's ALT list. Gaps are filled from
+        fallback, e.g. the alternatives the LLM suggested.
+        """
+        _, own = product_scores(sub_metrics)
+        better = sorted((product for product in similar if product["overall"] > own), key=lambda p: -p["overall"])
+        recommendations = [
+            {
+                "product_name": product["title"],
+                "product_score": round(product["overall"]),
+                "reco_reason": "Already assessed: environmental {environmental:.0f}, social {social:.0f}, "
+                               "governance {governance:.0f} out of 100.".format(**product["scores"]),
+                "upc": product["upc"],
+            }
+            for product in better[:MAX_ALTERNATIVES]
+        ]
+        return recommendations + list(fallback)[:MAX_ALTERNATIVES - len(recommendations)]
+
+    def reload_if_due(self):
+        """
+        Starts a background reload from the cache when the index is older than reload_interval.
+        Must be called on the shared event loop; lookups keep using the current index meanwhile.
+        """
+        if self._reloading is not None:
+            return
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.reload_interval:
+            return
+        self._reloading = asyncio.ensure_future(self._reload())
+
+    async def _reload(self):
+        try:
+            loaded = await asyncio.get_running_loop().run_in_executor(None, self._load)
+            self._products, self._postings, self._total_length = (
+                loaded._products, loaded._postings, loaded._total_length
+            )
+            logger.info("Alternatives index loaded with %d products", len(self._products))
+        except Exception:
+            logger.exception("Could not load the alternatives index")
+        finally:
+            self._loaded_at = time.monotonic()
+            self._reloading = None
+
+    def _load(self):
+        # Built off the loop in a separate index, then swapped in whole
+        loaded = AlternativesIndex(self.cache, self.min_similarity, self.reload_interval, self.k1, self.b)
+        product_ids, scores = self.cache.catalog(include_stale=True).score([None])
+        rows = dict(zip(product_ids, scores[:, 0].tolist()))
+        for product_id, entry in self.cache.items(include_stale=True):
+            if entry.get("title") and product_id in rows and not entry.get("provisional"):
+                category_scores = dict(zip(scoring.CATEGORIES, rows[product_id]))
+                loaded._add(product_id, entry["title"], category_scores, sum(category_scores.values()) / len(category_scores))
+        return loaded
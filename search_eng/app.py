@@ -1,199 +1,635 @@
 import os
-import re
 import json
+import asyncio
+import hashlib
+import logging
 from datetime import datetime, timezone
-import requests
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-
-from get_documents import get_documents
-
-
-def get_assessment_from_openai(api_key, product_id, custom_weights):
-    """
-    Calls OpenAI for a detailed ESG score AND recommendations, then parses the response.
-    """
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-
-    content = (
-        "You are an expert ESG (Environmental, Social, Governance) assessor. Analyze the product from the given text "
-        "and provide a detailed score breakdown. For each metric, provide a score from 1 (low) to 10 (high). "
-        "For 'Fair Labour', answer with 'yes' or 'no'.\n"
-        "RETURN YOUR EVALUATION USING THIS EXACT FORMAT:\n\n"
-        "## Environmental Score ##\n"
-        "- Greenhouse Gas Emissions: {score/10}\n"
-        "- Material Sustainability: {score/10}\n"
-        "- Water Usage: {score/10}\n"
-        "- Packaging impact: {score/10}\n"
-        "- End of Life Disposal: {score/10}\n\n"
-        "## Social Score ##\n"
-        "- Fair Labour (yes/no): {yes/no}\n"
-        "- Worker Safety: {score/10}\n"
-        "- Fair Trade: {score/10}\n"
-        "- Local Sourcing: {score/10}\n"
-        "- Community Impact: {score/10}\n"
-        "- User Health and Safety: {score/10}\n\n"
-        "## Governance Score ##\n"
-        "- Affordability/Value: {score/10}\n"
-        "- Circular Economy Fit: {score/10}\n"
-        "- Local Economic Impact: {score/10}\n"
-        "- Supply Chain Resilience: {score/10}\n"
-        "- Innovation/R&D: {score/10}\n\n"
-        "After the scores, list up to 3 sustainable alternative products as a JSON-compatible list of objects, starting with 'ALT:'. "
-        "The product_score for these alternatives must be out of 100.\n"
-        'Example: ALT: [{"product_name": "<item>", "product_score": 90, "reco_reason": "<reason>"}]'
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+
+import async_runtime
+from get_documents import get_documents_async, search, fetch_texts, page_cache
+from http_session import close_session
+from assessment_cache import AssessmentCache
+from single_flight import SingleFlight
+from alternatives_index import AlternativesIndex, ALTERNATIVES_MIN_MATCHES
+from response_archive import ResponseArchive
+from surrogate import load_surrogate
+from passages import select_passages
+from llm_batcher import LLMBatcher
+from llm_client import llm_client, LLMError, LLMDeadlineError
+from deadline import Deadline
+from refresh_worker import RefreshWorker
+import scoring
+from assessment_parser import parse_assessment, follow_up_prompt, RESPONSE_FORMAT, ASSESSMENT_EXAMPLE
+import metrics
+from metrics import stage_seconds, stage_errors, cache_requests
+from log_utils import configure_logging, sampled
+
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = (
+    "You are an expert ESG (Environmental, Social, Governance) assessor. Analyze the product from the given text "
+    "and provide a detailed score breakdown. For each metric, provide a score from 1 (low) to 10 (high). "
+    "For 'Fair Labour', answer with 'yes' or 'no'.\n"
+    "RETURN YOUR EVALUATION USING THIS EXACT FORMAT:\n\n"
+    "## Environmental Score ##\n"
+    "- Greenhouse Gas Emissions: {score/10}\n"
+    "- Material Sustainability: {score/10}\n"
+    "- Water Usage: {score/10}\n"
+    "- Packaging impact: {score/10}\n"
+    "- End of Life Disposal: {score/10}\n\n"
+    "## Social Score ##\n"
+    "- Fair Labour (yes/no): {yes/no}\n"
+    "- Worker Safety: {score/10}\n"
+    "- Fair Trade: {score/10}\n"
+    "- Local Sourcing: {score/10}\n"
+    "- Community Impact: {score/10}\n"
+    "- User Health and Safety: {score/10}\n\n"
+    "## Governance Score ##\n"
+    "- Affordability/Value: {score/10}\n"
+    "- Circular Economy Fit: {score/10}\n"
+    "- Local Economic Impact: {score/10}\n"
+    "- Supply Chain Resilience: {score/10}\n"
+    "- Innovation/R&D: {score/10}\n\n"
+    "After the scores, list up to 3 sustainable alternative products as a JSON-compatible list of objects, starting with 'ALT:'. "
+    "The product_score for these alternatives must be out of 100.\n"
+    'Example: ALT: [{"product_name": "<item>", "product_score": 90, "reco_reason": "<reason>"}]'
+)
+
+# Structured output asks the model for JSON matching assessment_parser.ASSESSMENT_SCHEMA
+STRUCTURED_SYSTEM_PROMPT = (
+    "You are an expert ESG (Environmental, Social, Governance) assessor. Analyze the product from the given text "
+    "and return a JSON object with a score from 1 (low) to 10 (high) for every environmental, social and governance "
+    "metric in the schema, 'yes' or 'no' for fair labour (social.labour), and up to 3 sustainable alternative products "
+    "in 'alternatives' with a product_score out of 100."
+)
+
+OPENAI_MODEL = "gpt-4o-mini"
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "false").lower() in ("1", "true", "yes")
+# Approximate token budgets for the retrieved text sent to the LLM
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 2000))
+RECOMMENDATION_TOKEN_BUDGET = int(os.getenv("RECOMMENDATION_TOKEN_BUDGET", 600))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 100))
+# Seconds of a request deadline kept for the LLM call (at most half the deadline), and the least
+# retrieval time left after the product search for the optional recommendation search and extra pages
+DEADLINE_LLM_RESERVE = float(os.getenv("DEADLINE_LLM_RESERVE", 8))
+DEADLINE_OPTIONAL_MIN = float(os.getenv("DEADLINE_OPTIONAL_MIN", 3))
+# Keep every raw completion so assessments can be re-parsed and re-scored offline (see rescore.py)
+RESPONSE_ARCHIVE = os.getenv("RESPONSE_ARCHIVE", "true").lower() in ("1", "true", "yes")
+# Expired assessments up to this many seconds old are served while a background refresh runs
+ASSESSMENT_MAX_STALE = float(os.getenv("ASSESSMENT_MAX_STALE", 90 * 24 * 3600))
+
+# Sub-metric scores only depend on the product, so they are cached per ASIN and re-weighted per request
+assessment_cache = AssessmentCache()
+# Concurrent requests for the same product share one retrieval and LLM call, also across workers
+assessment_flights = SingleFlight(assessment_cache)
+# Recommendations come from similar products that were already assessed, when there are enough of them
+alternatives_index = AlternativesIndex(assessment_cache)
+response_archive = ResponseArchive() if RESPONSE_ARCHIVE else None
+# Local estimate of the sub-metrics for provisional answers and LLM outages (see train_surrogate.py)
+surrogate_model = load_surrogate()
+
+
+async def complete_chat(api_key, messages, response_format=None, deadline=None):
+    """
+    Sends one chat completion request through the shared LLM client and returns the reply text.
+    """
+    return await llm_client.complete(api_key, messages, OPENAI_MODEL, response_format=response_format, deadline=deadline)
+
+
+async def complete_structured_chat(api_key, messages, deadline=None):
+    return await complete_chat(api_key, messages, RESPONSE_FORMAT, deadline)
+
+
+def is_complete_assessment(assessment_text):
+    return not parse_assessment(assessment_text).missing
+
+
+# Optionally groups concurrent assessments into multi-product completions (see LLM_BATCH_WINDOW_MS).
+# Multi-product replies hold one JSON object per section, so they are requested without the schema,
+# and the prompt spells out the keys the schema would have enforced.
+if LLM_STRUCTURED_OUTPUT:
+    llm_batcher = LLMBatcher(
+        complete_structured_chat, STRUCTURED_SYSTEM_PROMPT, is_complete_assessment, complete_batch=complete_chat,
+        batch_system_prompt=f"{STRUCTURED_SYSTEM_PROMPT}\nUse exactly these keys, with numbers for the scores: {ASSESSMENT_EXAMPLE}",
     )
+else:
+    llm_batcher = LLMBatcher(complete_chat, SYSTEM_PROMPT, is_complete_assessment)
+
+
+def fingerprint_prompt(messages, model):
+    """
+    Hashes the model and the whitespace-normalized prompt so identical retrieved text can be recognized.
+    """
+    digest = hashlib.sha256(model.encode("utf-8"))
+    for message in messages:
+        digest.update(b"\0")
+        digest.update(" ".join(message["content"].split()).encode("utf-8"))
+    return digest.hexdigest()
+
 
-    # get documents from search engine
-    urls, titles, text_docs = get_documents(product_id, top_n = 2)
-    urls_rec, titles_rec, text_docs_rec = get_documents(titles[0], top_n = 2, get_recommendations = True)
-    document_url = f"https://www.amazon.com/dp/{product_id}"
-    print(f"{"\n".join(text_docs)}")
-    query = f"{"\n".join(text_docs)}\nSource titles: {"\n".join(titles)}\nRecommendation info: {"\n".join(text_docs_rec)}\nGiven the above text, assess the product."
-
-    data = {
-        "model": "gpt-4o-mini",
-        "messages": [{"role": "system", "content": content}, {"role": "user", "content": query}],
-        "temperature": 0.3,
+def build_entry(sub_metrics, recommendations, title, fingerprint, skipped, fetched_at=None):
+    """
+    Builds the weight-independent assessment entry that is cached per product.
+    """
+    return {
+        "subMetrics": sub_metrics,
+        "recommendations": recommendations,
+        "title": title,
+        "source": f"openai-{OPENAI_MODEL}",
+        "fetchedAt": fetched_at or datetime.now(timezone.utc).isoformat(),
+        "fingerprint": fingerprint,
+        "skipped": skipped,
     }
 
+
+def provisional_entry(query, title, similar, skipped):
+    """
+    Builds a provisional entry from the surrogate model's estimate of the sub-metrics.
+    It has no fingerprint, so the next assessment of the product always asks the LLM.
+    """
+    with stage_seconds.time(stage="surrogate"):
+        sub_metrics = surrogate_model.predict(query)
+    recommendations = alternatives_index.recommend(similar, sub_metrics) if similar else []
+    return {**build_entry(sub_metrics, recommendations, title, None, skipped), "source": "surrogate", "provisional": True}
+
+
+async def no_documents():
+    return [], [], []
+
+
+async def request_sub_metrics(api_key, product_id, deadline=None, on_provisional=None):
+    """
+    Retrieves documents for a product, asks OpenAI for the ESG breakdown and parses it.
+    Runs on the shared loop; independent retrieval steps run concurrently.
+
+    With a deadline, part of it is kept for the LLM call and retrieval has to fit in the rest.
+    The recommendation search and extra product pages are dropped when too little time is left
+    for them, and the prompt is cut to its most relevant passages when the LLM would be short
+    of time. Whatever was dropped is listed under "skipped".
+
+    Recommendations are the better-scoring similar products of the alternatives index; the web
+    search for alternatives only runs when the index has fewer than ALTERNATIVES_MIN_MATCHES of them.
+
+    With a surrogate model, on_provisional is called with its estimate as soon as the text is
+    retrieved, and the estimate is returned instead of an error when the LLM is unavailable or
+    out of time, with "llm" under "skipped".
+
+    Returns:
+        dict: Weight-independent assessment with "subMetrics" (scores keyed like scoring.DEFAULT_WEIGHTS),
+              "recommendations", "title", "source", "fetchedAt" and "skipped", or a dict with an "error" key.
+    """
+    deadline = deadline or Deadline()
+    # A product whose replies stayed incomplete a moment ago is not searched and asked again yet
+    if await async_runtime.run_blocking(page_cache.has_failed, "assessment", product_id):
+        cache_requests.inc(cache="assessment", result="negative")
+        return {
+            "upc": product_id,
+            "error": "The assessment is incomplete.",
+            "fetchedAt": datetime.now(timezone.utc).isoformat(),
+            "recommendations": [],
+        }
+    retrieval = Deadline(deadline.timeout(reserve=min(DEADLINE_LLM_RESERVE, deadline.remaining() / 2)))
+    skipped = []
+
+    # get documents from search engine. The recommendation search only needs the product title,
+    # so it starts as soon as the search returns and overlaps with the product page downloads.
+    alternatives_index.reload_if_due()
+    urls, titles = await search(product_id, top_n = 2, deadline = retrieval)
+    # Without search results there is nothing to assess (or SearxNG is unavailable)
+    if not titles:
+        return {
+            "upc": product_id,
+            "error": "The product search did not finish in time." if retrieval.expired() else "No search results found for the product.",
+            "fetchedAt": datetime.now(timezone.utc).isoformat(),
+            "recommendations": [],
+        }
+
+    # Already assessed similar products make the recommendation search unnecessary
+    similar = alternatives_index.similar(titles[0], exclude=product_id)
+    search_alternatives = len(similar) < ALTERNATIVES_MIN_MATCHES
+    cache_requests.inc(cache="alternatives", result="miss" if search_alternatives else "hit")
+
+    # Optional retrieval only starts if there is time for it, and whatever misses the deadline comes back empty
+    optional = retrieval.remaining() >= DEADLINE_OPTIONAL_MIN
+    if not optional and len(urls) > 1:
+        urls = urls[:1]
+        skipped.append("extraPages")
+    text_docs, (urls_rec, titles_rec, text_docs_rec) = await asyncio.gather(
+        fetch_texts(urls, deadline = retrieval),
+        get_documents_async(titles[0], top_n = 2, get_recommendations = True, deadline = retrieval)
+        if optional and search_alternatives else no_documents(),
+    )
+    if retrieval.expired():
+        if len(text_docs) > 1 and not all(text_docs[1:]) and "extraPages" not in skipped:
+            skipped.append("extraPages")
+        if search_alternatives and not any(text_docs_rec):
+            skipped.append("recommendations")
+    elif search_alternatives and not optional:
+        skipped.append("recommendations")
+
+    # Only the passages most relevant to the assessment go into the prompt. A smaller prompt
+    # when the LLM is short of time.
+    prompt_budget, recommendation_budget = PROMPT_TOKEN_BUDGET, RECOMMENDATION_TOKEN_BUDGET
+    if deadline.remaining() < DEADLINE_LLM_RESERVE:
+        prompt_budget, recommendation_budget = prompt_budget // 2, recommendation_budget // 2
+        skipped.append("longPassages")
+    loop = asyncio.get_running_loop()
+    with stage_seconds.time(stage="passages"):
+        document_text, recommendation_text = await asyncio.gather(
+            loop.run_in_executor(None, select_passages, text_docs, titles[0], prompt_budget),
+            loop.run_in_executor(None, select_passages, text_docs_rec, titles[0], recommendation_budget),
+        )
+    title_text = "\n".join(titles)
+    if sampled(logger):
+        logger.debug("Selected passages for %s:\n%s", product_id, document_text)
+    query = f"{document_text}\nSource titles: {title_text}\nRecommendation info: {recommendation_text}\nGiven the above text, assess the product."
+
+    # Most pages barely change between refreshes. If the prompt is the same as for the previous
+    # assessment, its scores are reused instead of asking the LLM again.
+    fingerprint = fingerprint_prompt(llm_batcher.single_messages(query), OPENAI_MODEL)
+    previous = await async_runtime.run_blocking(assessment_cache.get, product_id, include_stale=True)
+    if previous is not None and previous.get("fingerprint") == fingerprint:
+        logger.info("Retrieved text unchanged for %s, reusing previous assessment", product_id)
+        # What this run skipped decides whether the reused entry is partial, not what the previous one skipped
+        previous = {**previous, "skipped": skipped}
+        if not search_alternatives:
+            previous = {**previous, "recommendations": alternatives_index.recommend(similar, previous["subMetrics"])}
+        return previous
+
+    if surrogate_model is not None and on_provisional is not None:
+        on_provisional(provisional_entry(query, titles[0], similar, list(skipped)))
+
+    # query llm given documents
     try:
-        # query llm given documents
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        assessment_text = response.json()["choices"][0]["message"]["content"]
-        print(assessment_text, "CHECK THIS")
-
-        if "do not have access" in assessment_text.lower() or "cannot access" in assessment_text.lower():
-            return {
-                "upc": product_id,
-                "error": "AI model cannot access external websites to assess the product.",
-                "fetchedAt": datetime.now(timezone.utc).isoformat(),
-                "recommendations": [],
-            }
-        
-        def parse_score(pattern, text, default=0):
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                score_str = match.group(1).split('/')[0].strip()
-                return int(score_str)
-            return default
-
-        # Parsing logic for various components of esg standard reporting
-        ghg_emissions = parse_score(r"Greenhouse Gas Emissions:\s*([\d\.]+)", assessment_text)
-        material_sustainability = parse_score(r"Material Sustainability:\s*([\d\.]+)", assessment_text)
-        water_usage = parse_score(r"Water Usage:\s*([\d\.]+)", assessment_text)
-        packaging_impact = parse_score(r"Packaging impact:\s*([\d\.]+)", assessment_text)
-        end_of_life = parse_score(r"End of Life Disposal:\s*([\d\.]+)", assessment_text)
-        fair_labour_match = re.search(r"Fair Labour \(yes/no\):\s*(yes|no)", assessment_text, re.IGNORECASE)
-        fair_labour = 10 if fair_labour_match and fair_labour_match.group(1).lower() == 'yes' else 1
-        worker_safety = parse_score(r"Worker Safety:\s*([\d\.]+)", assessment_text)
-        fair_trade = parse_score(r"Fair Trade:\s*([\d\.]+)", assessment_text)
-        local_sourcing = parse_score(r"Local Sourcing:\s*([\d\.]+)", assessment_text)
-        community_impact = parse_score(r"Community Impact:\s*([\d\.]+)", assessment_text)
-        user_health = parse_score(r"User Health and Safety:\s*([\d\.]+)", assessment_text)
-        affordability = parse_score(r"Affordability/Value:\s*([\d\.]+)", assessment_text)
-        circular_economy = parse_score(r"Circular Economy Fit:\s*([\d\.]+)", assessment_text)
-        local_economic_impact = parse_score(r"Local Economic Impact:\s*([\d\.]+)", assessment_text)
-        supply_chain_resilience = parse_score(r"Supply Chain Resilience:\s*([\d\.]+)", assessment_text)
-        innovation = parse_score(r"Innovation/R&D:\s*([\d\.]+)", assessment_text)
-        
-        # --- LOGIC TO USE CUSTOM OR DEFAULT WEIGHTS ---
-        default_weights = {
-            "environmental": {"ghg": 35, "material": 15, "water": 10, "packaging": 20, "eol": 20},
-            "social": {"labour": 10, "safety": 10, "trade": 20, "sourcing": 20, "community": 20, "health": 20},
-            "governance": {"affordability": 20, "circular": 25, "local": 30, "resilience": 15, "innovation": 10}
+        assessment_text = await llm_batcher.submit(api_key, query, deadline.timeout())
+    except (asyncio.TimeoutError, LLMError) as e:
+        if surrogate_model is not None:
+            logger.warning("LLM unavailable for %s (%s), answering with the surrogate estimate", product_id, str(e) or "timeout")
+            return provisional_entry(query, titles[0], similar, skipped + ["llm"])
+        if not isinstance(e, (asyncio.TimeoutError, LLMDeadlineError)):
+            raise
+        return {
+            "upc": product_id,
+            "error": "The assessment did not finish in time.",
+            "skipped": skipped,
+            "fetchedAt": datetime.now(timezone.utc).isoformat(),
+            "recommendations": [],
         }
-        env_weights = custom_weights.get("environmental", default_weights["environmental"])
-        soc_weights = custom_weights.get("social", default_weights["social"])
-        gov_weights = custom_weights.get("governance", default_weights["governance"])
-
-        # --- CALCULATIONS USE THE DYNAMIC WEIGHTS ---
-        environmental_score = (
-            (ghg_emissions * env_weights.get('ghg', 35) / 100) +
-            (material_sustainability * env_weights.get('material', 15) / 100) +
-            (water_usage * env_weights.get('water', 10) / 100) +
-            (packaging_impact * env_weights.get('packaging', 20) / 100) +
-            (end_of_life * env_weights.get('eol', 20) / 100)
-        ) * 10
-
-        social_score = (
-            (fair_labour * soc_weights.get('labour', 10) / 100) +
-            (worker_safety * soc_weights.get('safety', 10) / 100) +
-            (fair_trade * soc_weights.get('trade', 20) / 100) +
-            (local_sourcing * soc_weights.get('sourcing', 20) / 100) +
-            (community_impact * soc_weights.get('community', 20) / 100) +
-            (user_health * soc_weights.get('health', 20) / 100)
-        ) * 10
-        
-        governance_score = (
-            (affordability * gov_weights.get('affordability', 20) / 100) +
-            (circular_economy * gov_weights.get('circular', 25) / 100) +
-            (local_economic_impact * gov_weights.get('local', 30) / 100) +
-            (supply_chain_resilience * gov_weights.get('resilience', 15) / 100) +
-            (innovation * gov_weights.get('innovation', 10) / 100)
-        ) * 10
-
-        # --- Recommendation parsing ---
-        recommendations = []
-        alt_match = re.search(r"ALT:\s*(\[.*?\])", assessment_text, re.DOTALL | re.IGNORECASE)
-        if alt_match:
-            try:
-                reco_json_str = alt_match.group(1)
-                recommendations = json.loads(reco_json_str)
-                for reco in recommendations:
-                    if 'product_score' in reco and isinstance(reco['product_score'], (int, float)) and reco['product_score'] <= 10:
-                        reco['product_score'] *= 10
-            except json.JSONDecodeError as e:
-                print(f"Error decoding recommendations JSON: {e}")
-                recommendations = []
-        
-        # --- Build final JSON object ---
-        formatted_data = {
+    if sampled(logger):
+        logger.debug("LLM reply for %s:\n%s", product_id, assessment_text)
+    # Archived before parsing, so replies the current parser rejects can be recovered by a later one
+    if response_archive is not None:
+        try:
+            await async_runtime.run_blocking(
+                response_archive.append, product_id, assessment_text, query, fingerprint, title=titles[0], skipped=skipped
+            )
+        except Exception:
+            logger.exception("Could not archive the LLM reply for %s", product_id)
+
+    if "do not have access" in assessment_text.lower() or "cannot access" in assessment_text.lower():
+        return {
+            "upc": product_id,
+            "error": "AI model cannot access external websites to assess the product.",
+            "fetchedAt": datetime.now(timezone.utc).isoformat(),
+            "recommendations": [],
+        }
+
+    with stage_seconds.time(stage="parse"):
+        parsed = parse_assessment(assessment_text)
+
+    # Gaps are asked for once, in the same conversation, instead of redoing the whole assessment
+    if parsed.missing and not deadline.expired():
+        logger.info("LLM reply for %s is missing %s, asking for them", product_id, ", ".join(parsed.missing))
+        messages = llm_batcher.single_messages(query) + [
+            {"role": "assistant", "content": str(assessment_text)},
+            {"role": "user", "content": follow_up_prompt(parsed.missing)},
+        ]
+        try:
+            follow_up = await complete_chat(api_key, messages, deadline=deadline.timeout())
+        except (asyncio.TimeoutError, LLMError) as e:
+            logger.warning("Follow-up for %s failed: %s", product_id, str(e) or "timeout")
+        else:
+            if response_archive is not None:
+                try:
+                    await async_runtime.run_blocking(
+                        response_archive.append, product_id, assessment_text, query, fingerprint,
+                        title=titles[0], skipped=skipped, followUp=str(follow_up),
+                    )
+                except Exception:
+                    logger.exception("Could not archive the LLM follow-up for %s", product_id)
+            with stage_seconds.time(stage="parse"):
+                parsed = parse_assessment(assessment_text, follow_up)
+
+    # An incomplete reply is reported and never cached, instead of zero-filling the gaps. The
+    # product is remembered for the negative TTL, so repeated views do not pay for it again.
+    if parsed.missing:
+        stage_errors.inc(stage="parse")
+        logger.warning("LLM reply for %s is missing %s", product_id, ", ".join(parsed.missing))
+        await async_runtime.run_blocking(page_cache.set_failed, "assessment", product_id)
+        return {
             "upc": product_id,
-            "environmentalScore": round(environmental_score),
-            "socialScore": round(social_score),
-            "governanceScore": round(governance_score),
-            "source": "openai-gpt-4o-mini",
+            "error": "The assessment is incomplete.",
+            "missingFields": parsed.missing,
             "fetchedAt": datetime.now(timezone.utc).isoformat(),
-            "recommendations": recommendations,
+            "recommendations": [],
         }
-        print("Formatted data:", json.dumps(formatted_data, indent=2))
+
+    recommendations = parsed.recommendations
+    if similar:
+        recommendations = alternatives_index.recommend(similar, parsed.sub_metrics, fallback=recommendations)
+
+    return build_entry(parsed.sub_metrics, recommendations, titles[0], fingerprint, skipped)
+
+
+async def refresh_assessment(product_id, api_key):
+    """
+    Re-assesses a product whose cached entry has expired. Runs on the refresh worker.
+    """
+    entry = await assessment_flights.do(product_id, lambda: request_and_cache_sub_metrics(api_key, product_id))
+    if "error" in entry:
+        raise RuntimeError(entry["error"])
+
+
+# Stale products are refreshed in the background, most requested first
+refresh_worker = RefreshWorker(refresh_assessment)
+
+
+async def lookup_assessment(api_key, product_id):
+    """
+    Returns (entry, age in seconds, stale) from the assessment cache, or (None, None, False) on a miss.
+
+    An expired or partial entry is still returned as stale, and its product queued for a background
+    refresh, unless it is older than ASSESSMENT_MAX_STALE. Must be called on the shared event loop.
+    """
+    entry, age, partial = await async_runtime.run_blocking(assessment_cache.get_with_age, product_id)
+    if entry is None:
+        result = "miss"
+    elif age <= assessment_cache.ttl and not partial:
+        result = "hit"
+    elif age <= ASSESSMENT_MAX_STALE:
+        result = "stale"
+        refresh_worker.enqueue(product_id, api_key)
+    else:
+        result = "miss"
+        entry, age = None, None
+    cache_requests.inc(cache="assessment", result=result)
+    return entry, age, result == "stale"
+
+
+async def request_and_cache_sub_metrics(api_key, product_id, deadline=None, on_provisional=None):
+    """
+    Requests sub-metrics for a product and stores them in the assessment cache unless they are an error.
+    Storing a reused entry again resets its freshness. Partial entries, with work skipped for the
+    deadline, are stored as partial so they are served as stale while a full refresh runs. A
+    surrogate estimate, answered when the LLM failed, is only stored for a product with no LLM
+    assessment yet; a failed refresh leaves the previous assessment in place.
+    """
+    entry = await request_sub_metrics(api_key, product_id, deadline, on_provisional)
+    if "error" in entry:
+        return entry
+    if entry.get("provisional"):
+        previous = await async_runtime.run_blocking(assessment_cache.get, product_id, include_stale=True)
+        if previous is None or previous.get("provisional"):
+            await async_runtime.run_blocking(assessment_cache.set, product_id, entry, partial=True)
+        return entry
+    await async_runtime.run_blocking(assessment_cache.set, product_id, entry, partial=bool(entry.get("skipped")))
+    alternatives_index.add(product_id, entry)
+    return entry
+
+
+def format_assessment(product_id, entry, custom_weights, age=None, scores=None, stale=False):
+    """
+    Builds the response for a product from its cached or freshly requested sub-metric entry.
+    Pass the cache age and staleness for cached entries, and scores when they were already
+    computed for several products at once.
+    """
+    # --- CALCULATIONS USE THE DYNAMIC WEIGHTS ---
+    if scores is None:
+        with stage_seconds.time(stage="score"):
+            scores = scoring.score(entry["subMetrics"], custom_weights)
+
+    # --- Build final JSON object ---
+    return {
+        "upc": product_id,
+        "environmentalScore": round(scores["environmental"]),
+        "socialScore": round(scores["social"]),
+        "governanceScore": round(scores["governance"]),
+        "source": entry["source"],
+        "fetchedAt": entry["fetchedAt"],
+        "cached": age is not None,
+        "stale": stale,
+        "ageSeconds": round(age) if age is not None else 0,
+        "recommendations": entry["recommendations"],
+        "skipped": entry.get("skipped", []),
+        "provisional": entry.get("provisional", False),
+    }
+
+
+async def assess_product(api_key, product_id, custom_weights, deadline=None, provisional=False, lookup=None):
+    """
+    Returns the weighted ESG assessment and recommendations for a product.
+
+    Sub-metric scores come from the assessment cache when present, even if expired (see
+    lookup_assessment); only a cache miss calls out to the search engine and OpenAI, within
+    the deadline. With provisional, a cache miss is answered with the surrogate model's estimate
+    as soon as the product text is retrieved, while the LLM assessment carries on and is cached
+    for the next request. The estimate is also the answer if the deadline passes first.
+    Callers that already looked the product up pass lookup_assessment's result as lookup.
+    """
+    deadline = deadline or Deadline()
+    try:
+        entry, age, stale = lookup if lookup is not None else await lookup_assessment(api_key, product_id)
+        cached = entry is not None
+        if not cached:
+            estimate = asyncio.get_running_loop().create_future()
+
+            def on_provisional(provisional_entry):
+                if not estimate.done():
+                    estimate.set_result(provisional_entry)
+
+            assessment = asyncio.ensure_future(asyncio.wait_for(
+                assessment_flights.do(
+                    product_id, lambda: request_and_cache_sub_metrics(api_key, product_id, deadline, on_provisional)
+                ),
+                deadline.timeout(),
+            ))
+            if provisional:
+                await asyncio.wait({assessment, estimate}, return_when=asyncio.FIRST_COMPLETED)
+            if provisional and not assessment.done():
+                # The assessment goes on without us; its outcome only matters for the cache
+                assessment.add_done_callback(lambda task: task.cancelled() or task.exception())
+                entry = estimate.result()
+            else:
+                try:
+                    entry = await assessment
+                except asyncio.TimeoutError:
+                    stage_errors.inc(stage="deadline")
+                    if not estimate.done():
+                        return {"upc": product_id, "error": "The assessment did not finish in time.", "recommendations": []}
+                    entry = {**estimate.result(), "skipped": estimate.result()["skipped"] + ["llm"]}
+            if "error" in entry:
+                return entry
+
+        formatted_data = format_assessment(product_id, entry, custom_weights, age, stale=stale)
+        if not cached:
+            logger.info("Assessed %s: E=%s S=%s G=%s", product_id, formatted_data["environmentalScore"],
+                        formatted_data["socialScore"], formatted_data["governanceScore"])
         return formatted_data
 
     except Exception as e:
-        print(f"An error occurred: {e}")
+        logger.exception("An error occurred while assessing %s: %s", product_id, e)
         return {"error": str(e), "recommendations": []}
 
-# --- Flask Server ---
-app = Flask(__name__)
-CORS(app)
+
+def get_assessment_from_openai(api_key, product_id, custom_weights, deadline=None, provisional=False):
+    """
+    Synchronous entry point for assess_product, for scripts running outside the server. The
+    pipeline runs on the shared event loop, so the calling thread only waits for the result.
+    """
+    return async_runtime.run(assess_product(api_key, product_id, custom_weights, deadline, provisional))
+
+
+async def assess_batch(api_key, product_ids, custom_weights, deadline=None):
+    """
+    Assesses several products with one set of weights and yields each result as soon as it is ready.
+
+    Cached products are yielded first without waiting for anything else. The remaining products
+    are assessed concurrently, at most BATCH_CONCURRENCY at a time, and yielded in completion order.
+    All of them share the batch's deadline, if any.
+    """
+    misses = []
+    hits = []
+    ages = {}
+    for product_id in product_ids:
+        entry, age, stale = await lookup_assessment(api_key, product_id)
+        if entry is None:
+            misses.append(product_id)
+        else:
+            hits.append((product_id, entry))
+            ages[product_id] = age, stale
+
+    # All cached products are scored in one matrix operation
+    if hits:
+        with stage_seconds.time(stage="score"):
+            _, scores = scoring.score_catalog(hits, [custom_weights])
+        for (product_id, entry), row in zip(hits, scores[:, 0]):
+            age, stale = ages[product_id]
+            yield format_assessment(product_id, entry, custom_weights, age, dict(zip(scoring.CATEGORIES, row.tolist())), stale)
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def assess_miss(product_id):
+        async with semaphore:
+            # Already counted and found missing above
+            result = await assess_product(api_key, product_id, custom_weights, deadline, lookup=(None, None, False))
+        result.setdefault("upc", product_id)
+        return result
+
+    tasks = [asyncio.create_task(assess_miss(product_id)) for product_id in misses]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# --- Quart Server ---
+# Handlers are coroutines on the shared loop, so requests waiting on the LLM hold no thread and
+# cache hits are answered straight away however many assessments are in flight
+app = cors(Quart(__name__))
+# Requests are bounded by their own deadlines; unbounded batches may stream for longer than a minute
+app.config["RESPONSE_TIMEOUT"] = None
+
+
+@app.before_serving
+async def start_runtime():
+    async_runtime.adopt_running_loop()
+
+
+@app.after_serving
+async def stop_runtime():
+    await close_session()
+
 
 @app.route("/api/assess", methods=["POST", "OPTIONS"])
-def handle_assessment_request():
+async def handle_assessment_request():
     if request.method == "OPTIONS":
         return jsonify({"status": "ok"}), 200
     
     if request.method == "POST":
-        data = request.get_json()
+        data = await request.get_json()
         if not data:
             return jsonify({"error": "Invalid JSON"}), 400
         
         # Correctly extracts 'upc' and 'weights' from the request body
         product_id = data.get("upc")
-        weights = data.get("weights", {}) 
 
         if not product_id:
             return jsonify({"error": "upc is missing"}), 400
+
+        try:
+            weights = scoring.normalize_weights(data.get("weights"))
+            deadline = Deadline.from_request(data.get("deadline"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         api_key = os.getenv("API_KEY")
         if not api_key:
             return jsonify({"error": "API_KEY is not set on the server"}), 500
         
-        # Correctly passes 'weights' to the assessment function
-        result = get_assessment_from_openai(api_key, product_id, weights)
+        # Correctly passes 'weights' to the assessment function. "provisional": true asks for the
+        # surrogate estimate straight away on a cache miss; ask again for the LLM assessment.
+        result = await assess_product(api_key, product_id, weights, deadline, data.get("provisional") is True)
         return jsonify(result)
 
+@app.route("/api/assess/batch", methods=["POST", "OPTIONS"])
+async def handle_batch_assessment_request():
+    if request.method == "OPTIONS":
+        return jsonify({"status": "ok"}), 200
+
+    data = await request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Invalid JSON"}), 400
+
+    product_ids = data.get("upcs")
+
+    if not isinstance(product_ids, list) or not product_ids:
+        return jsonify({"error": "upcs must be a non-empty list"}), 400
+    try:
+        weights = scoring.normalize_weights(data.get("weights"))
+        # Batches are only bounded when asked to, a page of products rarely fits the single-product default
+        deadline = Deadline.from_request(data["deadline"]) if data.get("deadline") is not None else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # Drop duplicates but keep the order the page listed them in
+    product_ids = list(dict.fromkeys(str(product_id) for product_id in product_ids if product_id))
+    if len(product_ids) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"at most {BATCH_MAX_ITEMS} upcs per batch"}), 400
+
+    api_key = os.getenv("API_KEY")
+    if not api_key:
+        return jsonify({"error": "API_KEY is not set on the server"}), 500
+
+    results = assess_batch(api_key, product_ids, weights, deadline)
+
+    # NDJSON streams one line per product in completion order
+    if data.get("stream") or request.accept_mimetypes.best == "application/x-ndjson":
+        async def lines():
+            async for result in results:
+                yield json.dumps(result) + "\n"
+        return Response(lines(), mimetype="application/x-ndjson")
+
+    by_id = {result["upc"]: result async for result in results}
+    return jsonify({"results": [by_id[product_id] for product_id in product_ids]})
+
+@app.route("/metrics", methods=["GET"])
+async def handle_metrics_request():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
+    configure_logging()
     app.run(port=5001, debug=True)
\ No newline at end of file
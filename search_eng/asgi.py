@@ -0,0 +1,11 @@
+"""
+ASGI entry point for production serving.
+
+Usage (from search_eng/):
+    gunicorn -c gunicorn.conf.py asgi:app
+"""
+from app import app
+from log_utils import configure_logging
+
+
+configure_logging()
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+import numpy as np
+
+import scoring
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assessment_cache.sqlite3")
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+def _pack(entry):
+    # 16 float32 sub-metrics in scoring.METRIC_KEYS order
+    sub_metrics = entry.get("subMetrics")
+    return scoring.sub_metric_vector(sub_metrics).tobytes() if sub_metrics else None
+
+
+class AssessmentCache:
+    """
+    Persistent per-ASIN store of the weight-independent part of an assessment.
+
+    Each entry holds the parsed sub-metric scores and the recommendations returned by
+    the LLM. Custom weights are applied on top of an entry at request time, so changing
+    weights never needs a new search, scrape or LLM call. The sub-metrics are also stored packed
+    next to the entry, so the whole catalog loads as one matrix (see catalog). The SQLite file runs in WAL mode and is
+    shared by all server worker processes, together with the leases SingleFlight coalesces on.
+
+    Args:
+        path (str, optional): SQLite file to store entries in. Defaults to ASSESSMENT_CACHE_PATH
+                              or a file next to this module.
+        ttl (int, optional): Seconds an entry stays fresh. Defaults to ASSESSMENT_CACHE_TTL or 7 days.
+        max_entries (int, optional): Entries kept before the oldest are evicted. Defaults to
+                                     ASSESSMENT_CACHE_MAX_ENTRIES or 100000.
+    """
+
+    def __init__(self, path=None, ttl=None, max_entries=None):
+        self.path = path or os.getenv("ASSESSMENT_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.ttl = int(ttl if ttl is not None else os.getenv("ASSESSMENT_CACHE_TTL", DEFAULT_TTL))
+        self.max_entries = int(
+            max_entries if max_entries is not None else os.getenv("ASSESSMENT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+        )
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            # WAL lets every server worker read while one of them writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS assessments ("
+                " product_id TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " partial INTEGER NOT NULL DEFAULT 0,"
+                " metrics BLOB)"
+            )
+            # Caches created by earlier versions get the newer columns added
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(assessments)")}
+            for column, definition in (("partial", "INTEGER NOT NULL DEFAULT 0"), ("metrics", "BLOB")):
+                if column in columns:
+                    continue
+                try:
+                    conn.execute(f"ALTER TABLE assessments ADD COLUMN {column} {definition}")
+                except sqlite3.OperationalError as e:
+                    # Another worker starting at the same time added it first
+                    if "duplicate column" not in str(e):
+                        raise
+            # One-off packing of entries stored before the metrics column existed
+            legacy = conn.execute("SELECT product_id, payload FROM assessments WHERE metrics IS NULL").fetchall()
+            conn.executemany(
+                "UPDATE assessments SET metrics = ? WHERE product_id = ?",
+                [(_pack(json.loads(payload)), product_id) for product_id, payload in legacy],
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_assessments_stored_at ON assessments (stored_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                " product_id TEXT PRIMARY KEY,"
+                " owner TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+
+    def get(self, product_id, include_stale=False, since=None):
+        """
+        Returns the cached entry for a product, or None if it is missing, expired or partial.
+
+        Expired and partial entries are kept until evicted for size, and are returned when
+        include_stale is True so a refresh can compare against the previous assessment. With since
+        (Unix time), only entries stored at or after it are returned, partial or not, e.g. the
+        result another worker just produced for a caller waiting on it.
+        """
+        row = self._connect().execute(
+            "SELECT payload, stored_at, partial FROM assessments WHERE product_id = ?", (product_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        payload, stored_at, partial = row
+        if since is not None:
+            return json.loads(payload) if stored_at >= since else None
+        if not include_stale and (partial or time.time() - stored_at > self.ttl):
+            return None
+        return json.loads(payload)
+
+    def get_with_age(self, product_id):
+        """
+        Returns (entry, age in seconds, partial) for a product whether or not it has expired, or
+        (None, None, False) if it is not cached. Entries older than ttl or partial are stale.
+        """
+        row = self._connect().execute(
+            "SELECT payload, stored_at, partial FROM assessments WHERE product_id = ?", (product_id,)
+        ).fetchone()
+        if row is None:
+            return None, None, False
+        payload, stored_at, partial = row
+        return json.loads(payload), max(0.0, time.time() - stored_at), bool(partial)
+
+    def set(self, product_id, entry, partial=False, stored_at=None):
+        """
+        Stores an entry for a product and evicts the oldest entries once over max_entries.
+        A partial entry, e.g. one with work skipped for a deadline, is only served as stale so it gets redone.
+        stored_at (Unix time, defaults to now) keeps the age of an entry that is regenerated offline.
+        """
+        stored_at = stored_at if stored_at is not None else time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO assessments (product_id, payload, stored_at, partial, metrics) VALUES (?, ?, ?, ?, ?)",
+                (product_id, json.dumps(entry), stored_at, int(partial), _pack(entry)),
+            )
+            self._evict(conn)
+
+    def items(self, include_stale=False):
+        """
+        Yields (product_id, entry) for every cached product, e.g. to re-score the whole catalog.
+        """
+        if include_stale:
+            rows = self._connect().execute("SELECT product_id, payload FROM assessments")
+        else:
+            rows = self._connect().execute(
+                "SELECT product_id, payload FROM assessments WHERE stored_at >= ? AND NOT partial",
+                (time.time() - self.ttl,),
+            )
+        for product_id, payload in rows:
+            yield product_id, json.loads(payload)
+
+    def catalog(self, include_stale=False):
+        """
+        Returns the sub-metrics of every cached product as a scoring.SubMetricCatalog, read from
+        the packed column without decoding any entry, e.g. to re-score the catalog for new weights.
+        """
+        query = "SELECT product_id, metrics FROM assessments WHERE metrics IS NOT NULL"
+        params = ()
+        if not include_stale:
+            query += " AND stored_at >= ? AND NOT partial"
+            params = (time.time() - self.ttl,)
+        rows = self._connect().execute(query, params).fetchall()
+        if not rows:
+            return scoring.SubMetricCatalog()
+        product_ids, packed = zip(*rows)
+        matrix = np.frombuffer(bytearray(b"".join(packed)), dtype=np.float32).reshape(len(rows), len(scoring.METRIC_KEYS))
+        return scoring.SubMetricCatalog(product_ids, matrix)
+
+    def delete(self, product_id):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM assessments WHERE product_id = ?", (product_id,))
+
+    def _evict(self, conn):
+        # Expired entries stay around for refreshes; only the size bound removes entries, oldest first
+        (count,) = conn.execute("SELECT COUNT(*) FROM assessments").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM assessments WHERE product_id IN ("
+                " SELECT product_id FROM assessments ORDER BY stored_at ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def acquire_lease(self, product_id, owner, ttl):
+        """
+        Claims the right to assess a product for ttl seconds. Returns True if owner now holds the
+        lease, False if another live owner does. Expired leases are taken over.
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO leases (product_id, owner, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (product_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+                " WHERE leases.expires_at < ? OR leases.owner = excluded.owner",
+                (product_id, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def release_lease(self, product_id, owner):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM leases WHERE product_id = ? AND owner = ?", (product_id, owner))
@@ -0,0 +1,213 @@
+import re
+import json
+from collections import namedtuple
+
+
+# Labels of the text format in SYSTEM_PROMPT and the sub-metric each one fills
+METRIC_LABELS = {
+    "Greenhouse Gas Emissions": ("environmental", "ghg"),
+    "Material Sustainability": ("environmental", "material"),
+    "Water Usage": ("environmental", "water"),
+    "Packaging impact": ("environmental", "packaging"),
+    "End of Life Disposal": ("environmental", "eol"),
+    "Fair Labour (yes/no)": ("social", "labour"),
+    "Worker Safety": ("social", "safety"),
+    "Fair Trade": ("social", "trade"),
+    "Local Sourcing": ("social", "sourcing"),
+    "Community Impact": ("social", "community"),
+    "User Health and Safety": ("social", "health"),
+    "Affordability/Value": ("governance", "affordability"),
+    "Circular Economy Fit": ("governance", "circular"),
+    "Local Economic Impact": ("governance", "local"),
+    "Supply Chain Resilience": ("governance", "resilience"),
+    "Innovation/R&D": ("governance", "innovation"),
+}
+YES_NO_METRICS = {("social", "labour")}
+# Fair Labour is a yes/no answer mapped onto the 1-10 scale
+YES_SCORE, NO_SCORE = 10, 1
+
+_BY_LABEL = {label.lower(): key for label, key in METRIC_LABELS.items()}
+_LABELS = {key: label for label, key in METRIC_LABELS.items()}
+# One alternation over all labels, so a single scan of the reply finds every metric line
+_METRIC_RE = re.compile(
+    r"(?P<label>" + "|".join(re.escape(label) for label in METRIC_LABELS) + r")\s*\**\s*:\s*\**\s*(?P<value>yes|no|\d+(?:\.\d+)?)",
+    re.IGNORECASE,
+)
+_ALT_RE = re.compile(r"ALT:\s*", re.IGNORECASE)
+
+ParsedAssessment = namedtuple("ParsedAssessment", ["sub_metrics", "recommendations", "missing"])
+
+
+def _metric_schema(category, name):
+    if (category, name) in YES_NO_METRICS:
+        return {"type": "string", "enum": ["yes", "no"]}
+    return {"type": "integer", "minimum": 1, "maximum": 10}
+
+
+def _object_schema(properties):
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+def _build_schema():
+    categories = {}
+    for category, name in METRIC_LABELS.values():
+        categories.setdefault(category, {})[name] = _metric_schema(category, name)
+    properties = {category: _object_schema(metrics) for category, metrics in categories.items()}
+    properties["alternatives"] = {
+        "type": "array",
+        "items": _object_schema({
+            "product_name": {"type": "string"},
+            "product_score": {"type": "number"},
+            "reco_reason": {"type": "string"},
+        }),
+    }
+    return _object_schema(properties)
+
+
+# JSON schema for structured output (OpenAI response_format json_schema)
+ASSESSMENT_SCHEMA = _build_schema()
+# The schema's shape as an example reply, for prompts sent without response_format
+ASSESSMENT_EXAMPLE = json.dumps({
+    **{
+        category: {name: "<yes or no>" if (category, name) in YES_NO_METRICS else "<score 1-10>" for name in schema["properties"]}
+        for category, schema in ASSESSMENT_SCHEMA["properties"].items() if category != "alternatives"
+    },
+    "alternatives": [{"product_name": "<item>", "product_score": 90, "reco_reason": "<reason>"}],
+})
+RESPONSE_FORMAT = {"type": "json_schema", "json_schema": {"name": "esg_assessment", "strict": True, "schema": ASSESSMENT_SCHEMA}}
+
+
+def _empty_sub_metrics():
+    sub_metrics = {}
+    for category, name in METRIC_LABELS.values():
+        sub_metrics.setdefault(category, {})[name] = None
+    return sub_metrics
+
+
+def _score(key, value):
+    """
+    Converts a reported value to a 1-10 score, or None if it is not a valid value for the metric.
+    """
+    if key in YES_NO_METRICS:
+        if isinstance(value, str) and value.lower() in ("yes", "no"):
+            return YES_SCORE if value.lower() == "yes" else NO_SCORE
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return min(10, max(1, round(value)))
+
+
+def _missing(sub_metrics):
+    return [f"{category}.{name}" for category, metrics in sub_metrics.items() for name, value in metrics.items() if value is None]
+
+
+def _normalize_recommendations(recommendations):
+    if not isinstance(recommendations, list):
+        return []
+    normalized = []
+    for reco in recommendations:
+        if not isinstance(reco, dict):
+            continue
+        score = reco.get("product_score")
+        # Some replies score alternatives out of 10 despite the instructions
+        if isinstance(score, (int, float)) and not isinstance(score, bool) and score <= 10:
+            reco["product_score"] = score * 10
+        normalized.append(reco)
+    return normalized
+
+
+def parse_text(text):
+    """
+    Parses a reply in the SYSTEM_PROMPT text format in one pass over the metric lines.
+    """
+    sub_metrics = _empty_sub_metrics()
+    for match in _METRIC_RE.finditer(text):
+        category, name = _BY_LABEL[match.group("label").lower()]
+        # The first occurrence wins, later ones are usually the model repeating itself
+        if sub_metrics[category][name] is None:
+            sub_metrics[category][name] = _score((category, name), match.group("value"))
+
+    recommendations = []
+    alt_match = _ALT_RE.search(text)
+    if alt_match:
+        start = text.find("[", alt_match.end())
+        if start != -1:
+            try:
+                recommendations, _ = json.JSONDecoder().raw_decode(text, start)
+            except json.JSONDecodeError:
+                recommendations = []
+
+    return ParsedAssessment(sub_metrics, _normalize_recommendations(recommendations), _missing(sub_metrics))
+
+
+def parse_json(text):
+    """
+    Parses and validates a structured reply matching ASSESSMENT_SCHEMA.
+
+    Raises:
+        ValueError: If the reply is not a JSON object.
+    """
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Structured assessment must be a JSON object")
+
+    sub_metrics = _empty_sub_metrics()
+    for category, metrics in sub_metrics.items():
+        reported = data.get(category)
+        if not isinstance(reported, dict):
+            continue
+        for name in metrics:
+            metrics[name] = _score((category, name), reported.get(name))
+
+    return ParsedAssessment(sub_metrics, _normalize_recommendations(data.get("alternatives")), _missing(sub_metrics))
+
+
+def parse_assessment(text, follow_up=None):
+    """
+    Parses an LLM assessment reply, structured JSON or the text format.
+
+    Args:
+        follow_up (str, optional): Reply to follow_up_prompt, filling in what the first reply left out.
+
+    Returns:
+        ParsedAssessment: sub_metrics keyed like scoring.DEFAULT_WEIGHTS (None where a metric is missing or
+                          invalid), the recommendations list, and the "category.metric" names that were missing.
+    """
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        stripped = stripped.strip("`").removeprefix("json").strip()
+    parsed = None
+    if stripped.startswith("{"):
+        try:
+            parsed = parse_json(stripped)
+        except ValueError:
+            pass
+    if parsed is None:
+        parsed = parse_text(text)
+    if follow_up and parsed.missing:
+        extra = parse_text(follow_up).sub_metrics
+        sub_metrics = {
+            category: {name: extra[category][name] if value is None else value for name, value in metrics.items()}
+            for category, metrics in parsed.sub_metrics.items()
+        }
+        parsed = ParsedAssessment(sub_metrics, parsed.recommendations, _missing(sub_metrics))
+    return parsed
+
+
+def follow_up_prompt(missing):
+    """
+    Returns a message asking for only the missing "category.metric" fields, as lines in the text format.
+    """
+    lines = []
+    for field in missing:
+        key = tuple(field.split(".", 1))
+        lines.append(f"- {_LABELS[key]}: {'{yes/no}' if key in YES_NO_METRICS else '{score/10}'}")
+    return (
+        "Your assessment left out these metrics or gave no valid value for them. "
+        "Reply with only these lines, filled in:\n" + "\n".join(lines)
+    )
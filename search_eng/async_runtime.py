@@ -0,0 +1,63 @@
+import asyncio
+import functools
+import threading
+
+
+_loop = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    """
+    Returns the shared event loop: the server's loop once adopted (see adopt_running_loop),
+    otherwise a background loop started on first use.
+
+    All network I/O (page fetches, and anything else awaiting sockets) runs on this one
+    loop so connection pools are shared between requests instead of being rebuilt per call.
+    """
+    global _loop
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="async-runtime", daemon=True)
+            thread.start()
+        return _loop
+
+
+def adopt_running_loop():
+    """
+    Makes the running loop the shared loop, e.g. the loop an ASGI server runs its handlers on, so
+    handlers await the pipeline directly instead of parking a thread on run(). Must be called on
+    that loop before anything else uses get_loop().
+    """
+    global _loop
+    loop = asyncio.get_running_loop()
+    with _lock:
+        if _loop is not None and _loop is not loop and not _loop.is_closed():
+            raise RuntimeError("The shared loop is already running in its own thread")
+        _loop = loop
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Runs a blocking call (SQLite, compression, file writes) in the loop's default executor, so a
+    busy database in another worker holds up one thread instead of every request on the loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+
+def run(coro, timeout=None):
+    """
+    Runs a coroutine on the shared loop from synchronous code and waits for its result.
+    Must not be called from the shared loop itself.
+
+    Args:
+        coro (coroutine): The coroutine to run.
+        timeout (float, optional): Seconds to wait before raising TimeoutError. Defaults to no limit.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        future.cancel()
+        raise
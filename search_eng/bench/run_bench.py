@@ -0,0 +1,308 @@
+"""
+Offline benchmark for the assessment API.
+
+Starts local stand-ins for SearxNG and the OpenAI chat completions API, launches the app
+against them with throwaway caches, and drives it at a fixed concurrency. Reports latency
+percentiles, throughput and the server's peak RSS for each phase:
+
+    cold      first assessment of unique products (search, fetch, extract, LLM, parse)
+    reweight  the same products again with different weights (assessment cache hits)
+    batch     new products through /api/assess/batch
+
+Usage (from search_eng/):
+    python bench/run_bench.py --products 50 --concurrency 10 --llm-latency 1.0
+    python bench/run_bench.py --json bench.json --compare baseline.json
+    python bench/run_bench.py --workers 4    # serve with gunicorn instead of a single uvicorn process
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from stubs import SearchStub, OpenAIStub, start_stub
+
+
+SEARCH_ENG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def post_json(url, payload, timeout=120):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def read_rss_kb(pid):
+    """
+    Returns the resident set size of a process and its children (e.g. gunicorn workers), in kB.
+    """
+    total = None
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    total = int(line.split()[1])
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            for child in children.read().split():
+                total += read_rss_kb(int(child)) or 0
+    except (OSError, TypeError):
+        pass
+    return total
+
+
+class RssSampler:
+    """
+    Polls the server's resident set size in the background and keeps the peak.
+    """
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = read_rss_kb(self.pid)
+            if rss is not None:
+                self.peak_kb = max(self.peak_kb or 0, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def random_weights(rng):
+    return {
+        "environmental": {"ghg": rng.randint(0, 50), "material": rng.randint(0, 50), "water": 10, "packaging": 20, "eol": 20},
+        "social": {"labour": 10, "safety": 10, "trade": rng.randint(0, 40), "sourcing": 20, "community": 20, "health": 20},
+        "governance": {"affordability": 20, "circular": 25, "local": rng.randint(0, 40), "resilience": 15, "innovation": 10},
+    }
+
+
+def run_phase(name, jobs, concurrency, server_pid):
+    """
+    Runs the jobs (callables) at the given concurrency and returns the phase's statistics.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(job):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            result = job()
+            failed = any("error" in item for item in result) if isinstance(result, list) else "error" in result
+        except (urllib.error.URLError, OSError, ValueError):
+            failed = True
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += failed
+
+    with RssSampler(server_pid) as sampler:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, jobs))
+        wall = time.perf_counter() - start
+
+    return {
+        "phase": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "peak_rss_mb": sampler.peak_kb / 1024 if sampler.peak_kb else None,
+    }
+
+
+def stage_means(metrics_text):
+    """
+    Returns the mean seconds per pipeline stage from the server's /metrics output.
+    """
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        for suffix, target in (("_sum", sums), ("_count", counts)):
+            prefix = f"assessment_stage_seconds{suffix}{{stage=\""
+            if line.startswith(prefix):
+                stage, value = line[len(prefix):].split("\"} ")
+                target[stage] = float(value)
+    return {stage: sums[stage] / counts[stage] for stage in sums if counts.get(stage)}
+
+
+def start_server(port, search_url, openai_url, cache_dir, workers=0):
+    env = dict(
+        os.environ,
+        SEARCH_URL=f"{search_url}/search",
+        OPENAI_URL=f"{openai_url}/v1/chat/completions",
+        API_KEY="bench",
+        ASSESSMENT_CACHE_PATH=os.path.join(cache_dir, "assessments.sqlite3"),
+        PAGE_CACHE_PATH=os.path.join(cache_dir, "pages.sqlite3"),
+        RESPONSE_ARCHIVE_DIR=os.path.join(cache_dir, "archive"),
+        LOG_LEVEL="WARNING",
+    )
+    if workers:
+        env.update(BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers), ACCESS_LOG="")
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "asgi:app"]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+            "--log-level", "warning", "--no-access-log",
+        ]
+    server = subprocess.Popen(command, cwd=SEARCH_ENG_DIR, env=env)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1).read()
+            return server
+        except (urllib.error.URLError, OSError):
+            if server.poll() is not None:
+                raise RuntimeError("The app exited during startup")
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("The app did not start within 30 s")
+
+
+def print_report(results, stages):
+    print(f"{'phase':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}")
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.1f}" if r["peak_rss_mb"] else "n/a"
+        print(
+            f"{r['phase']:<10}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}"
+            f"{r['p50'] * 1000:>10.1f}{r['p95'] * 1000:>10.1f}{r['p99'] * 1000:>10.1f}{rss:>13}"
+        )
+    if stages:
+        print("\nMean seconds per pipeline stage:")
+        for stage, mean in sorted(stages.items()):
+            print(f"  {stage:<10}{mean:.4f}")
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Returns a list of regressions against a previous --json report.
+    """
+    with open(baseline_path) as f:
+        baseline = {r["phase"]: r for r in json.load(f)["phases"]}
+    regressions = []
+    for r in results:
+        previous = baseline.get(r["phase"])
+        if previous is None:
+            continue
+        if r["p95"] > previous["p95"] * (1 + tolerance):
+            regressions.append(f"{r['phase']}: p95 {previous['p95'] * 1000:.1f} ms -> {r['p95'] * 1000:.1f} ms")
+        if r["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{r['phase']}: req/s {previous['rps']:.1f} -> {r['rps']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/assess against local SearxNG and OpenAI stubs.")
+    parser.add_argument("--products", type=int, default=50, help="Unique products per phase")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent client requests")
+    parser.add_argument("--batch-size", type=int, default=20, help="Products per /api/assess/batch call")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds the OpenAI stub takes per completion")
+    parser.add_argument("--llm-429-rate", type=float, default=0.0, help="Share of completions the OpenAI stub rejects with 429")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="Random +/- seconds added to the stub latency")
+    parser.add_argument("--page-size", type=int, default=1_500_000, help="Bytes per stub product page")
+    parser.add_argument("--workers", type=int, default=0, help="Serve with gunicorn and this many workers (0: one uvicorn process)")
+    parser.add_argument("--phases", default="cold,reweight,batch", help="Comma-separated phases to run")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--compare", help="Fail if p95 or req/s regress against this earlier --json report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression for --compare")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    search_server, search_url = start_stub(SearchStub, page_size=args.page_size)
+    openai_server, openai_url = start_stub(
+        OpenAIStub, latency=args.llm_latency, jitter=args.llm_jitter, rate_limit_rate=args.llm_429_rate
+    )
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        server = start_server(port, search_url, openai_url, cache_dir, args.workers)
+        try:
+            products = [f"BENCH{i:05d}" for i in range(args.products)]
+            batch_products = [f"BATCH{i:05d}" for i in range(args.products)]
+            phases = {
+                "cold": lambda: [
+                    (lambda p=p: post_json(f"{base}/api/assess", {"upc": p, "weights": {}})) for p in products
+                ],
+                "reweight": lambda: [
+                    (lambda p=p, w=random_weights(rng): post_json(f"{base}/api/assess", {"upc": p, "weights": w}))
+                    for p in products
+                ],
+                "batch": lambda: [
+                    (lambda chunk=batch_products[i:i + args.batch_size]: post_json(
+                        f"{base}/api/assess/batch", {"upcs": chunk, "weights": {}})["results"])
+                    for i in range(0, len(batch_products), args.batch_size)
+                ],
+            }
+
+            results = []
+            for name in args.phases.split(","):
+                name = name.strip()
+                if name not in phases:
+                    parser.error(f"unknown phase {name}")
+                results.append(run_phase(name, phases[name](), args.concurrency, server.pid))
+
+            metrics_text = urllib.request.urlopen(f"{base}/metrics", timeout=5).read().decode("utf-8")
+            stages = stage_means(metrics_text)
+        finally:
+            server.terminate()
+            server.wait()
+            search_server.shutdown()
+            openai_server.shutdown()
+
+    print_report(results, stages)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "phases": results, "stages": stages}, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from functools import lru_cache
+from urllib.parse import parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+CANNED_ASSESSMENT = """## Environmental Score ##
+- Greenhouse Gas Emissions: {ghg}/10
+- Material Sustainability: 6/10
+- Water Usage: 5/10
+- Packaging impact: 4/10
+- End of Life Disposal: 5/10
+
+## Social Score ##
+- Fair Labour (yes/no): yes
+- Worker Safety: 6/10
+- Fair Trade: 4/10
+- Local Sourcing: 3/10
+- Community Impact: 5/10
+- User Health and Safety: 8/10
+
+## Governance Score ##
+- Affordability/Value: 7/10
+- Circular Economy Fit: 4/10
+- Local Economic Impact: 3/10
+- Supply Chain Resilience: 5/10
+- Innovation/R&D: 6/10
+
+ALT: [{{"product_name": "Refillable Bamboo Bottle", "product_score": 88, "reco_reason": "Plastic-free and refillable"}}]"""
+
+_PRODUCT_RE = re.compile(r"###\s*PRODUCT\s+(\d+)\s*###", re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def product_html(product_id, size):
+    """
+    Builds an Amazon-like product page of roughly size bytes: a little useful product text
+    buried in scripts, navigation, carousels and reviews.
+    """
+    rng = random.Random(product_id)
+    head = (
+        f"<html><head><title>Amazon.com: Stub Product {product_id}</title>"
+        "<style>" + ".a-section{margin:0}" * 200 + "</style></head><body>"
+        "<div id=\"nav-belt\"><a href=\"/\">Hello, sign in</a><a href=\"/cart\">Cart</a>"
+        + "<a href=\"/dept\">Department</a>" * 100 + "</div>"
+        f"<span id=\"productTitle\">Stub Product {product_id} Reusable Water Bottle, 750ml</span>"
+        "<div id=\"feature-bullets\"><ul>"
+        "<li>Made from 80% recycled stainless steel</li>"
+        "<li>BPA-free, plastic-free packaging made of recycled cardboard</li>"
+        "<li>Manufactured in Portugal in a certified fair trade factory</li>"
+        "</ul></div>"
+        "<table id=\"productDetails_techSpec_section_1\">"
+        "<tr><th>Material</th><td>Stainless Steel</td></tr>"
+        "<tr><th>Country of Origin</th><td>Portugal</td></tr></table>"
+    )
+    tail = "</body></html>"
+    filler = []
+    filled = len(head) + len(tail)
+    while filled < size:
+        if rng.random() < 0.5:
+            block = "<script>var data=" + json.dumps({"k": "x" * rng.randint(500, 4000)}) + ";</script>"
+        else:
+            block = (
+                "<div class=\"review\"><span class=\"a-profile-name\">Customer</span>"
+                f"<span class=\"review-text\">Great bottle, {rng.randint(1, 5)} stars, keeps water cold. "
+                + "Would buy again. " * rng.randint(5, 40) + "</span></div>"
+            )
+        filler.append(block)
+        filled += len(block)
+    return head + "".join(filler) + tail
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type, headers=None):
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+
+class SearchStub(_StubHandler):
+    """
+    Imitates SearxNG's /search JSON API and serves the product pages it links to.
+    """
+    results_per_query = 5
+    page_size = 1_500_000
+
+    def do_POST(self):
+        body = self._read_body()
+        if not self.path.startswith("/search"):
+            return self._send(404, "not found", "text/plain")
+        query = parse_qs(body.decode("utf-8")).get("q", [""])[0]
+        key = hashlib.md5(query.encode("utf-8")).hexdigest()[:10]
+        host = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+        results = [
+            {"title": f"Stub Product {key}-{i} Reusable Water Bottle", "url": f"{host}/page/{key}-{i}", "content": "..."}
+            for i in range(self.results_per_query)
+        ]
+        self._send(200, json.dumps({"query": query, "results": results}), "application/json")
+
+    def do_GET(self):
+        if not self.path.startswith("/page/"):
+            return self._send(404, "not found", "text/plain")
+        page_id = self.path[len("/page/"):]
+        etag = f'"{page_id}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", "text/html", {"ETag": etag})
+        self._send(200, product_html(page_id, self.page_size), "text/html; charset=utf-8", {"ETag": etag})
+
+
+class OpenAIStub(_StubHandler):
+    """
+    Imitates /v1/chat/completions with a configurable latency and canned replies in the format
+    the assessment parser expects. Multi-product prompts get one section per product. A share of
+    requests (rate_limit_rate) is answered with 429 and OpenAI's rate-limit headers.
+    """
+    latency = 1.0
+    jitter = 0.2
+    rate_limit_rate = 0.0
+    rate_limit_headers = {
+        "x-ratelimit-limit-requests": "10000",
+        "x-ratelimit-limit-tokens": "10000000",
+        "x-ratelimit-remaining-requests": "9999",
+        "x-ratelimit-remaining-tokens": "9990000",
+    }
+
+    def do_POST(self):
+        body = self._read_body()
+        if not self.path.startswith("/v1/chat/completions"):
+            return self._send(404, "not found", "text/plain")
+        request = json.loads(body or b"{}")
+        messages = request.get("messages", [])
+        user_content = messages[-1]["content"] if messages else ""
+        if random.random() < self.rate_limit_rate:
+            error = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+            return self._send(429, json.dumps(error), "application/json",
+                              {**self.rate_limit_headers, "retry-after-ms": "200", "x-ratelimit-reset-requests": "200ms"})
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        products = _PRODUCT_RE.findall(user_content)
+        if products:
+            content = "\n\n".join(
+                f"### PRODUCT {number} ###\n" + CANNED_ASSESSMENT.format(ghg=random.randint(1, 10)) for number in products
+            )
+        else:
+            content = CANNED_ASSESSMENT.format(ghg=random.randint(1, 10))
+
+        prompt_chars = sum(len(message.get("content", "")) for message in messages)
+        completion = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (prompt_chars + len(content)) // 4,
+            },
+        }
+        self._send(200, json.dumps(completion), "application/json", self.rate_limit_headers)
+
+
+def start_stub(handler, **attributes):
+    """
+    Starts a stub server on a free local port in a background thread.
+
+    Returns:
+        tuple: The server (call shutdown() to stop it) and its base URL.
+    """
+    handler = type(handler.__name__, (handler,), attributes)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
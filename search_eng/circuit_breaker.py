@@ -0,0 +1,93 @@
+import os
+import time
+import logging
+
+from metrics import circuit_events
+
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency that keeps failing, and probes it now and then to notice recovery.
+
+    After failure_threshold consecutive failures the breaker opens and allow() returns False, so
+    callers fail in microseconds instead of waiting for a timeout. Once reset_timeout seconds have
+    passed, one call at a time is let through as a probe: success closes the breaker, failure opens
+    it for another reset_timeout. Meant to be used from the shared event loop thread only.
+
+    Args:
+        name (str): Dependency name used in logs and metrics, e.g. "search".
+        key (str, optional): Instance within the dependency, e.g. the host of a page fetch.
+        failure_threshold (int, optional): Consecutive failures that open the breaker.
+        reset_timeout (float, optional): Seconds the breaker stays open before probing.
+    """
+
+    def __init__(self, name, key=None, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = None
+
+    def __repr__(self):
+        return f"{self.name}:{self.key}" if self.key else self.name
+
+    def allow(self):
+        """
+        Returns True if a call may go ahead. Every allowed call must end in record_success or record_failure.
+        """
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+            self._transition("half_open")
+        # A probe whose caller vanished without reporting back must not block probing forever
+        if self.state == "half_open" and (self.probe_started is None or now - self.probe_started >= self.reset_timeout):
+            self.probe_started = now
+            return True
+        circuit_events.inc(breaker=self.name, event="rejected")
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.probe_started = None
+        if self.state != "closed":
+            self._transition("closed")
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_started = None
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self._transition("open")
+
+    def _transition(self, state):
+        self.state = state
+        circuit_events.inc(breaker=self.name, event=state)
+        log = logger.warning if state == "open" else logger.info
+        log("Circuit breaker %r is now %s", self, state)
+
+
+class BreakerRegistry:
+    """
+    One CircuitBreaker per key of a dependency, e.g. per host for page fetches, created on first use.
+    """
+
+    def __init__(self, name, **kwargs):
+        self.name = name
+        self.kwargs = kwargs
+        self._breakers = {}
+
+    def get(self, key):
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(self.name, key, **self.kwargs)
+        return breaker
@@ -0,0 +1,59 @@
+import os
+import math
+import time
+
+
+# Default and maximum end-to-end seconds for one /api/assess request
+ASSESS_DEADLINE = float(os.getenv("ASSESS_DEADLINE", 20))
+ASSESS_DEADLINE_MAX = float(os.getenv("ASSESS_DEADLINE_MAX", 60))
+
+
+class Deadline:
+    """
+    Point in time by which a request has to be answered, passed down through every stage.
+
+    Stages ask how much time is left, optionally keeping a reserve for the stages after them,
+    and drop optional work when it would not fit.
+
+    Args:
+        seconds (float, optional): Time allowed from now. None means no deadline.
+    """
+
+    def __init__(self, seconds=None):
+        self.expires = time.monotonic() + seconds if seconds is not None else math.inf
+
+    @classmethod
+    def from_request(cls, value):
+        """
+        Builds a deadline from a request body's "deadline" (seconds), capped at ASSESS_DEADLINE_MAX.
+
+        Raises:
+            ValueError: If value is not a positive number.
+        """
+        if value is None:
+            return cls(min(ASSESS_DEADLINE, ASSESS_DEADLINE_MAX))
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not value > 0:
+            raise ValueError("deadline must be a positive number of seconds")
+        return cls(min(float(value), ASSESS_DEADLINE_MAX))
+
+    @property
+    def unlimited(self):
+        return self.expires == math.inf
+
+    def remaining(self, reserve=0.0):
+        """
+        Returns the seconds left after keeping reserve seconds for later stages (never negative).
+        """
+        return max(0.0, self.expires - time.monotonic() - reserve)
+
+    def timeout(self, reserve=0.0, cap=None):
+        """
+        Returns a timeout for the next step: the remaining time, at most cap, or None if neither limits it.
+        """
+        remaining = None if self.unlimited else self.remaining(reserve)
+        if cap is None:
+            return remaining
+        return cap if remaining is None else min(cap, remaining)
+
+    def expired(self):
+        return time.monotonic() >= self.expires
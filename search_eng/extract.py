@@ -0,0 +1,152 @@
+import re
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+
+# Subtrees whose text never describes the product
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer"}
+# Elements without an end tag, which are never open
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+class TextExtractor(HTMLParser):
+    """
+    Incremental HTML-to-text extractor, fed the page chunk by chunk as it downloads.
+
+    Unlike building a document tree and calling get_text on it, nothing but the extracted
+    text is kept: skipped subtrees (scripts, styles, navigation) are discarded as they stream
+    past. Text is returned one text node per line, stripped, like BeautifulSoup's
+    get_text(separator="\\n", strip=True).
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = []
+        self._pending = []
+        # Names of the elements opened and not closed yet, outermost first
+        self._open = []
+        # Depth in _open of the skipped element while inside one
+        self._skip_at = None
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in VOID_TAGS:
+            return
+        if self._skip_at is None and tag in SKIP_TAGS:
+            self._skip_at = len(self._open)
+        self._open.append(tag)
+
+    def handle_endtag(self, tag):
+        self._flush()
+        # An end tag closes the innermost open element of its name and everything opened inside it,
+        # so a skipped element the page never closes ends with its parent instead of running to the
+        # end of the page. End tags without an open element are ignored, as BeautifulSoup does.
+        for depth in range(len(self._open) - 1, -1, -1):
+            if self._open[depth] == tag:
+                del self._open[depth:]
+                break
+        if self._skip_at is not None and len(self._open) <= self._skip_at:
+            self._skip_at = None
+
+    def handle_data(self, data):
+        if self._skip_at is None:
+            # A text node may arrive in pieces when it spans two chunks
+            self._pending.append(data)
+
+    def _flush(self):
+        if self._pending:
+            text = "".join(self._pending).strip()
+            self._pending = []
+            if text:
+                self.add_line(text)
+
+    def add_line(self, text):
+        self.lines.append(text)
+
+    def result(self):
+        """
+        Finishes parsing and returns the extracted text.
+        """
+        self.close()
+        self._flush()
+        return "\n".join(self.lines)
+
+
+class AmazonExtractor(TextExtractor):
+    """
+    Keeps only the product sections of an Amazon product page: title, feature bullets, product
+    overview and details tables, and the description (where materials are usually listed).
+
+    Falls back to all visible text if none of the sections are found, e.g. on a captcha page or
+    after a layout change.
+    """
+
+    KEEP_IDS = {
+        "productTitle",
+        "feature-bullets",
+        "productOverview_feature_div",
+        "detailBullets_feature_div",
+        "productDescription",
+        "materials_feature_div",
+    }
+    # Details tables come as productDetails_techSpec_section_1, productDetails_detailBullets_sections1, ...
+    KEEP_ID_PREFIXES = ("productDetails",)
+
+    def __init__(self):
+        super().__init__()
+        self.kept = []
+        # Depth in _open of the kept section while inside one
+        self._keep_at = None
+
+    def _keeps(self, attrs):
+        element_id = dict(attrs).get("id")
+        return bool(element_id) and (element_id in self.KEEP_IDS or element_id.startswith(self.KEEP_ID_PREFIXES))
+
+    def handle_starttag(self, tag, attrs):
+        super().handle_starttag(tag, attrs)
+        if tag in VOID_TAGS:
+            return
+        # The section ends when its element is closed, by its own end tag or its parent's, so end
+        # tags the page leaves out (</p>, </li>) inside it cannot keep it open past its end
+        if self._keep_at is None and self._skip_at is None and self._keeps(attrs):
+            self._keep_at = len(self._open) - 1
+
+    def handle_endtag(self, tag):
+        super().handle_endtag(tag)
+        if self._keep_at is not None and len(self._open) <= self._keep_at:
+            self._keep_at = None
+
+    def add_line(self, text):
+        super().add_line(text)
+        if self._keep_at is not None:
+            self.kept.append(text)
+
+    def result(self):
+        text = super().result()
+        return "\n".join(self.kept) if self.kept else text
+
+
+# Site-specific extractors by hostname; everything else uses the generic TextExtractor
+EXTRACTORS = [
+    (re.compile(r"(^|\.)amazon\.(com|ca|de|fr|it|es|in|co\.uk|co\.jp|com\.au|com\.mx|com\.br)$"), AmazonExtractor),
+]
+
+
+def extractor_for(url):
+    """
+    Returns a new extractor for a page URL.
+    """
+    host = urlsplit(url).hostname or ""
+    for pattern, extractor in EXTRACTORS:
+        if pattern.search(host):
+            return extractor()
+    return TextExtractor()
+
+
+def extract_text(html, url=""):
+    """
+    Extracts the useful text of a complete HTML document.
+    """
+    extractor = extractor_for(url)
+    extractor.feed(html)
+    return extractor.result()
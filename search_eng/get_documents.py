@@ -1,23 +1,185 @@
-import requests
-from bs4 import BeautifulSoup
+import os
+import time
+import codecs
+import asyncio
+import logging
+import aiohttp
 import json
+from urllib.parse import urlsplit
 
+import async_runtime
+from page_cache import PageCache
+from http_session import get_session, FETCH_TIMEOUT
+from circuit_breaker import CircuitBreaker, BreakerRegistry
+from extract import extractor_for
+from metrics import stage_seconds, stage_errors, cache_requests
 
-def get_documents(product_id, top_n=1, get_recommendations=False):
+
+logger = logging.getLogger(__name__)
+
+
+# Page fetch settings. Bodies are streamed and cut off at FETCH_MAX_BYTES since product
+# pages are several MB and the useful text sits near the top.
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", 1024 * 1024))
+FETCH_CHUNK_SIZE = 64 * 1024
+# aiohttp reads a total timeout of 0 as no timeout at all, so deadline-derived ones never go below this
+MIN_TIMEOUT = 0.05
+
+SEARCH_URL = os.getenv("SEARCH_URL", "http://localhost:8080/search")
+
+# Search results and extracted page text survive restarts and are shared between workers
+page_cache = PageCache()
+page_cache.purge()
+
+# Fail fast while SearxNG or a page host keeps failing, instead of waiting for each timeout
+search_breaker = CircuitBreaker("search")
+fetch_breakers = BreakerRegistry("fetch")
+
+
+def _feed(extractor, decoder, chunk, final=False):
     """
-    Retrieves text content from the top search results of a SearxNG search query.
+    Feeds one body chunk to an extractor and returns the seconds it took.
+    """
+    start = time.perf_counter()
+    extractor.feed(decoder.decode(chunk, final))
+    return time.perf_counter() - start
+
+
+async def fetch_page(url, max_bytes=FETCH_MAX_BYTES, headers=None, timeout=None):
+    """
+    Streams a page, reading at most max_bytes of the body, within timeout seconds if given
+    (FETCH_TIMEOUT otherwise), and extracts its text as the chunks arrive.
+
+    Each chunk is decoded and fed to the page's extractor (see extract.extractor_for) in the
+    executor, so parsing overlaps with the download and the full HTML is never held in memory.
+
+    Returns:
+        tuple: The response status, the extracted text (None unless the status is 200) and the
+               response headers.
+    """
+    session = get_session()
+    loop = asyncio.get_running_loop()
+    with stage_seconds.time(stage="fetch"):
+        # Without a timeout the session's FETCH_TIMEOUT applies
+        options = {"timeout": aiohttp.ClientTimeout(total=max(timeout, MIN_TIMEOUT))} if timeout is not None else {}
+        async with session.get(url, headers=headers, **options) as page_response:
+            if page_response.status != 200:
+                return page_response.status, None, page_response.headers
+
+            extractor = extractor_for(url)
+            try:
+                decoder = codecs.getincrementaldecoder(page_response.charset or "utf-8")(errors="replace")
+            except LookupError:
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            received = 0
+            extract_seconds = 0.0
+            async for chunk in page_response.content.iter_chunked(FETCH_CHUNK_SIZE):
+                chunk = chunk[:max_bytes - received]
+                received += len(chunk)
+                extract_seconds += await loop.run_in_executor(None, _feed, extractor, decoder, chunk)
+                if received >= max_bytes:
+                    break
+            extract_seconds += await loop.run_in_executor(None, _feed, extractor, decoder, b"", True)
+            text = extractor.result()
+            # Extraction overlaps the download, so its share of the fetch time is recorded on its own
+            stage_seconds.observe(extract_seconds, stage="extract")
+            return page_response.status, text, page_response.headers
+
+
+async def fetch_text(url, max_bytes=FETCH_MAX_BYTES, deadline=None):
+    """
+    Fetches a page and extracts its visible text. Returns "" if the page cannot be retrieved.
+
+    Fresh pages are served from the page cache. Stale ones are revalidated with a conditional
+    GET and only downloaded and parsed again if the server reports a change. URLs that failed
+    recently, and hosts whose circuit breaker is open, are not requested at all. A deadline
+    (deadline.Deadline) shortens the fetch timeout, and once it has passed the page is not requested;
+    running out of it is not held against the host.
+    """
+    cached = await async_runtime.run_blocking(page_cache.get_page, url)
+    if cached is not None and cached["fresh"]:
+        cache_requests.inc(cache="page", result="hit")
+        return cached["text"]
+    # A stale copy is still better than no text at all
+    fallback = cached["text"] if cached is not None else ""
+    if await async_runtime.run_blocking(page_cache.has_failed, "page", url):
+        cache_requests.inc(cache="page", result="negative")
+        return fallback
+    cache_requests.inc(cache="page", result="miss")
+
+    if deadline is not None and deadline.expired():
+        logger.info("Skipped %s, the request deadline passed", url)
+        return fallback
+    breaker = fetch_breakers.get(urlsplit(url).hostname)
+    if not breaker.allow():
+        return fallback
+
+    headers = {}
+    if cached is not None:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        timeout = deadline.timeout(cap=FETCH_TIMEOUT) if deadline is not None else None
+        status, text, response_headers = await fetch_page(url, max_bytes, headers, timeout)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        if deadline is not None and deadline.expired():
+            logger.info("Skipped %s, the request deadline passed", url)
+            return fallback
+        breaker.record_failure()
+        await async_runtime.run_blocking(page_cache.set_failed, "page", url)
+        stage_errors.inc(stage="fetch")
+        logger.warning("Failed to retrieve or parse content from %s: %s", url, e)
+        return fallback
+
+    # Only server errors say the host is unwell; a 404 is a dead URL on a healthy host
+    if status >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    if status >= 400:
+        await async_runtime.run_blocking(page_cache.set_failed, "page", url)
+        stage_errors.inc(stage="fetch")
+        logger.warning("Fetching %s returned status code %s", url, status)
+        return fallback
+
+    if status == 304 and cached is not None:
+        await async_runtime.run_blocking(page_cache.touch_page, url)
+        return cached["text"]
+
+    if status != 200:
+        return fallback
+    await async_runtime.run_blocking(
+        page_cache.set_page, url, text, response_headers.get("ETag"), response_headers.get("Last-Modified")
+    )
+    return text
+
+
+async def fetch_texts(urls, max_bytes=FETCH_MAX_BYTES, deadline=None):
+    """
+    Fetches all urls concurrently and returns their visible text in the same order.
+    """
+    return await asyncio.gather(*(fetch_text(url, max_bytes, deadline) for url in urls))
+
+
+async def search(product_id, top_n=1, get_recommendations=False, deadline=None):
+    """
+    Queries the SearxNG instance and returns the URLs and titles of the top results.
 
     Args:
         product_id (str): A product name or ID used in the search query.
         top_n (int, optional): Number of top search results to retrieve. Defaults to 1.
         get_recommendations (bool, optional): If True, modifies the query to search for environmentally 
                                               friendly alternatives. Defaults to False.
+        deadline (Deadline, optional): Bounds the search request. Running out of it is not counted
+                                       as a SearxNG failure.
 
     Returns:
-        tuple: A tuple of three lists:
-            - documents (list): URLs of retrieved documents.
+        tuple: A tuple of two lists:
+            - documents (list): URLs of the search results.
             - titles (list): Titles of the search results.
-            - txt (list): Extracted visible text from each URL.
     """
     # Choose the search prefix based on context
     query_prefix = "environmentally friendly alternatives to the " if get_recommendations else "Amazon UPC "
@@ -34,67 +196,110 @@ def get_documents(product_id, top_n=1, get_recommendations=False):
         "Accept": "application/json",
     }
 
-    search_url = "http://localhost:8080/search"
-
     titles = []
     documents = []
-    txt = []
 
+    cached_results = await async_runtime.run_blocking(page_cache.get_search, params["q"])
+    if cached_results is not None:
+        cache_requests.inc(cache="search", result="hit")
+        for result in cached_results[:top_n]:
+            titles.append(result["title"])
+            documents.append(result["url"])
+        return documents, titles
+    # Searches that failed or found nothing a moment ago are not repeated
+    if await async_runtime.run_blocking(page_cache.has_failed, "search", params["q"]):
+        cache_requests.inc(cache="search", result="negative")
+        return documents, titles
+    cache_requests.inc(cache="search", result="miss")
+
+    if deadline is not None and deadline.expired():
+        logger.info("Search for %r skipped, the request deadline passed", params["q"])
+        return documents, titles
+    if not search_breaker.allow():
+        return documents, titles
+
+    results = None
     try:
         # Send POST request to SearxNG instance
-        response = requests.post(search_url, data=params, headers=headers, timeout=10)
-        print(f"Status code: {response.status_code}")
-
-        if response.status_code == 200:
-            content_type = response.headers.get("Content-Type", "")
-            if content_type.startswith("application/json"):
-                data = response.json()
-
-                # Extract top N titles and URLs
-                for result in data.get("results", [])[:top_n]:
-                    titles.append(result.get("title", "N/A"))
-                    documents.append(result.get("url", "N/A"))
-            else:
-                print("Expected JSON but received:")
-                print(response.text[:500])
-        else:
-            print(f"Error: Received status code {response.status_code}")
-            print("Response content:")
-            print(response.text)
-
-    except requests.exceptions.Timeout:
-        print("The request timed out. The server might be slow or unresponsive.")
-    except requests.exceptions.ConnectionError as e:
-        print(f"A connection error occurred: {e}")
-        print("Please ensure the SearxNG instance is running at http://127.0.0.1:8080/")
-    except requests.exceptions.RequestException as e:
-        print(f"An unexpected request error occurred: {e}")
+        with stage_seconds.time(stage="search"):
+            timeout = deadline.timeout(cap=FETCH_TIMEOUT) if deadline is not None else None
+            options = {"timeout": aiohttp.ClientTimeout(total=max(timeout, MIN_TIMEOUT))} if timeout is not None else {}
+            async with get_session().post(SEARCH_URL, data=params, headers=headers, **options) as response:
+                logger.debug("Search status code: %s", response.status)
+
+                if response.status == 200:
+                    content_type = response.headers.get("Content-Type", "")
+                    if content_type.startswith("application/json"):
+                        data = await response.json()
+                        results = [
+                            {"title": result.get("title", "N/A"), "url": result.get("url", "N/A")}
+                            for result in data.get("results", [])
+                        ]
+                    else:
+                        logger.warning("Expected JSON but received: %s", (await response.text())[:500])
+                else:
+                    logger.warning("Search returned status code %s: %s", response.status, (await response.text())[:500])
+
+    except asyncio.TimeoutError:
+        if deadline is not None and deadline.expired():
+            logger.info("Search for %r skipped, the request deadline passed", params["q"])
+            return documents, titles
+        logger.warning("The search request timed out. The server might be slow or unresponsive.")
+    except aiohttp.ClientConnectionError as e:
+        logger.warning("A connection error occurred: %s. Please ensure the SearxNG instance is running at %s", e, SEARCH_URL)
+    except aiohttp.ClientError as e:
+        logger.warning("An unexpected request error occurred: %s", e)
     except json.JSONDecodeError as e:
-        print(f"Failed to decode JSON response: {e}")
-        print("Response content (might not be valid JSON):")
-        print(response.text)
+        logger.warning("Failed to decode JSON response: %s", e)
 
-    # Fetch and extract readable text from each URL
-    for url in documents:
-        try:
-            page_response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
-            soup = BeautifulSoup(page_response.text, "html.parser")
+    if results is None:
+        stage_errors.inc(stage="search")
+        search_breaker.record_failure()
+        await async_runtime.run_blocking(page_cache.set_failed, "search", params["q"])
+        return documents, titles
+    search_breaker.record_success()
 
-            # Remove non-visible content
-            for tag in soup(["script", "style", "noscript"]):
-                tag.extract()
+    if results:
+        await async_runtime.run_blocking(page_cache.set_search, params["q"], results)
+    else:
+        await async_runtime.run_blocking(page_cache.set_failed, "search", params["q"])
 
-            # Extract and clean visible text
-            text = soup.get_text(separator="\n", strip=True)
-            txt.append(text)
+    # Extract top N titles and URLs
+    for result in results[:top_n]:
+        titles.append(result["title"])
+        documents.append(result["url"])
+    return documents, titles
 
-        except requests.exceptions.RequestException as e:
-            print(f"Failed to retrieve or parse content from {url}: {e}")
-            txt.append("")
 
+async def get_documents_async(product_id, top_n=1, get_recommendations=False, max_bytes=FETCH_MAX_BYTES, deadline=None):
+    """
+    Coroutine version of get_documents. Runs on the shared loop.
+    """
+    documents, titles = await search(product_id, top_n, get_recommendations, deadline)
+    txt = await fetch_texts(documents, max_bytes, deadline)
     return documents, titles, txt
 
 
+def get_documents(product_id, top_n=1, get_recommendations=False, max_bytes=FETCH_MAX_BYTES):
+    """
+    Retrieves text content from the top search results of a SearxNG search query.
+
+    Args:
+        product_id (str): A product name or ID used in the search query.
+        top_n (int, optional): Number of top search results to retrieve. Defaults to 1.
+        get_recommendations (bool, optional): If True, modifies the query to search for environmentally 
+                                              friendly alternatives. Defaults to False.
+        max_bytes (int, optional): Maximum bytes read from each page body. Defaults to FETCH_MAX_BYTES.
+
+    Returns:
+        tuple: A tuple of three lists:
+            - documents (list): URLs of retrieved documents.
+            - titles (list): Titles of the search results.
+            - txt (list): Extracted visible text from each URL.
+    """
+    return async_runtime.run(get_documents_async(product_id, top_n, get_recommendations, max_bytes))
+
+
 if __name__ == "__main__":
     # Example usage (uncomment for testing)
     # docs, titles, texts = get_documents("042100005264", top_n=2)
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for serving the assessment API with one worker process per core.
+
+Workers share nothing in memory; the assessment and page caches are SQLite files in WAL mode that
+every worker reads and writes, and cross-process leases in the assessment cache make sure a product
+is assessed by one worker at a time. Each worker is a uvicorn event loop: request handlers are
+coroutines on that loop, so a worker holds hundreds of assessments in flight without a thread each,
+and cache hits are answered while cold misses wait on the LLM.
+"""
+import os
+
+from deadline import ASSESS_DEADLINE_MAX
+
+
+bind = os.getenv("BIND", "0.0.0.0:5001")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# The app is imported in each worker rather than in the master: the event loop, the aiohttp
+# session and the SQLite connections are per process and must not be inherited across fork
+preload_app = False
+
+# Room for the longest deadline an /api/assess request may ask for
+timeout = int(ASSESS_DEADLINE_MAX) + 30
+graceful_timeout = timeout
+keepalive = 5
+
+# One line per request on stdout; set ACCESS_LOG to a file path, or to an empty string to turn it off
+accesslog = os.getenv("ACCESS_LOG", "-") or None
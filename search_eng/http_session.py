@@ -0,0 +1,34 @@
+import os
+
+import aiohttp
+
+
+# Connection pool shared by page fetches, search and LLM calls
+FETCH_POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", 100))
+FETCH_MAX_PER_HOST = int(os.getenv("FETCH_MAX_PER_HOST", 8))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", 10))
+
+_session = None
+
+
+def get_session():
+    """
+    Returns the pooled aiohttp session shared by all outgoing requests. Must be called on the shared loop.
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=FETCH_POOL_SIZE, limit_per_host=FETCH_MAX_PER_HOST, ttl_dns_cache=300)
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": "Mozilla/5.0"},
+            timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT),
+        )
+    return _session
+
+
+async def close_session():
+    """
+    Closes the pooled session, e.g. before a command-line run exits.
+    """
+    if _session is not None and not _session.closed:
+        await _session.close()
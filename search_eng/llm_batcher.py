@@ -0,0 +1,145 @@
+import os
+import re
+import asyncio
+import logging
+
+from llm_client import Completion
+
+
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", 0))
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", 8))
+
+BATCH_INSTRUCTIONS = (
+    "\n\nYou will receive several products in one message. Each product starts with a line "
+    "'### PRODUCT <n> ###'. Assess every product independently. For each product, start its answer "
+    "with the same '### PRODUCT <n> ###' line, followed by the complete evaluation in the exact format "
+    "described above, including its alternatives."
+)
+
+logger = logging.getLogger(__name__)
+
+_SECTION_RE = re.compile(r"^\s*#{3}\s*PRODUCT\s+(\d+)\s*#{3}\s*$", re.MULTILINE | re.IGNORECASE)
+
+
+def split_sections(text):
+    """
+    Splits a multi-product completion into {product number: section text}.
+    """
+    sections = {}
+    matches = list(_SECTION_RE.finditer(text))
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        end = next_match.start() if next_match else len(text)
+        sections[int(match.group(1))] = text[match.end():end].strip()
+    return sections
+
+
+class LLMBatcher:
+    """
+    Collects assessment prompts for a short window and sends them as one multi-product completion.
+
+    Every batched request repeats the same system prompt, so under bulk load sending several
+    products per completion saves prompt tokens and requests against the provider's per-minute
+    limits. Sections that are missing from the combined reply or fail is_complete are retried
+    as single completions. With a window of 0 every prompt is sent on its own.
+
+    Args:
+        complete (callable): Coroutine function (api_key, messages, deadline=None) -> completion text.
+        system_prompt (str): System prompt used for single-product completions.
+        is_complete (callable): Returns True if a product's section of the reply can be parsed.
+        window_ms (float, optional): Milliseconds to wait for more prompts after the first one.
+        max_items (int, optional): Batch size that is sent immediately without waiting for the window.
+        complete_batch (callable, optional): Used instead of complete for multi-product completions.
+        batch_system_prompt (str, optional): Used instead of system_prompt for multi-product completions,
+                                             e.g. to spell out a format that complete_batch does not enforce.
+    """
+
+    def __init__(self, complete, system_prompt, is_complete, window_ms=LLM_BATCH_WINDOW_MS, max_items=LLM_BATCH_MAX_ITEMS,
+                 complete_batch=None, batch_system_prompt=None):
+        self.complete = complete
+        self.complete_batch = complete_batch or complete
+        self.system_prompt = system_prompt
+        self.batch_system_prompt = batch_system_prompt or system_prompt
+        self.is_complete = is_complete
+        self.window = window_ms / 1000
+        self.max_items = max_items
+        self._pending = {}
+        self._timers = {}
+
+    def single_messages(self, user_content):
+        return [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": user_content}]
+
+    async def submit(self, api_key, user_content, deadline=None):
+        """
+        Returns the completion text for one product's prompt, batched with others when enabled.
+
+        Args:
+            deadline (float, optional): Seconds the caller can wait. Passed to complete for single
+                                        completions; a batched caller stops waiting after it.
+        """
+        if self.window <= 0 or self.max_items <= 1:
+            return await self.complete(api_key, self.single_messages(user_content), deadline=deadline)
+
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(api_key, [])
+        batch.append((user_content, future))
+        if len(batch) >= self.max_items:
+            self._flush(api_key)
+        elif len(batch) == 1:
+            self._timers[api_key] = asyncio.get_running_loop().call_later(self.window, self._flush, api_key)
+        if deadline is None:
+            return await future
+        # The batch carries on for the other products if this caller gives up
+        return await asyncio.wait_for(asyncio.shield(future), deadline)
+
+    def _flush(self, api_key):
+        timer = self._timers.pop(api_key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(api_key, None)
+        if batch:
+            asyncio.ensure_future(self._dispatch(api_key, batch))
+
+    async def _dispatch(self, api_key, batch):
+        if len(batch) == 1:
+            await self._single(api_key, *batch[0])
+            return
+
+        user_content = "\n\n".join(
+            f"### PRODUCT {number} ###\n{content}" for number, (content, _) in enumerate(batch, 1)
+        )
+        messages = [
+            {"role": "system", "content": self.batch_system_prompt + BATCH_INSTRUCTIONS},
+            {"role": "user", "content": user_content},
+        ]
+        try:
+            completion = await self.complete_batch(api_key, messages)
+            # Every section keeps the model and usage of the combined completion it came from
+            sections = {
+                number: Completion(section, getattr(completion, "model", None), getattr(completion, "usage", None), len(batch))
+                for number, section in split_sections(completion).items()
+            }
+        except Exception as e:
+            logger.warning("Batched completion failed, falling back to single calls: %s", e)
+            sections = {}
+
+        fallbacks = []
+        for number, (content, future) in enumerate(batch, 1):
+            section = sections.get(number)
+            if section is not None and self.is_complete(section):
+                if not future.done():
+                    future.set_result(section)
+            else:
+                fallbacks.append(self._single(api_key, content, future))
+        await asyncio.gather(*fallbacks)
+
+    async def _single(self, api_key, user_content, future):
+        if future.done():
+            return
+        try:
+            text = await self.complete(api_key, self.single_messages(user_content))
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(text)
@@ -0,0 +1,255 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+
+import aiohttp
+
+import async_runtime
+from http_session import get_session
+from metrics import stage_seconds, stage_errors, llm_tokens, llm_retries
+from rate_limiter import RateLimiter
+
+
+OPENAI_URL = os.getenv("OPENAI_URL", "https://api.openai.com/v1/chat/completions")
+# Seconds allowed for one HTTP attempt
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))
+# Seconds allowed for a whole call, including rate-limit waits and retries
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", 120))
+# Client-side limits; the provider's x-ratelimit-* headers take over once seen. 0 disables a limit.
+LLM_RPM = float(os.getenv("LLM_RPM", 0))
+LLM_TPM = float(os.getenv("LLM_TPM", 0))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 30))
+# Completion tokens reserved per call before the real usage is known
+COMPLETION_TOKEN_ESTIMATE = 500
+
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class LLMError(Exception):
+    """
+    A chat completion failed.
+
+    Args:
+        status (int, optional): HTTP status if the provider answered.
+        retry_after (float, optional): Seconds the provider asked us to wait before retrying.
+        retryable (bool, optional): Whether retrying can help. Defaults to True for network
+                                    errors and RETRYABLE_STATUSES.
+    """
+
+    def __init__(self, message, status=None, retry_after=None, retryable=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.retryable = retryable if retryable is not None else status is None or status in RETRYABLE_STATUSES
+
+
+class LLMRateLimitError(LLMError):
+    """
+    The provider answered 429, for a rate limit or an exhausted quota.
+    """
+
+
+class LLMDeadlineError(LLMError, TimeoutError):
+    """
+    The call's deadline passed before a completion arrived.
+    """
+
+
+class Completion(str):
+    """
+    Reply text of a chat completion, with the model that answered and its reported token usage.
+
+    Behaves as the plain reply string everywhere else, so callers that only need the text are
+    unaffected. batch_size is the number of products that shared the completion, and its usage.
+    """
+
+    def __new__(cls, text, model=None, usage=None, batch_size=1):
+        completion = super().__new__(cls, text)
+        completion.model = model
+        completion.usage = usage or {}
+        completion.batch_size = batch_size
+        return completion
+
+
+def parse_duration(value):
+    """
+    Parses OpenAI reset durations such as "1s", "6m0s" or "20ms" into seconds.
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_number(headers, name):
+    try:
+        return float(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def retry_after(headers):
+    """
+    Returns the seconds the provider asked us to wait, or None.
+    """
+    milliseconds = _header_number(headers, "retry-after-ms")
+    if milliseconds is not None:
+        return milliseconds / 1000
+    seconds = _header_number(headers, "retry-after")
+    if seconds is not None:
+        return seconds
+    resets = [parse_duration(headers.get(name)) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+def estimate_tokens(messages):
+    # About 4 characters per token for English text
+    return sum(len(message.get("content") or "") for message in messages) // 4 + COMPLETION_TOKEN_ESTIMATE
+
+
+class LLMClient:
+    """
+    Shared chat completion client that paces, retries and bounds every call to the model.
+
+    Calls first take a request and their estimated tokens from a RateLimiter, which is corrected
+    with the reported usage afterwards and follows the provider's x-ratelimit-* headers. 429s
+    pause all callers for the provider's reset time, so concurrent requests back off together
+    instead of retrying into the same limit. Other transient failures are retried with jittered
+    exponential backoff. Nothing is retried past the call's deadline.
+
+    Args:
+        url (str, optional): Chat completions endpoint.
+        limiter (RateLimiter, optional): Shared limiter. Defaults to one built from LLM_RPM and LLM_TPM.
+        max_retries (int, optional): Retries after the first attempt.
+        timeout (float, optional): Seconds allowed per HTTP attempt.
+        deadline (float, optional): Default seconds allowed per call.
+    """
+
+    def __init__(self, url=OPENAI_URL, limiter=None, max_retries=LLM_MAX_RETRIES, timeout=OPENAI_TIMEOUT,
+                 deadline=LLM_DEADLINE):
+        self.url = url
+        self.limiter = limiter or RateLimiter(LLM_RPM or None, LLM_TPM or None)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.deadline = deadline
+
+    def backoff(self, attempt):
+        # Full jitter keeps retries of requests that failed together from lining up again
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+    async def complete(self, api_key, messages, model, temperature=0.3, response_format=None, deadline=None):
+        """
+        Sends a chat completion and returns the reply text as a Completion.
+
+        Args:
+            deadline (float, optional): Seconds allowed for the whole call. Defaults to the client's.
+
+        Raises:
+            LLMRateLimitError: If the provider is still rate limiting when retries or the deadline run out.
+            LLMDeadlineError: If the deadline passes first.
+            LLMError: For other failures, immediately if they are not transient.
+        """
+        data = {"model": model, "messages": messages, "temperature": temperature}
+        if response_format is not None:
+            data["response_format"] = response_format
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        expires = time.monotonic() + (deadline if deadline is not None else self.deadline)
+        estimate = estimate_tokens(messages)
+
+        attempt = 0
+        while True:
+            try:
+                completion = await self._attempt(headers, data, estimate, expires)
+            except LLMError as e:
+                if isinstance(e, LLMDeadlineError):
+                    stage_errors.inc(stage="llm")
+                    raise
+                delay = e.retry_after if e.retry_after is not None else self.backoff(attempt)
+                if not e.retryable or attempt >= self.max_retries or time.monotonic() + delay >= expires:
+                    stage_errors.inc(stage="llm")
+                    raise
+                attempt += 1
+                llm_retries.inc(reason=str(e.status or "network"))
+                logger.warning("LLM call failed (%s), retry %d in %.1f s", e, attempt, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            usage = completion.get("usage") or {}
+            llm_tokens.inc(usage.get("prompt_tokens", 0), kind="prompt")
+            llm_tokens.inc(usage.get("completion_tokens", 0), kind="completion")
+            if "total_tokens" in usage:
+                self.limiter.adjust(usage["total_tokens"] - estimate)
+            return Completion(completion["choices"][0]["message"]["content"], completion.get("model", model), usage)
+
+    async def _attempt(self, headers, data, estimate, expires):
+        try:
+            await asyncio.wait_for(self.limiter.acquire(estimate), max(0.0, expires - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise LLMDeadlineError("Deadline passed while waiting for the LLM rate limit") from None
+
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineError("Deadline passed before the LLM call")
+        try:
+            with stage_seconds.time(stage="llm"):
+                async with get_session().post(
+                    self.url, headers=headers, json=data,
+                    timeout=aiohttp.ClientTimeout(total=min(self.timeout, remaining)),
+                ) as response:
+                    self._observe(response.headers)
+                    if response.status == 200:
+                        return await response.json()
+                    body = await response.text()
+        except asyncio.TimeoutError:
+            if time.monotonic() >= expires:
+                raise LLMDeadlineError("Deadline passed during the LLM call") from None
+            raise LLMError("LLM call timed out") from None
+        except aiohttp.ClientError as e:
+            raise LLMError(f"LLM call failed: {e}") from e
+
+        message = f"LLM call returned {response.status}: {body[:200]}"
+        if response.status != 429:
+            raise LLMError(message, response.status)
+        if "insufficient_quota" in body:
+            # Out of credit rather than over a rate limit; retrying cannot help
+            raise LLMRateLimitError(message, response.status, retryable=False)
+        wait = retry_after(response.headers)
+        # Jitter so the callers released together do not hit the limit together again
+        wait = (wait if wait is not None else self.backoff(0)) + random.uniform(0, LLM_BACKOFF_BASE)
+        self.limiter.pause(wait)
+        raise LLMRateLimitError(message, response.status, retry_after=wait)
+
+    def _observe(self, headers):
+        self.limiter.observe(
+            limit_requests=_header_number(headers, "x-ratelimit-limit-requests"),
+            remaining_requests=_header_number(headers, "x-ratelimit-remaining-requests"),
+            limit_tokens=_header_number(headers, "x-ratelimit-limit-tokens"),
+            remaining_tokens=_header_number(headers, "x-ratelimit-remaining-tokens"),
+        )
+
+    def complete_sync(self, api_key, messages, model, **kwargs):
+        """
+        Synchronous complete for scripts; runs on the shared event loop.
+        """
+        return async_runtime.run(self.complete(api_key, messages, model, **kwargs))
+
+
+# Shared by every caller in the process so they draw on one set of limits
+llm_client = LLMClient()
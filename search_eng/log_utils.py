@@ -0,0 +1,22 @@
+import os
+import random
+import logging
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Share of requests whose full documents and LLM replies are logged at DEBUG level
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.01))
+
+
+def configure_logging():
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def sampled(logger, level=logging.DEBUG, rate=LOG_SAMPLE_RATE):
+    """
+    Returns True if a large payload should be logged at level for this call.
+
+    Checking this before building the message keeps the cost of dumping documents and
+    replies off the hot path unless the level is enabled and the call is sampled.
+    """
+    return logger.isEnabledFor(level) and random.random() < rate
@@ -1,8 +1,9 @@
 import os
-import requests
 import re # Import the regular expression module
 from datetime import datetime, timezone
 
+from llm_client import llm_client, LLMError
+
 # This function simulates the core logic that would run on a server.
 def get_mapped_scores_from_openai(upc: str):
     """
@@ -12,9 +13,6 @@ def get_mapped_scores_from_openai(upc: str):
     if not api_key:
         raise ValueError("API_KEY environment variable not set.")
         
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-
     # NOTE: In a real application, you would scrape the URL for the text.
     # For this example, we are keeping the placeholder text.
     product_url = f"https://www.amazon.com/dp/{upc}"
@@ -30,19 +28,13 @@ def get_mapped_scores_from_openai(upc: str):
     
     query = f"The url to the product is {product_url}\nThe contents of the site are: {product_text}\nAssess the product."
 
-    data = {
-        "model": "gpt-4o-mini",
-        "messages": [{"role": "system", "content": content}, {"role": "user", "content": query}],
-        "temperature": 0.3,
-    }
+    messages = [{"role": "system", "content": content}, {"role": "user", "content": query}]
 
     try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
+        # Goes through the shared client so scripts respect the same rate limits and retries as the server
+        assessment_text = llm_client.complete_sync(api_key, messages, "gpt-4o-mini", temperature=0.3)
         
         # --- PARSING AND MAPPING LOGIC ---
-        assessment_text = response.json()["choices"][0]["message"]["content"]
-        
         # Use regular expressions to find scores like "X / 10"
         material_match = re.search(r"Material.*?:\s*(\d+)\s*/\s*10", assessment_text)
         transport_match = re.search(r"Transport.*?:\s*(\d+)\s*/\s*10", assessment_text)
@@ -65,7 +57,7 @@ def get_mapped_scores_from_openai(upc: str):
         }
         return mapped_output
 
-    except requests.exceptions.RequestException as e:
+    except LLMError as e:
         print("Error:", e)
         return {"error": str(e)}
 
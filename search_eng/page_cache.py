@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "page_cache.sqlite3")
+DEFAULT_SEARCH_TTL = 6 * 3600
+DEFAULT_PAGE_TTL = 24 * 3600
+DEFAULT_NEGATIVE_TTL = 60
+
+
+class PageCache:
+    """
+    Persistent cache of SearxNG results and extracted page text.
+
+    Search results are keyed by query and page text by URL, each with its own TTL. Page entries
+    keep the ETag and Last-Modified validators of the response they came from, so a stale page can
+    be revalidated with a conditional GET instead of being downloaded and parsed again. Failed
+    searches and fetches are remembered for a short negative TTL so dead URLs and outages are not
+    retried on every request. The SQLite file runs in WAL mode and is safe to share between server
+    processes.
+
+    Args:
+        path (str, optional): SQLite file to store entries in. Defaults to PAGE_CACHE_PATH or a file
+                              next to this module.
+        search_ttl (int, optional): Seconds search results stay fresh. Defaults to SEARCH_CACHE_TTL or 6 hours.
+        page_ttl (int, optional): Seconds page text stays fresh. Defaults to PAGE_CACHE_TTL or 24 hours.
+        negative_ttl (int, optional): Seconds a failure is remembered. Defaults to NEGATIVE_CACHE_TTL or 60.
+    """
+
+    def __init__(self, path=None, search_ttl=None, page_ttl=None, negative_ttl=None):
+        self.path = path or os.getenv("PAGE_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.search_ttl = int(search_ttl if search_ttl is not None else os.getenv("SEARCH_CACHE_TTL", DEFAULT_SEARCH_TTL))
+        self.page_ttl = int(page_ttl if page_ttl is not None else os.getenv("PAGE_CACHE_TTL", DEFAULT_PAGE_TTL))
+        self.negative_ttl = int(
+            negative_ttl if negative_ttl is not None else os.getenv("NEGATIVE_CACHE_TTL", DEFAULT_NEGATIVE_TTL)
+        )
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS searches ("
+                " query TEXT PRIMARY KEY,"
+                " results TEXT NOT NULL,"
+                " stored_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " url TEXT PRIMARY KEY,"
+                " body BLOB NOT NULL,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " stored_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS failures ("
+                " key TEXT PRIMARY KEY,"
+                " failed_at REAL NOT NULL)"
+            )
+
+    def get_search(self, query):
+        """
+        Returns the cached results list for a query, or None if it is missing or expired.
+        """
+        row = self._connect().execute(
+            "SELECT results, stored_at FROM searches WHERE query = ?", (query,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.search_ttl:
+            return None
+        return json.loads(row[0])
+
+    def set_search(self, query, results):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO searches (query, results, stored_at) VALUES (?, ?, ?)",
+                (query, json.dumps(results), time.time()),
+            )
+
+    def get_page(self, url):
+        """
+        Returns the cached page for a URL as a dict with "text", "etag", "last_modified" and
+        "fresh", or None if the URL was never cached. Stale entries are returned with fresh=False
+        so the caller can revalidate them.
+        """
+        row = self._connect().execute(
+            "SELECT body, etag, last_modified, stored_at FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, stored_at = row
+        return {
+            "text": zlib.decompress(body).decode("utf-8"),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": time.time() - stored_at <= self.page_ttl,
+        }
+
+    def set_page(self, url, text, etag=None, last_modified=None):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (url, body, etag, last_modified, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (url, zlib.compress(text.encode("utf-8")), etag, last_modified, time.time()),
+            )
+
+    def touch_page(self, url):
+        """
+        Marks a cached page as fresh again, e.g. after the server answered 304 Not Modified.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE pages SET stored_at = ? WHERE url = ?", (time.time(), url))
+
+    def has_failed(self, kind, key):
+        """
+        Returns True if a search ("search", query) or fetch ("page", url) failed within the negative TTL.
+        """
+        row = self._connect().execute(
+            "SELECT failed_at FROM failures WHERE key = ?", (f"{kind}:{key}",)
+        ).fetchone()
+        return row is not None and time.time() - row[0] <= self.negative_ttl
+
+    def set_failed(self, kind, key):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO failures (key, failed_at) VALUES (?, ?)", (f"{kind}:{key}", time.time())
+            )
+
+    def purge(self):
+        """
+        Deletes search results past their TTL and pages that have been stale for a whole extra TTL.
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM searches WHERE stored_at < ?", (now - self.search_ttl,))
+            conn.execute("DELETE FROM pages WHERE stored_at < ?", (now - 2 * self.page_ttl,))
+            conn.execute("DELETE FROM failures WHERE failed_at < ?", (now - self.negative_ttl,))
@@ -0,0 +1,117 @@
+import re
+import math
+from collections import Counter
+
+
+# Terms that point at passages the ESG assessment actually needs
+ESG_TERMS = (
+    "material materials fabric cotton organic recycled recyclable plastic bpa biodegradable compostable "
+    "packaging package refill refillable reusable disposable durable repair warranty "
+    "carbon emissions energy solar water sustainable sustainability eco friendly natural vegan cruelty "
+    "certified certification fair trade fsc gots oeko labor labour factory manufactured made origin country "
+    "sourced sourcing local supply chain ingredients chemicals toxic safety safe health brand company "
+    "price value innovation"
+).split()
+
+CHARS_PER_TOKEN = 4
+PASSAGE_WORDS = 60
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def split_passages(text, passage_words=PASSAGE_WORDS):
+    """
+    Splits extracted page text into passages of roughly passage_words words, keeping lines whole.
+    """
+    passages = []
+    current = []
+    current_words = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        current.append(line)
+        current_words += len(line.split())
+        if current_words >= passage_words:
+            passages.append("\n".join(current))
+            current = []
+            current_words = 0
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+def bm25_scores(passages, query_terms, k1=1.5, b=0.75):
+    """
+    Scores each passage against the query terms with Okapi BM25.
+    """
+    tokenized = [tokenize(passage) for passage in passages]
+    if not tokenized:
+        return []
+    avg_len = sum(len(tokens) for tokens in tokenized) / len(tokenized) or 1
+    query = Counter(query_terms)
+
+    doc_freq = Counter()
+    for tokens in tokenized:
+        doc_freq.update(set(tokens) & query.keys())
+
+    n = len(tokenized)
+    idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    scores = []
+    for tokens in tokenized:
+        counts = Counter(tokens)
+        norm = k1 * (1 - b + b * len(tokens) / avg_len)
+        score = 0.0
+        for term, term_idf in idf.items():
+            tf = counts.get(term)
+            if tf:
+                score += query[term] * term_idf * tf * (k1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def select_passages(documents, title="", token_budget=2000):
+    """
+    Picks the passages of the retrieved documents most relevant to an ESG assessment.
+
+    Passages are ranked with BM25 against ESG_TERMS and the product title (title terms count
+    double), then packed best-first until token_budget is reached. The chosen passages are
+    returned in their original document order.
+
+    Args:
+        documents (list): Extracted text of each retrieved page.
+        title (str, optional): Product title, used to favour passages about this product.
+        token_budget (int, optional): Approximate number of tokens to return.
+
+    Returns:
+        str: The selected passages joined by newlines.
+    """
+    passages = []
+    seen = set()
+    for document in documents:
+        for passage in split_passages(document):
+            # Product pages repeat the same blocks (nav, carousels) many times
+            if passage not in seen:
+                seen.add(passage)
+                passages.append(passage)
+
+    query_terms = ESG_TERMS + tokenize(title) * 2
+    scores = bm25_scores(passages, query_terms)
+    ranked = sorted(range(len(passages)), key=lambda i: scores[i], reverse=True)
+
+    char_budget = token_budget * CHARS_PER_TOKEN
+    chosen = []
+    for i in ranked:
+        if scores[i] <= 0:
+            break
+        size = len(passages[i]) + 1
+        if size > char_budget:
+            continue
+        chosen.append(i)
+        char_budget -= size
+    return "\n".join(passages[i] for i in sorted(chosen))
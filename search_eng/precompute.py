@@ -0,0 +1,193 @@
+"""
+Bulk pre-assessment of a product catalog.
+
+Runs the same retrieval and assessment pipeline as /api/assess for a list of ASINs, stores every
+result in the server's assessment cache and appends it to a JSONL file. The output file doubles
+as the checkpoint: after a crash, running the same command again skips every ASIN that already
+has a successful line and retries the ones that failed.
+
+Input is one ASIN per line, or JSONL objects with an "upc" or "asin" field.
+
+Usage (from search_eng/, with API_KEY and the usual cache settings):
+    python precompute.py top_asins.txt --output assessments.jsonl --concurrency 16 --rpm 500 --tpm 2000000
+    cat top_asins.jsonl | python precompute.py - --output assessments.jsonl
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import app
+import async_runtime
+from http_session import close_session
+from log_utils import configure_logging
+from metrics import llm_tokens
+from llm_client import llm_client
+from rate_limiter import RateLimiter
+
+
+def read_product_ids(lines):
+    """
+    Yields the distinct ASINs of plain or JSONL input lines, in input order.
+    """
+    seen = set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            record = json.loads(line)
+            product_id = record.get("upc") or record.get("asin")
+        else:
+            product_id = line
+        if product_id and product_id not in seen:
+            seen.add(product_id)
+            yield str(product_id)
+
+
+def read_checkpoint(path):
+    """
+    Returns the ASINs that already have a successful result in an earlier output file.
+    Surrogate estimates written while the LLM was unavailable do not count.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be cut short if the previous run crashed while writing it
+                continue
+            if "error" not in record and not record.get("provisional") and record.get("upc"):
+                done.add(record["upc"])
+    return done
+
+
+class Progress:
+    """
+    Counts finished products and prints throughput to stderr every interval seconds.
+    """
+
+    def __init__(self, total, interval):
+        self.total = total
+        self.interval = interval
+        self.assessed = self.cached = self.failed = 0
+        self.started = time.monotonic()
+        self.reported = self.started
+        self.tokens_at_start = self._tokens()
+
+    @staticmethod
+    def _tokens():
+        return llm_tokens.value(kind="prompt") + llm_tokens.value(kind="completion")
+
+    @property
+    def finished(self):
+        return self.assessed + self.cached + self.failed
+
+    def add(self, result):
+        setattr(self, result, getattr(self, result) + 1)
+        if time.monotonic() - self.reported >= self.interval:
+            self.report()
+
+    def report(self):
+        self.reported = time.monotonic()
+        elapsed = max(self.reported - self.started, 1e-9)
+        rate = self.finished / elapsed
+        remaining = (self.total - self.finished) / rate if rate else 0.0
+        tokens_per_minute = (self._tokens() - self.tokens_at_start) / elapsed * 60
+        print(
+            f"{self.finished}/{self.total} done ({self.assessed} assessed, {self.cached} already cached, "
+            f"{self.failed} failed) {rate:.2f}/s, {tokens_per_minute:,.0f} tokens/min, ETA {remaining / 60:.1f} min",
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+async def precompute(product_ids, output, api_key, concurrency, force, progress):
+    """
+    Assesses product_ids with concurrency workers and appends one JSON line per product to output.
+    """
+    product_ids = iter(product_ids)
+
+    async def assess(product_id):
+        if not force:
+            entry = await async_runtime.run_blocking(app.assessment_cache.get, product_id)
+            if entry is not None:
+                return "cached", entry
+        entry = await app.assessment_flights.do(
+            product_id, lambda: app.request_and_cache_sub_metrics(api_key, product_id), force=force
+        )
+        # A surrogate estimate means the LLM failed; the product is retried on the next run
+        return ("failed" if "error" in entry or entry.get("provisional") else "assessed"), entry
+
+    async def worker():
+        for product_id in product_ids:
+            try:
+                result, entry = await assess(product_id)
+            except Exception as e:
+                result, entry = "failed", {"error": str(e)}
+            output.write(json.dumps({"upc": product_id, **entry}) + "\n")
+            output.flush()
+            progress.add(result)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        await close_session()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-assess a list of ASINs into the assessment cache.")
+    parser.add_argument("input", nargs="?", default="-", help="File of ASINs (plain lines or JSONL), - for stdin")
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Products assessed at once")
+    parser.add_argument("--rpm", type=float, help="Maximum LLM requests per minute (default LLM_RPM)")
+    parser.add_argument("--tpm", type=float, help="Maximum LLM tokens per minute (default LLM_TPM)")
+    parser.add_argument("--force", action="store_true", help="Re-assess products that are already freshly cached")
+    parser.add_argument("--progress-interval", type=float, default=10, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    configure_logging()
+    api_key = os.getenv("API_KEY")
+    if not api_key:
+        parser.error("API_KEY is not set")
+
+    if args.input == "-":
+        product_ids = list(read_product_ids(sys.stdin))
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            product_ids = list(read_product_ids(f))
+
+    done = read_checkpoint(args.output)
+    pending = [product_id for product_id in product_ids if product_id not in done]
+    print(f"{len(product_ids)} products, {len(product_ids) - len(pending)} done in an earlier run, "
+          f"{len(pending)} to go", file=sys.stderr, flush=True)
+
+    if args.rpm or args.tpm:
+        # Every LLM call of the pipeline goes through the shared client, so its limiter paces the run
+        llm_client.limiter = RateLimiter(args.rpm, args.tpm)
+    progress = Progress(len(pending), args.progress_interval)
+    with open(args.output, "a+", encoding="utf-8") as output:
+        # Start on a fresh line if the previous run died in the middle of one
+        output.seek(0, os.SEEK_END)
+        if output.tell():
+            output.seek(output.tell() - 1)
+            if output.read(1) != "\n":
+                output.write("\n")
+        try:
+            async_runtime.run(precompute(
+                pending, output, api_key, max(1, args.concurrency), args.force, progress
+            ))
+        finally:
+            progress.report()
+
+    if progress.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
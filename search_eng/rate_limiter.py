@@ -0,0 +1,118 @@
+import time
+import asyncio
+
+
+class TokenBucket:
+    """
+    Bucket that refills continuously to a per-minute limit, starting full.
+
+    Args:
+        per_minute (float): Limit the bucket starts with.
+        ceiling (float, optional): Configured limit that limits reported by the provider may lower but never raise.
+    """
+
+    def __init__(self, per_minute, ceiling=None):
+        self.ceiling = float(ceiling) if ceiling else None
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount):
+        """
+        Returns the seconds until amount can be taken. Amounts above capacity only wait for a full bucket.
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= amount
+
+    def update(self, per_minute, remaining=None):
+        """
+        Adopts a limit reported by the provider, up to the ceiling, and caps the level at what it says is left.
+        """
+        self._refill()
+        if per_minute:
+            self.capacity = min(float(per_minute), self.ceiling) if self.ceiling else float(per_minute)
+            self.rate = self.capacity / 60
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+
+
+class RateLimiter:
+    """
+    Limits requests and tokens per minute, e.g. to stay within an LLM provider's quotas.
+
+    Callers wait in arrival order until both buckets hold enough for their call, so a large
+    request is not starved by a stream of small ones. Limits and remaining quota reported by the
+    provider can be fed back with observe, and pause holds every caller back after a 429.
+
+    Args:
+        requests_per_minute (float, optional): Request limit. None disables it.
+        tokens_per_minute (float, optional): Token limit. None disables it.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute) if tokens_per_minute else None
+        self._lock = None
+        self._paused_until = 0.0
+
+    async def acquire(self, tokens=0):
+        """
+        Waits until one request using about tokens tokens is allowed, then takes it from the buckets.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                wait = max(
+                    self._paused_until - time.monotonic(),
+                    self.requests.delay(1) if self.requests else 0.0,
+                    self.tokens.delay(tokens) if self.tokens else 0.0,
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(tokens)
+
+    def adjust(self, tokens):
+        """
+        Corrects the token bucket once a call's actual usage is known (positive if it used more than acquired).
+        """
+        if self.tokens:
+            self.tokens.take(tokens)
+
+    def observe(self, limit_requests=None, remaining_requests=None, limit_tokens=None, remaining_tokens=None):
+        """
+        Adapts the buckets to the provider's reported limits and remaining quota. Configured limits
+        stay the upper bound, so a quota shared with other clients is not overrun.
+        """
+        self.requests = self._observe(self.requests, limit_requests, remaining_requests)
+        self.tokens = self._observe(self.tokens, limit_tokens, remaining_tokens)
+
+    @staticmethod
+    def _observe(bucket, limit, remaining):
+        if bucket is None:
+            if not limit:
+                return None
+            bucket = TokenBucket(limit)
+        bucket.update(limit, remaining)
+        return bucket
+
+    def pause(self, seconds):
+        """
+        Holds back every caller for at least seconds, e.g. after the provider answered 429.
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
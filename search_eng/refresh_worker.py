@@ -0,0 +1,97 @@
+import os
+import heapq
+import asyncio
+import logging
+import itertools
+
+from metrics import refreshes
+
+
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", 2))
+REFRESH_QUEUE_MAX = int(os.getenv("REFRESH_QUEUE_MAX", 1000))
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshWorker:
+    """
+    Re-assesses stale products in the background, most requested first.
+
+    Every request that is served a stale entry enqueues its product. A product that is requested
+    again while it waits moves up the queue, so popular pages are refreshed before the long tail.
+    At most concurrency refreshes run at once, which keeps background work from crowding out
+    the LLM and scrape capacity that cold requests need.
+
+    Args:
+        refresh (callable): Coroutine function (key, *args) doing the refresh.
+        concurrency (int, optional): Refreshes running at once.
+        max_queued (int, optional): Products waiting before new ones are dropped.
+    """
+
+    def __init__(self, refresh, concurrency=REFRESH_CONCURRENCY, max_queued=REFRESH_QUEUE_MAX):
+        self.refresh = refresh
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self._heap = []
+        self._queued = {}
+        self._running = set()
+        self._order = itertools.count()
+        self._wakeup = None
+        self._workers = []
+
+    def __len__(self):
+        return len(self._queued)
+
+    def enqueue(self, key, *args):
+        """
+        Schedules a refresh of key, or raises its priority if it is already waiting.
+        Must be called on the event loop the workers run on.
+        """
+        if key in self._running:
+            return
+        if key in self._queued:
+            requests, _ = self._queued[key]
+            self._queued[key] = (requests + 1, args)
+        elif len(self._queued) >= self.max_queued:
+            refreshes.inc(result="dropped")
+            return
+        else:
+            self._queued[key] = (1, args)
+            refreshes.inc(result="queued")
+        # Outdated heap items are skipped when popped instead of being searched for here
+        heapq.heappush(self._heap, (-self._queued[key][0], next(self._order), key))
+        self._start()
+        self._wakeup.set()
+
+    def _start(self):
+        if self._workers:
+            return
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.concurrency)]
+
+    def _pop(self):
+        while self._heap:
+            priority, _, key = heapq.heappop(self._heap)
+            queued = self._queued.get(key)
+            if queued is not None and -priority == queued[0]:
+                del self._queued[key]
+                return key, queued[1]
+        return None
+
+    async def _work(self):
+        while True:
+            item = self._pop()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            key, args = item
+            self._running.add(key)
+            try:
+                await self.refresh(key, *args)
+                refreshes.inc(result="done")
+            except Exception as e:
+                refreshes.inc(result="error")
+                logger.warning("Background refresh of %s failed: %s", key, e)
+            finally:
+                self._running.discard(key)
@@ -0,0 +1,140 @@
+"""
+Offline regeneration of the assessment cache from the response archive.
+
+Takes the most recent archived LLM reply of every product, runs it through the current parser,
+rebuilds the recommendations from the alternatives index of the regenerated catalog and stores
+the result in the assessment cache, without a single search or LLM call. Use it after a parser
+fix or a change to how assessments are built. Entries keep the age of the reply they come from,
+so regenerated products are refreshed on the usual schedule.
+
+With --output, every product is also written as one JSON line with its scores under --weights
+(a JSON weights object, default scoring.DEFAULT_WEIGHTS).
+
+Usage (from search_eng/, with the usual cache and archive settings):
+    python rescore.py
+    python rescore.py --dry-run --output rescored.jsonl --weights weights.json
+"""
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+
+import app
+import scoring
+from alternatives_index import AlternativesIndex
+from assessment_parser import parse_assessment
+from log_utils import configure_logging
+from response_archive import ResponseArchive
+
+
+# Products scored per matrix operation for --output
+SCORE_CHUNK = 10_000
+
+
+def regenerate(records):
+    """
+    Parses archived records into cache entries.
+
+    Returns:
+        tuple: (product_id, entry, createdAt) for every record that parses completely, and the
+               product IDs whose reply is still incomplete under the current parser.
+    """
+    regenerated = []
+    failed = []
+    for record in records:
+        parsed = parse_assessment(record["completion"], record.get("followUp"))
+        if parsed.missing:
+            failed.append(record["upc"])
+            continue
+        fetched_at = datetime.fromtimestamp(record["createdAt"], timezone.utc).isoformat()
+        entry = app.build_entry(
+            parsed.sub_metrics, parsed.recommendations, record.get("title"), record.get("promptHash"),
+            record.get("skipped", []), fetched_at,
+        )
+        regenerated.append((record["upc"], entry, record["createdAt"]))
+    return regenerated, failed
+
+
+def recommend(regenerated):
+    """
+    Replaces the recommendations of regenerated entries with better-scoring similar products,
+    as request_sub_metrics does, keeping the archived reply's alternatives as the fallback.
+    """
+    index = AlternativesIndex(app.assessment_cache)
+    for product_id, entry, _ in regenerated:
+        index.add(product_id, entry)
+    for product_id, entry, _ in regenerated:
+        if entry["title"]:
+            similar = index.similar(entry["title"], exclude=product_id)
+            if similar:
+                entry["recommendations"] = index.recommend(similar, entry["subMetrics"], fallback=entry["recommendations"])
+
+
+def store(regenerated):
+    """
+    Writes regenerated entries to the assessment cache and returns how many changed their scores.
+    """
+    changed = 0
+    for product_id, entry, created_at in regenerated:
+        previous, age, _ = app.assessment_cache.get_with_age(product_id)
+        stored_at = created_at
+        if previous is not None:
+            changed += previous.get("subMetrics") != entry["subMetrics"]
+            # A reused prompt refreshed the previous entry without a new reply; keep that freshness
+            if previous.get("fingerprint") == entry["fingerprint"]:
+                stored_at = max(created_at, time.time() - age)
+        else:
+            changed += 1
+        app.assessment_cache.set(product_id, entry, partial=bool(entry["skipped"]), stored_at=stored_at)
+    return changed
+
+
+def write_scores(regenerated, weights, output):
+    for start in range(0, len(regenerated), SCORE_CHUNK):
+        chunk = regenerated[start:start + SCORE_CHUNK]
+        _, scores = scoring.score_catalog(((product_id, entry) for product_id, entry, _ in chunk), [weights])
+        for (product_id, entry, _), row in zip(chunk, scores[:, 0]):
+            category_scores = {category: round(value) for category, value in zip(scoring.CATEGORIES, row.tolist())}
+            output.write(json.dumps({"upc": product_id, **category_scores, "recommendations": entry["recommendations"]}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate cached assessments from the archived LLM replies.")
+    parser.add_argument("--archive", help="Archive directory (default RESPONSE_ARCHIVE_DIR)")
+    parser.add_argument("--dry-run", action="store_true", help="Do not write to the assessment cache")
+    parser.add_argument("--output", help="Write every product's scores to this JSONL file")
+    parser.add_argument("--weights", help="JSON file of weights for --output (default scoring.DEFAULT_WEIGHTS)")
+    args = parser.parse_args()
+
+    configure_logging()
+    weights = None
+    if args.weights:
+        with open(args.weights, encoding="utf-8") as f:
+            weights = json.load(f)
+        try:
+            scoring.normalize_weights(weights)
+        except ValueError as e:
+            parser.error(f"--weights: {e}")
+
+    started = time.monotonic()
+    archive = ResponseArchive(args.archive)
+    regenerated, failed = regenerate(archive.latest_records())
+    recommend(regenerated)
+    changed = 0 if args.dry_run else store(regenerated)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            write_scores(regenerated, weights, output)
+
+    print(
+        f"{len(regenerated) + len(failed)} archived products, {len(regenerated)} regenerated"
+        f"{'' if args.dry_run else f' ({changed} with new scores)'}, {len(failed)} still incomplete "
+        f"in {time.monotonic() - started:.1f} s",
+        file=sys.stderr,
+    )
+    if failed:
+        print("Incomplete: " + ", ".join(failed[:20]) + (" ..." if len(failed) > 20 else ""), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import os
+import gzip
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_archive")
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseArchive:
+    """
+    Append-only archive of every raw LLM completion, so assessments can be regenerated offline.
+
+    Records are JSON objects holding the product, the completion text, the prompt and its hash,
+    the model and the token usage. Each record is written as its own gzip member to the end of a
+    segment file; concatenated members are still one valid .jsonl.gz, so a segment can be read
+    with gzip.open or zcat, and a single record can be read back by its offset. Every process
+    writes its own segments and starts a new one after segment_bytes. A SQLite index (WAL mode)
+    locates each product's records by time.
+
+    Args:
+        directory (str, optional): Directory of the segments and the index. Defaults to
+                                   RESPONSE_ARCHIVE_DIR or a directory next to this module.
+        segment_bytes (int, optional): Size after which a new segment is started. Defaults to
+                                       RESPONSE_ARCHIVE_SEGMENT_BYTES or 64 MB.
+    """
+
+    def __init__(self, directory=None, segment_bytes=None):
+        self.directory = directory or os.getenv("RESPONSE_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+        self.segment_bytes = int(
+            segment_bytes if segment_bytes is not None else os.getenv("RESPONSE_ARCHIVE_SEGMENT_BYTES", DEFAULT_SEGMENT_BYTES)
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_pid = None
+        self._segment_count = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " id INTEGER PRIMARY KEY,"
+                " product_id TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " segment TEXT NOT NULL,"
+                " offset INTEGER NOT NULL,"
+                " length INTEGER NOT NULL,"
+                " prompt_hash TEXT,"
+                " model TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_product ON responses (product_id, created_at)")
+
+    def _open_segment(self):
+        # Segments are per process, so forked workers never interleave writes in one file
+        if self._segment is not None and self._segment_pid == os.getpid():
+            if self._segment.tell() < self.segment_bytes:
+                return self._segment
+            self._segment.close()
+        self._segment_count += 1
+        name = time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + f"-{os.getpid()}-{self._segment_count}.jsonl.gz"
+        self._segment = open(os.path.join(self.directory, name), "ab")
+        self._segment_pid = os.getpid()
+        return self._segment
+
+    def append(self, product_id, completion, prompt, prompt_hash, **fields):
+        """
+        Archives one completion for a product and returns the stored record.
+
+        Args:
+            completion (str): Raw reply text. The model and usage of an llm_client.Completion are kept.
+            prompt (str): User message the completion answers.
+            prompt_hash (str): Fingerprint of the full prompt, as stored with the assessment.
+            **fields: Other context to keep with the record, e.g. the product title.
+        """
+        record = {
+            "upc": product_id,
+            "createdAt": time.time(),
+            "model": getattr(completion, "model", None),
+            "usage": getattr(completion, "usage", None) or {},
+            "batchSize": getattr(completion, "batch_size", 1),
+            "promptHash": prompt_hash,
+            "prompt": prompt,
+            "completion": str(completion),
+            **fields,
+        }
+        data = gzip.compress((json.dumps(record) + "\n").encode("utf-8"))
+        with self._lock:
+            segment = self._open_segment()
+            offset = segment.tell()
+            segment.write(data)
+            segment.flush()
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT INTO responses (product_id, created_at, segment, offset, length, prompt_hash, model)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (product_id, record["createdAt"], os.path.basename(segment.name), offset, len(data),
+                     prompt_hash, record["model"]),
+                )
+        return record
+
+    def _read(self, segment, offset, length):
+        with open(os.path.join(self.directory, segment), "rb") as f:
+            f.seek(offset)
+            return json.loads(gzip.decompress(f.read(length)))
+
+    def history(self, product_id, since=None, until=None):
+        """
+        Returns a product's archived records between two Unix times, oldest first.
+        """
+        rows = self._connect().execute(
+            "SELECT segment, offset, length FROM responses"
+            " WHERE product_id = ? AND created_at >= ? AND created_at <= ? ORDER BY created_at",
+            (product_id, since or 0, until if until is not None else float("inf")),
+        ).fetchall()
+        return [self._read(*row) for row in rows]
+
+    def latest(self, product_id):
+        """
+        Returns a product's most recent archived record, or None.
+        """
+        row = self._connect().execute(
+            "SELECT segment, offset, length FROM responses WHERE product_id = ? ORDER BY created_at DESC LIMIT 1",
+            (product_id,),
+        ).fetchone()
+        return self._read(*row) if row is not None else None
+
+    def latest_records(self):
+        """
+        Yields the most recent record of every archived product, reading the segments in order.
+        """
+        # SQLite fills bare columns from the row holding the MAX
+        rows = sorted(
+            (segment, offset, length)
+            for segment, offset, length, _ in self._connect().execute(
+                "SELECT segment, offset, length, MAX(created_at) FROM responses GROUP BY product_id"
+            )
+        )
+        f = None
+        try:
+            for segment, offset, length in rows:
+                if f is None or os.path.basename(f.name) != segment:
+                    if f is not None:
+                        f.close()
+                    f = open(os.path.join(self.directory, segment), "rb")
+                f.seek(offset)
+                yield json.loads(gzip.decompress(f.read(length)))
+        finally:
+            if f is not None:
+                f.close()
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(".jsonl.gz"))
+
+    def scan(self):
+        """
+        Yields every archived record, segment by segment, without loading a whole segment in memory.
+        A record cut short by a crash ends its segment's scan.
+        """
+        for name in self.segments():
+            try:
+                with gzip.open(os.path.join(self.directory, name), "rt", encoding="utf-8") as f:
+                    for line in f:
+                        yield json.loads(line)
+            except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+                logger.warning("Skipping the damaged end of archive segment %s: %s", name, e)
@@ -0,0 +1,192 @@
+import math
+import numpy as np
+
+
+DEFAULT_WEIGHTS = {
+    "environmental": {"ghg": 35, "material": 15, "water": 10, "packaging": 20, "eol": 20},
+    "social": {"labour": 10, "safety": 10, "trade": 20, "sourcing": 20, "community": 20, "health": 20},
+    "governance": {"affordability": 20, "circular": 25, "local": 30, "resilience": 15, "innovation": 10}
+}
+
+CATEGORIES = tuple(DEFAULT_WEIGHTS)
+# Column order of sub-metric matrices and row order of weight matrices
+METRIC_KEYS = tuple((category, name) for category, metrics in DEFAULT_WEIGHTS.items() for name in metrics)
+# Column slice of each category within METRIC_KEYS
+CATEGORY_SLICES = {}
+_start = 0
+for _category, _metrics in DEFAULT_WEIGHTS.items():
+    CATEGORY_SLICES[_category] = slice(_start, _start + len(_metrics))
+    _start += len(_metrics)
+
+
+def normalize_weights(custom_weights):
+    """
+    Validates a weights object and fills in and rescales it.
+
+    Missing categories or metrics take their DEFAULT_WEIGHTS value, and each category is rescaled
+    to sum to 100 so sliders that do not add up exactly still produce 0-100 scores.
+
+    Raises:
+        ValueError: If the weights are not an object of objects of non-negative numbers, or a
+                    category sums to 0.
+    """
+    if custom_weights is None:
+        custom_weights = {}
+    if not isinstance(custom_weights, dict):
+        raise ValueError("weights must be an object")
+
+    normalized = {}
+    for category, defaults in DEFAULT_WEIGHTS.items():
+        weights = custom_weights.get(category, defaults)
+        if not isinstance(weights, dict):
+            raise ValueError(f"weights.{category} must be an object")
+        values = {}
+        for name, default in defaults.items():
+            value = weights.get(name, default)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+                raise ValueError(f"weights.{category}.{name} must be a non-negative number")
+            values[name] = value
+        total = sum(values.values())
+        if total <= 0:
+            raise ValueError(f"weights.{category} must not all be 0")
+        normalized[category] = {name: value * 100 / total for name, value in values.items()}
+    return normalized
+
+
+def weights_matrix(profiles):
+    """
+    Stacks weight profiles into a 16 x profiles matrix of fractions (each category column block sums to 1).
+    """
+    matrix = np.empty((len(METRIC_KEYS), len(profiles)))
+    for column, profile in enumerate(profiles):
+        normalized = normalize_weights(profile)
+        matrix[:, column] = [normalized[category][name] / 100 for category, name in METRIC_KEYS]
+    return matrix
+
+
+def sub_metric_vector(sub_metrics):
+    """
+    Returns a sub-metric dict (keyed like DEFAULT_WEIGHTS) as 16 float32 values in METRIC_KEYS order.
+    """
+    return np.array([sub_metrics[category][name] for category, name in METRIC_KEYS], dtype=np.float32)
+
+
+def sub_metric_matrix(entries):
+    """
+    Stacks sub-metric dicts (keyed like DEFAULT_WEIGHTS) into a products x 16 matrix.
+    """
+    return np.array(
+        [[sub_metrics[category][name] for category, name in METRIC_KEYS] for sub_metrics in entries], dtype=float
+    ).reshape(len(entries), len(METRIC_KEYS))
+
+
+def score_matrix(sub_metrics, weights):
+    """
+    Scores every product against every weight profile in one batched operation.
+
+    Args:
+        sub_metrics (np.ndarray): products x 16 matrix of 1-10 sub-metric scores.
+        weights (np.ndarray): 16 x profiles matrix from weights_matrix.
+
+    Returns:
+        np.ndarray: products x profiles x 3 array of 0-100 scores in CATEGORIES order.
+    """
+    scores = np.empty((sub_metrics.shape[0], weights.shape[1], len(CATEGORIES)))
+    for index, category in enumerate(CATEGORIES):
+        columns = CATEGORY_SLICES[category]
+        scores[:, :, index] = sub_metrics[:, columns] @ weights[columns, :]
+    return scores * 10
+
+
+def score(sub_metrics, custom_weights):
+    """
+    Scores one product against one weights object.
+
+    Returns:
+        dict: 0-100 score per category.
+    """
+    scores = score_matrix(sub_metric_matrix([sub_metrics]), weights_matrix([custom_weights]))[0, 0]
+    return dict(zip(CATEGORIES, scores.tolist()))
+
+
+class SubMetricCatalog:
+    """
+    Materialised products x 16 sub-metric matrix, so re-weighting a whole catalog is a single
+    matrix product instead of a pass over every product's dicts.
+
+    Rows are set in place as assessments are stored and the matrix grows by doubling. Load one
+    with AssessmentCache.catalog(), which builds it from the packed sub-metrics stored with each
+    entry without decoding the entries.
+
+    Args:
+        product_ids (list, optional): Product ID of each row of matrix.
+        matrix (np.ndarray, optional): products x 16 float32 sub-metrics in METRIC_KEYS order.
+    """
+
+    def __init__(self, product_ids=(), matrix=None):
+        self.product_ids = list(product_ids)
+        self._rows = {product_id: row for row, product_id in enumerate(self.product_ids)}
+        if matrix is None:
+            matrix = np.empty((0, len(METRIC_KEYS)), dtype=np.float32)
+        self._matrix = np.asarray(matrix, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    @property
+    def matrix(self):
+        return self._matrix[:len(self.product_ids)]
+
+    def set(self, product_id, sub_metrics):
+        """
+        Stores a product's sub-metrics (a dict keyed like DEFAULT_WEIGHTS or a vector from sub_metric_vector).
+        """
+        vector = sub_metrics if isinstance(sub_metrics, np.ndarray) else sub_metric_vector(sub_metrics)
+        row = self._rows.get(product_id)
+        if row is None:
+            row = len(self.product_ids)
+            if row == self._matrix.shape[0]:
+                grown = np.empty((max(16, 2 * row), len(METRIC_KEYS)), dtype=np.float32)
+                grown[:row] = self._matrix[:row]
+                self._matrix = grown
+            self._rows[product_id] = row
+            self.product_ids.append(product_id)
+        self._matrix[row] = vector
+
+    def remove(self, product_id):
+        # The last row moves into the gap, so rows stay contiguous
+        row = self._rows.pop(product_id, None)
+        if row is None:
+            return
+        last = len(self.product_ids) - 1
+        if row != last:
+            moved = self.product_ids[last]
+            self._matrix[row] = self._matrix[last]
+            self.product_ids[row] = moved
+            self._rows[moved] = row
+        self.product_ids.pop()
+
+    def score(self, profiles):
+        """
+        Scores every product against a list of weight profiles.
+
+        Returns:
+            tuple: The product IDs and their products x profiles x 3 score array, as score_catalog.
+        """
+        return list(self.product_ids), score_matrix(self.matrix, weights_matrix(profiles))
+
+
+def score_catalog(items, profiles):
+    """
+    Scores (product_id, entry) pairs, e.g. AssessmentCache.items(), against a list of weight
+    profiles. For the whole cached catalog, AssessmentCache.catalog() avoids decoding every entry.
+
+    Returns:
+        tuple: The product IDs and their products x profiles x 3 score array.
+    """
+    product_ids = []
+    entries = []
+    for product_id, entry in items:
+        product_ids.append(product_id)
+        entries.append(entry["subMetrics"])
+    return product_ids, score_matrix(sub_metric_matrix(entries), weights_matrix(profiles))
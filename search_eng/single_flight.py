@@ -0,0 +1,95 @@
+import os
+import time
+import socket
+import asyncio
+
+from async_runtime import run_blocking
+
+
+# Leases are renewed every third of their TTL while the work runs, so the TTL only bounds how
+# long a crashed worker's products wait before another worker takes over
+LEASE_TTL = float(os.getenv("SINGLE_FLIGHT_LEASE_TTL", 30))
+LEASE_POLL_INTERVAL = float(os.getenv("SINGLE_FLIGHT_POLL_INTERVAL", 0.25))
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key so the work runs once.
+
+    Within a process, the first caller for a key starts the work and later callers await the
+    same task. Across processes, a lease in the shared assessment cache decides which worker
+    does the work and renews the lease until it is done; the others poll the cache until the
+    result lands or the lease lapses because its holder died. Whatever the worker stores after
+    a caller started waiting is that caller's result, partial or not.
+
+    Args:
+        cache (AssessmentCache, optional): Shared store used for cross-process leases. Without it
+                                           coalescing is in-process only.
+        lease_ttl (float, optional): Seconds a lease outlives its last renewal before others may take over.
+        poll_interval (float, optional): Seconds between cache checks while another worker holds the lease.
+    """
+
+    def __init__(self, cache=None, lease_ttl=LEASE_TTL, poll_interval=LEASE_POLL_INTERVAL):
+        self.cache = cache
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self._inflight = {}
+
+    @property
+    def owner(self):
+        # Resolved per call so workers forked after construction get distinct owners
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    async def do(self, key, fn, force=False):
+        """
+        Returns the result of fn() for key, sharing one call among all concurrent callers.
+
+        Args:
+            key (str): Product ID or other key identifying the work.
+            fn (callable): Coroutine function doing the work. When a cache is set it should return
+                           the entry it stored so other processes can pick it up from the cache.
+            force (bool, optional): Run fn() even if the cache already holds an entry for key.
+                                    Callers still join a call for key already in flight here.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, fn, force))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A caller giving up must not cancel the work the other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _stored(self, key, since, force):
+        # A forced call only takes a result stored since it started, not the entry it means to replace
+        entry = await run_blocking(self.cache.get, key, since=since)
+        if entry is None and not force:
+            entry = await run_blocking(self.cache.get, key)
+        return entry
+
+    async def _run(self, key, fn, force=False):
+        if self.cache is None:
+            return await fn()
+
+        started = time.time()
+        while not await run_blocking(self.cache.acquire_lease, key, self.owner, self.lease_ttl):
+            await asyncio.sleep(self.poll_interval)
+            entry = await self._stored(key, started, force)
+            if entry is not None:
+                return entry
+
+        heartbeat = asyncio.ensure_future(self._renew(key))
+        try:
+            # Another worker may have finished between our cache miss and taking the lease
+            entry = await self._stored(key, started, force)
+            if entry is not None:
+                return entry
+            return await fn()
+        finally:
+            heartbeat.cancel()
+            await run_blocking(self.cache.release_lease, key, self.owner)
+
+    async def _renew(self, key):
+        # Work without a deadline (refreshes, precompute) can run for minutes of LLM retries
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            await run_blocking(self.cache.acquire_lease, key, self.owner, self.lease_ttl)
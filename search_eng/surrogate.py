@@ -0,0 +1,147 @@
+import os
+import json
+import math
+import time
+import zlib
+import random
+import logging
+from collections import Counter
+
+import numpy as np
+
+import scoring
+from assessment_parser import YES_NO_METRICS, YES_SCORE, NO_SCORE
+from passages import tokenize
+
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "surrogate_model.npz")
+# Hashed feature dimensions; collisions are rare enough at 2^18 for product page vocabularies
+DEFAULT_FEATURES = 2 ** 18
+
+logger = logging.getLogger(__name__)
+
+
+def features(text, n_features=DEFAULT_FEATURES):
+    """
+    Hashes the word unigrams and bigrams of a text into a sparse, L2-normalized feature vector.
+
+    Returns:
+        tuple: Feature indices and their values, as numpy arrays.
+    """
+    tokens = tokenize(text)
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    counts = Counter()
+    for gram in grams:
+        h = zlib.crc32(gram.encode("utf-8"))
+        # The top bit signs the feature, so colliding grams tend to cancel out instead of adding up
+        counts[(h & (n_features - 1), -1.0 if h & 0x80000000 else 1.0)] += 1
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    values = {}
+    for (index, sign), count in counts.items():
+        values[index] = values.get(index, 0.0) + sign * (1 + math.log(count))
+    indices = np.fromiter(values, dtype=np.int64, count=len(values))
+    data = np.fromiter(values.values(), dtype=np.float32, count=len(values))
+    norm = np.linalg.norm(data)
+    return indices, data / norm if norm else data
+
+
+def target_vector(sub_metrics):
+    return np.array([sub_metrics[category][name] for category, name in scoring.METRIC_KEYS], dtype=np.float32)
+
+
+class SurrogateModel:
+    """
+    Sparse linear model that estimates the 16 sub-metric scores from a product's retrieved text.
+
+    Trained offline (train_surrogate.py) on the prompts and parsed replies of the response
+    archive, it answers in about a millisecond on the CPU. Its estimates are approximate and only
+    used as provisional assessments: shown while the LLM works, or when the LLM is unavailable.
+
+    Args:
+        weights (np.ndarray): n_features x 16 weights, rows in feature order, columns in scoring.METRIC_KEYS order.
+        bias (np.ndarray): 16 intercepts.
+        info (dict, optional): Training metadata, e.g. the number of examples and the held-out error.
+    """
+
+    def __init__(self, weights, bias, info=None):
+        self.weights = weights
+        self.bias = bias
+        self.info = info or {}
+
+    @property
+    def n_features(self):
+        return self.weights.shape[0]
+
+    def predict_vector(self, text):
+        indices, values = features(text, self.n_features)
+        return self.bias + values @ self.weights[indices]
+
+    def predict(self, text):
+        """
+        Returns estimated sub-metrics keyed like scoring.DEFAULT_WEIGHTS, as 1-10 integers like parsed replies.
+        """
+        sub_metrics = {}
+        for (category, name), value in zip(scoring.METRIC_KEYS, self.predict_vector(text).tolist()):
+            if (category, name) in YES_NO_METRICS:
+                score = YES_SCORE if value >= (YES_SCORE + NO_SCORE) / 2 else NO_SCORE
+            else:
+                score = min(10, max(1, round(value)))
+            sub_metrics.setdefault(category, {})[name] = score
+        return sub_metrics
+
+    @classmethod
+    def train(cls, examples, n_features=DEFAULT_FEATURES, epochs=5, learning_rate=0.5, l2=1e-6, seed=0):
+        """
+        Fits the model with AdaGrad on squared error.
+
+        Args:
+            examples (list): (text, sub_metrics) pairs.
+        """
+        rows = [features(text, n_features) for text, _ in examples]
+        targets = np.stack([target_vector(sub_metrics) for _, sub_metrics in examples])
+        bias = targets.mean(axis=0)
+        weights = np.zeros((n_features, len(scoring.METRIC_KEYS)), dtype=np.float32)
+        squared_gradients = np.full(n_features, 1e-8, dtype=np.float32)
+
+        order = list(range(len(rows)))
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(order)
+            for i in order:
+                indices, values = rows[i]
+                if not len(indices):
+                    continue
+                error = bias + values @ weights[indices] - targets[i]
+                gradient = np.outer(values, error) + l2 * weights[indices]
+                squared_gradients[indices] += (gradient ** 2).mean(axis=1)
+                weights[indices] -= learning_rate * gradient / np.sqrt(squared_gradients[indices])[:, None]
+        return cls(weights, bias.astype(np.float32), {"examples": len(examples), "trainedAt": time.time()})
+
+    def save(self, path):
+        # Written next to the target and renamed, so running servers never load a half-written file
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, weights=self.weights, bias=self.bias, info=np.array(json.dumps(self.info)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["weights"], data["bias"], json.loads(str(data["info"])))
+
+
+def load_surrogate(path=None):
+    """
+    Loads the trained model from path (default SURROGATE_MODEL_PATH), or returns None if there is none yet.
+    """
+    path = path or os.getenv("SURROGATE_MODEL_PATH", DEFAULT_MODEL_PATH)
+    if not os.path.exists(path):
+        return None
+    try:
+        model = SurrogateModel.load(path)
+    except Exception:
+        logger.exception("Could not load the surrogate model from %s", path)
+        return None
+    logger.info("Loaded surrogate model trained on %s examples", model.info.get("examples"))
+    return model
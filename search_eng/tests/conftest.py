@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+
+# The modules live flat in search_eng/ and read their cache paths at import time, so the path and
+# throwaway cache locations are set up before any test imports them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_cache_dir = tempfile.mkdtemp(prefix="search_eng_tests_")
+os.environ.setdefault("ASSESSMENT_CACHE_PATH", os.path.join(_cache_dir, "assessments.sqlite3"))
+os.environ.setdefault("PAGE_CACHE_PATH", os.path.join(_cache_dir, "pages.sqlite3"))
+os.environ.setdefault("RESPONSE_ARCHIVE_DIR", os.path.join(_cache_dir, "archive"))
+
+
+@pytest.fixture
+def sub_metrics():
+    """
+    Returns a function building a sub-metric dict keyed like scoring.DEFAULT_WEIGHTS, every
+    metric set to value unless overridden as category_name=score.
+    """
+    import scoring
+
+    def build(value=5, **overrides):
+        return {
+            category: {name: overrides.get(f"{category}_{name}", value) for name in metrics}
+            for category, metrics in scoring.DEFAULT_WEIGHTS.items()
+        }
+
+    return build
+
+
+@pytest.fixture
+def cache(tmp_path):
+    from assessment_cache import AssessmentCache
+
+    return AssessmentCache(path=str(tmp_path / "assessments.sqlite3"), ttl=3600, max_entries=100)
+
+
+@pytest.fixture
+def serve():
+    """
+    Returns an async context manager serving an aiohttp.web.Application on a free local port,
+    yielding its base URL. Use it inside the coroutine a test runs.
+    """
+    import contextlib
+    from aiohttp import web
+
+    @contextlib.asynccontextmanager
+    async def start(app):
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            await runner.cleanup()
+
+    return start
+
+
+@pytest.fixture
+def run_async():
+    """
+    Returns a function running a coroutine to completion on a new loop, closing the pooled
+    aiohttp session bound to that loop afterwards.
+    """
+    import asyncio
+    from http_session import close_session
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await close_session()
+
+        return asyncio.run(main())
+
+    return run
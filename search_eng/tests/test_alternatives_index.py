@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from alternatives_index import AlternativesIndex, MAX_ALTERNATIVES, product_scores
+
+
+def entry(sub_metrics, title, score=5, **extra):
+    return {"subMetrics": sub_metrics(score), "recommendations": [], "title": title, **extra}
+
+
+@pytest.fixture
+def index(cache, sub_metrics):
+    index = AlternativesIndex(cache, min_similarity=0.3)
+    index.add("STEEL", entry(sub_metrics, "Stainless Steel Water Bottle 750ml", 8))
+    index.add("GLASS", entry(sub_metrics, "Glass Water Bottle with Bamboo Lid", 6))
+    index.add("PLASTIC", entry(sub_metrics, "Plastic Water Bottle 1L", 3))
+    index.add("SHIRT", entry(sub_metrics, "Organic Cotton T-Shirt", 9))
+    return index
+
+
+def test_similar_titles_are_found_most_similar_first(index):
+    similar = index.similar("Insulated Stainless Steel Bottle")
+    assert [product["upc"] for product in similar][0] == "STEEL"
+    assert "SHIRT" not in [product["upc"] for product in similar]
+    assert similar[0]["scores"] == pytest.approx({"environmental": 80, "social": 80, "governance": 80})
+
+
+def test_the_product_itself_is_excluded(index):
+    upcs = [product["upc"] for product in index.similar("Stainless Steel Water Bottle 750ml", exclude="STEEL")]
+    assert "STEEL" not in upcs
+    assert {"GLASS", "PLASTIC"} <= set(upcs)
+
+
+def test_unknown_and_empty_titles_match_nothing(index):
+    assert index.similar("Cordless Drill") == []
+    assert index.similar("") == []
+    assert AlternativesIndex(None).similar("Water Bottle") == []
+
+
+def test_recommendations_only_score_better_best_first(index, sub_metrics):
+    similar = index.similar("Water Bottle")
+    recommendations = index.recommend(similar, sub_metrics(5))
+    assert [reco["upc"] for reco in recommendations] == ["STEEL", "GLASS"]
+    assert recommendations[0]["product_name"] == "Stainless Steel Water Bottle 750ml"
+    assert recommendations[0]["product_score"] == 80
+
+
+def test_recommendations_are_filled_up_from_the_fallback(index, sub_metrics):
+    fallback = [{"product_name": f"LLM pick {i}"} for i in range(5)]
+    recommendations = index.recommend(index.similar("Water Bottle"), sub_metrics(5), fallback=fallback)
+    assert len(recommendations) == MAX_ALTERNATIVES
+    assert recommendations[-1] == {"product_name": "LLM pick 0"}
+
+
+def test_re_adding_a_product_replaces_it(index, sub_metrics):
+    index.add("STEEL", entry(sub_metrics, "Cast Iron Skillet", 8))
+    assert "STEEL" not in [product["upc"] for product in index.similar("Steel Bottle")]
+    assert index.similar("Iron Skillet")[0]["upc"] == "STEEL"
+    assert len(index) == 4
+
+
+def test_entries_without_title_or_scores_are_not_indexed(cache, sub_metrics):
+    index = AlternativesIndex(cache)
+    index.add("A", {"subMetrics": sub_metrics(5), "recommendations": []})
+    index.add("B", {"error": "No search results found for the product.", "title": "Bottle"})
+    assert len(index) == 0
+
+
+def test_reload_loads_llm_assessments_from_the_cache(cache, sub_metrics):
+    cache.set("STEEL", entry(sub_metrics, "Steel Water Bottle", 8))
+    cache.set("ESTIMATE", entry(sub_metrics, "Copper Water Bottle", 9, provisional=True), partial=True)
+    cache.set("UNTITLED", {"subMetrics": sub_metrics(9), "recommendations": []})
+    index = AlternativesIndex(cache, reload_interval=3600)
+
+    async def main():
+        index.reload_if_due()
+        await index._reloading
+        # Not due again until reload_interval has passed
+        index.reload_if_due()
+        return index._reloading
+
+    assert asyncio.run(main()) is None
+    assert len(index) == 1
+    similar = index.similar("Water Bottle")
+    assert [product["upc"] for product in similar] == ["STEEL"]
+    assert similar[0]["overall"] == pytest.approx(product_scores(sub_metrics(8))[1])
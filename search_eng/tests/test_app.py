@@ -0,0 +1,371 @@
+import json
+import time
+import asyncio
+import itertools
+
+import pytest
+
+import app as app_module
+from assessment_parser import METRIC_LABELS, YES_NO_METRICS
+from llm_client import LLMError
+from refresh_worker import RefreshWorker
+
+
+_ids = itertools.count()
+
+
+def product_id():
+    # The app's caches are module level and shared by every test, so each test assesses its own products
+    return f"TEST{next(_ids):04d}-{time.time_ns()}"
+
+
+def reply(score=7):
+    lines = [f"- {label}: {'yes' if key in YES_NO_METRICS else score}" for label, key in METRIC_LABELS.items()]
+    return "\n".join(lines) + '\nALT: [{"product_name": "Glass bottle", "product_score": 80, "reco_reason": "Reusable"}]'
+
+
+class FakeLLM:
+    """
+    Stands in for the LLM batcher: answers every submission with reply(), after an optional delay.
+    """
+
+    def __init__(self, text=None, delay=0.0):
+        self.text = text if text is not None else reply()
+        self.delay = delay
+        self.calls = []
+
+    async def submit(self, api_key, user_content, deadline=None):
+        self.calls.append(user_content)
+        await asyncio.sleep(self.delay)
+        return self.text
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = FakeLLM()
+    monkeypatch.setenv("API_KEY", "test")
+    monkeypatch.setattr(app_module.llm_batcher, "submit", fake.submit)
+    monkeypatch.setattr(app_module, "surrogate_model", None)
+    # Background refreshes run on the loop of the test that queued them
+    monkeypatch.setattr(app_module, "refresh_worker", RefreshWorker(app_module.refresh_assessment))
+
+    async def search(product_id, top_n=1, get_recommendations=False, deadline=None):
+        return [f"http://shop.test/{product_id}"], [f"Steel bottle {product_id}"]
+
+    async def fetch_texts(urls, max_bytes=None, deadline=None):
+        return ["Stainless steel bottle, recyclable packaging, made in Canada."] * len(urls)
+
+    async def no_documents(*args, **kwargs):
+        return [], [], []
+
+    monkeypatch.setattr(app_module, "search", search)
+    monkeypatch.setattr(app_module, "fetch_texts", fetch_texts)
+    monkeypatch.setattr(app_module, "get_documents_async", no_documents)
+    return fake
+
+
+def post(path, body):
+    async def main():
+        response = await app_module.app.test_client().post(path, json=body)
+        return response.status_code, await response.get_json()
+
+    return asyncio.run(main())
+
+
+def test_assessment_is_cached_and_reweighted_without_the_llm(llm):
+    upc = product_id()
+    status, first = post("/api/assess", {"upc": upc, "weights": {}})
+    assert status == 200
+    assert first["environmentalScore"] == 70
+    assert first["cached"] is False
+    assert first["recommendations"][0]["product_name"] == "Glass bottle"
+
+    weights = {"social": {"labour": 100, "safety": 0, "trade": 0, "sourcing": 0, "community": 0, "health": 0}}
+    status, second = post("/api/assess", {"upc": upc, "weights": weights})
+    assert status == 200
+    assert second["cached"] is True
+    # Fair Labour "yes" scores 10, so a labour-only weighting gives 100
+    assert second["socialScore"] == 100
+    assert len(llm.calls) == 1
+
+
+@pytest.mark.parametrize("body, message", [
+    ({"weights": {}}, "upc is missing"),
+    ({"upc": "X", "weights": {"social": {"labour": -1}}}, "weights.social.labour must be a non-negative number"),
+    ({"upc": "X", "deadline": 0}, "deadline must be a positive number of seconds"),
+])
+def test_invalid_requests_are_rejected(llm, body, message):
+    assert post("/api/assess", body) == (400, {"error": message})
+    assert llm.calls == []
+
+
+def test_missing_api_key(llm, monkeypatch):
+    monkeypatch.delenv("API_KEY")
+    status, body = post("/api/assess", {"upc": product_id()})
+    assert status == 500
+
+
+def test_cache_hit_is_answered_while_a_miss_waits_on_the_llm(llm):
+    cached = product_id()
+    post("/api/assess", {"upc": cached})
+    llm.delay = 2.0
+
+    async def main():
+        client = app_module.app.test_client()
+        miss = asyncio.ensure_future(client.post("/api/assess", json={"upc": product_id()}))
+        await asyncio.sleep(0.1)
+        start = time.perf_counter()
+        hit = await client.post("/api/assess", json={"upc": cached})
+        hit_seconds = time.perf_counter() - start
+        assert not miss.done()
+        await miss
+        return await hit.get_json(), hit_seconds
+
+    hit, hit_seconds = asyncio.run(main())
+    assert hit["cached"] is True
+    assert hit_seconds < 0.5
+
+
+def test_batch_keeps_request_order_and_drops_duplicates(llm):
+    cached, first, second = product_id(), product_id(), product_id()
+    post("/api/assess", {"upc": cached})
+
+    status, body = post("/api/assess/batch", {"upcs": [first, cached, first, second], "weights": {}})
+    assert status == 200
+    assert [result["upc"] for result in body["results"]] == [first, cached, second]
+    assert [result["cached"] for result in body["results"]] == [False, True, False]
+    # One LLM call for the single request, one per uncached batch product
+    assert len(llm.calls) == 3
+
+
+def test_batch_streams_ndjson(llm):
+    upcs = [product_id() for _ in range(3)]
+
+    async def main():
+        response = await app_module.app.test_client().post("/api/assess/batch", json={"upcs": upcs, "stream": True})
+        return response.status_code, response.mimetype, await response.get_data(as_text=True)
+
+    status, mimetype, text = asyncio.run(main())
+    assert status == 200
+    assert mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in text.splitlines()]
+    assert sorted(line["upc"] for line in lines) == sorted(upcs)
+
+
+@pytest.mark.parametrize("body", [{}, {"upcs": []}, {"upcs": "X"}, {"upcs": ["A", "B", "C"]}])
+def test_invalid_batches_are_rejected(llm, monkeypatch, body):
+    monkeypatch.setattr(app_module, "BATCH_MAX_ITEMS", 2)
+    status, _ = post("/api/assess/batch", body)
+    assert status == 400
+    assert llm.calls == []
+
+
+def test_fingerprint_ignores_whitespace_only():
+    messages = [{"role": "system", "content": "Assess"}, {"role": "user", "content": "Steel  bottle\n"}]
+    same = [{"role": "system", "content": "Assess"}, {"role": "user", "content": " Steel bottle"}]
+    other = [{"role": "system", "content": "Assess"}, {"role": "user", "content": "Glass bottle"}]
+    fingerprint = app_module.fingerprint_prompt(messages, "gpt-4o-mini")
+    assert fingerprint == app_module.fingerprint_prompt(same, "gpt-4o-mini")
+    assert fingerprint != app_module.fingerprint_prompt(other, "gpt-4o-mini")
+    assert fingerprint != app_module.fingerprint_prompt(messages, "gpt-4o")
+
+
+def test_refresh_with_unchanged_text_reuses_the_assessment(llm, monkeypatch):
+    upc = product_id()
+    post("/api/assess", {"upc": upc})
+    first = app_module.assessment_cache.get(upc)
+
+    entry = asyncio.run(app_module.request_and_cache_sub_metrics("test", upc))
+    assert len(llm.calls) == 1
+    assert entry["fingerprint"] == first["fingerprint"]
+
+    async def changed(urls, max_bytes=None, deadline=None):
+        return ["Now made from recycled aluminium."] * len(urls)
+
+    monkeypatch.setattr(app_module, "fetch_texts", changed)
+    entry = asyncio.run(app_module.request_and_cache_sub_metrics("test", upc))
+    assert len(llm.calls) == 2
+    assert entry["fingerprint"] != first["fingerprint"]
+
+
+def test_metrics_endpoint_reports_pipeline_stages(llm):
+    post("/api/assess", {"upc": product_id()})
+
+    async def main():
+        response = await app_module.app.test_client().get("/metrics")
+        return response.status_code, response.mimetype, await response.get_data(as_text=True)
+
+    status, mimetype, text = asyncio.run(main())
+    assert status == 200
+    assert mimetype == "text/plain"
+    # Search, fetch and the LLM are faked here, so only the in-process stages are timed
+    for stage in ("passages", "parse", "score"):
+        assert f'assessment_stage_seconds_count{{stage="{stage}"}}' in text
+
+
+def test_incomplete_reply_is_followed_up_once(llm, monkeypatch):
+    llm.text = reply().replace("- Water Usage: 7", "- Water Usage: unknown")
+    follow_ups = []
+
+    async def complete_chat(api_key, messages, response_format=None, deadline=None):
+        follow_ups.append(messages)
+        return "- Water Usage: 2"
+
+    monkeypatch.setattr(app_module, "complete_chat", complete_chat)
+    status, body = post("/api/assess", {"upc": product_id()})
+    assert status == 200
+    assert "error" not in body
+    assert len(follow_ups) == 1
+    assert follow_ups[0][-1]["content"].endswith("- Water Usage: {score/10}")
+    assert follow_ups[0][-2] == {"role": "assistant", "content": llm.text}
+
+
+def test_reply_still_incomplete_is_not_asked_again_for_a_while(llm, monkeypatch):
+    llm.text = reply().replace("- Water Usage: 7", "- Water Usage: unknown")
+
+    async def complete_chat(api_key, messages, response_format=None, deadline=None):
+        return "I cannot tell."
+
+    monkeypatch.setattr(app_module, "complete_chat", complete_chat)
+    upc = product_id()
+    status, body = post("/api/assess", {"upc": upc})
+    assert body["error"] == "The assessment is incomplete."
+    assert body["missingFields"] == ["environmental.water"]
+    assert app_module.assessment_cache.get(upc, include_stale=True) is None
+
+    post("/api/assess", {"upc": upc})
+    assert len(llm.calls) == 1
+
+
+def test_expired_assessment_is_served_stale_and_refreshed(llm):
+    upc = product_id()
+    post("/api/assess", {"upc": upc})
+    entry = app_module.assessment_cache.get(upc)
+    # A changed page, so the refresh asks the LLM instead of reusing the stored scores
+    llm.text = reply(score=3)
+    app_module.assessment_cache.set(upc, {**entry, "fingerprint": None}, stored_at=time.time() - app_module.assessment_cache.ttl - 60)
+
+    async def main():
+        client = app_module.app.test_client()
+        response = await client.post("/api/assess", json={"upc": upc})
+        stale = await response.get_json()
+        while len(app_module.refresh_worker) or app_module.refresh_worker._running:
+            await asyncio.sleep(0.01)
+        return stale
+
+    stale = asyncio.run(main())
+    assert stale["stale"] is True
+    assert stale["environmentalScore"] == 70
+    assert stale["ageSeconds"] >= app_module.assessment_cache.ttl
+
+    status, fresh = post("/api/assess", {"upc": upc})
+    assert fresh["stale"] is False
+    assert fresh["environmentalScore"] == 30
+    assert len(llm.calls) == 2
+
+
+def test_assessment_past_its_deadline_is_an_error(llm):
+    llm.delay = 2.0
+    start = time.perf_counter()
+    status, body = post("/api/assess", {"upc": product_id(), "deadline": 0.3})
+    assert time.perf_counter() - start < 1.5
+    assert body["error"] == "The assessment did not finish in time."
+
+
+def test_short_deadline_gives_a_partial_result_that_is_served_stale(llm):
+    upc = product_id()
+    # Less than DEADLINE_LLM_RESERVE, so the passages sent to the LLM are cut short
+    status, body = post("/api/assess", {"upc": upc, "deadline": 4})
+    assert status == 200
+    assert "longPassages" in body["skipped"]
+    assert app_module.assessment_cache.get_with_age(upc)[2] is True
+
+    async def main():
+        response = await app_module.app.test_client().post("/api/assess", json={"upc": upc})
+        again = await response.get_json()
+        while len(app_module.refresh_worker) or app_module.refresh_worker._running:
+            await asyncio.sleep(0.01)
+        return again
+
+    again = asyncio.run(main())
+    assert again["stale"] is True
+    # The background refresh has no deadline and stores the full assessment
+    assert app_module.assessment_cache.get(upc)["skipped"] == []
+
+
+class FakeSurrogate:
+    def __init__(self, sub_metrics):
+        self.sub_metrics = sub_metrics
+
+    def predict(self, text):
+        return self.sub_metrics
+
+
+@pytest.fixture
+def surrogate(llm, monkeypatch, sub_metrics):
+    model = FakeSurrogate(sub_metrics(4, social_labour=1))
+    monkeypatch.setattr(app_module, "surrogate_model", model)
+    return model
+
+
+def fail_llm(monkeypatch):
+    async def submit(api_key, user_content, deadline=None):
+        raise LLMError("LLM call returned 503", 503)
+
+    monkeypatch.setattr(app_module.llm_batcher, "submit", submit)
+
+
+def test_provisional_request_is_answered_with_the_estimate_then_the_llm(llm, surrogate):
+    llm.delay = 0.3
+    upc = product_id()
+
+    async def main():
+        client = app_module.app.test_client()
+        response = await client.post("/api/assess", json={"upc": upc, "provisional": True})
+        estimate = await response.get_json()
+        # The LLM assessment carries on after the estimate is answered
+        await asyncio.sleep(0.6)
+        response = await client.post("/api/assess", json={"upc": upc, "provisional": True})
+        return estimate, await response.get_json()
+
+    estimate, assessed = asyncio.run(main())
+    assert estimate["provisional"] is True
+    assert estimate["source"] == "surrogate"
+    assert estimate["environmentalScore"] == 40
+    assert assessed["provisional"] is False
+    assert assessed["cached"] is True
+    assert assessed["environmentalScore"] == 70
+    assert len(llm.calls) == 1
+
+
+def test_llm_failure_is_answered_with_the_estimate(llm, surrogate, monkeypatch):
+    fail_llm(monkeypatch)
+    upc = product_id()
+    status, body = post("/api/assess", {"upc": upc})
+    assert status == 200
+    assert body["provisional"] is True
+    assert "llm" in body["skipped"]
+    # Stored as partial, so the next request is served stale and asks the LLM again
+    assert app_module.assessment_cache.get_with_age(upc)[2] is True
+
+
+def test_estimate_never_replaces_an_llm_assessment(llm, surrogate, monkeypatch):
+    upc = product_id()
+    post("/api/assess", {"upc": upc})
+    # A changed page, so the refresh asks the LLM instead of reusing the stored scores
+    app_module.assessment_cache.set(upc, {**app_module.assessment_cache.get(upc), "fingerprint": None})
+    fail_llm(monkeypatch)
+
+    entry = asyncio.run(app_module.request_and_cache_sub_metrics("test", upc))
+    assert entry["provisional"] is True
+    cached = app_module.assessment_cache.get(upc)
+    assert cached is not None and "provisional" not in cached
+    assert cached["subMetrics"]["environmental"]["ghg"] == 7
+
+
+def test_deadline_passing_falls_back_to_the_estimate(llm, surrogate):
+    llm.delay = 3.0
+    status, body = post("/api/assess", {"upc": product_id(), "deadline": 1})
+    assert status == 200
+    assert body["provisional"] is True
+    assert "llm" in body["skipped"]
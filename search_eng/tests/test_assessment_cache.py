@@ -0,0 +1,115 @@
+import json
+import time
+import sqlite3
+
+import numpy as np
+
+import scoring
+from assessment_cache import AssessmentCache
+
+
+def entry(sub_metrics, value=5, title="Bottle"):
+    return {"subMetrics": sub_metrics(value), "recommendations": [], "title": title}
+
+
+def test_get_returns_stored_entry(cache, sub_metrics):
+    cache.set("A1", entry(sub_metrics, 7))
+    assert cache.get("A1") == entry(sub_metrics, 7)
+    assert cache.get("missing") is None
+
+
+def test_expired_entry_is_only_returned_as_stale(cache, sub_metrics):
+    cache.set("A1", entry(sub_metrics), stored_at=time.time() - 2 * cache.ttl)
+    assert cache.get("A1") is None
+    assert cache.get("A1", include_stale=True) == entry(sub_metrics)
+    _, age, partial = cache.get_with_age("A1")
+    assert age >= 2 * cache.ttl - 1
+    assert partial is False
+
+
+def test_partial_entry_is_only_returned_as_stale(cache, sub_metrics):
+    cache.set("A1", entry(sub_metrics), partial=True)
+    assert cache.get("A1") is None
+    assert cache.get("A1", include_stale=True) is not None
+    assert cache.get_with_age("A1")[2] is True
+
+
+def test_get_since_only_returns_newer_entries(cache, sub_metrics):
+    cache.set("A1", entry(sub_metrics), stored_at=100.0)
+    assert cache.get("A1", since=101.0) is None
+    cache.set("A1", entry(sub_metrics, 3), partial=True, stored_at=200.0)
+    assert cache.get("A1", since=101.0) == entry(sub_metrics, 3)
+
+
+def test_get_with_age_of_missing_product(cache):
+    assert cache.get_with_age("missing") == (None, None, False)
+
+
+def test_oldest_entries_are_evicted_over_max_entries(tmp_path, sub_metrics):
+    cache = AssessmentCache(path=str(tmp_path / "small.sqlite3"), max_entries=2)
+    for index, product_id in enumerate(["A", "B", "C"]):
+        cache.set(product_id, entry(sub_metrics), stored_at=1000.0 + index)
+    assert cache.get("A", include_stale=True) is None
+    assert cache.get("B", include_stale=True) is not None
+    assert cache.get("C", include_stale=True) is not None
+
+
+def test_items_skip_stale_and_partial_entries(cache, sub_metrics):
+    cache.set("fresh", entry(sub_metrics))
+    cache.set("partial", entry(sub_metrics), partial=True)
+    cache.set("expired", entry(sub_metrics), stored_at=time.time() - 2 * cache.ttl)
+    assert [product_id for product_id, _ in cache.items()] == ["fresh"]
+    assert {product_id for product_id, _ in cache.items(include_stale=True)} == {"fresh", "partial", "expired"}
+
+
+def test_catalog_matches_scoring_the_decoded_entries(cache, sub_metrics):
+    cache.set("A", entry(sub_metrics, 2))
+    cache.set("B", {"subMetrics": sub_metrics(9, environmental_ghg=1), "recommendations": []})
+    cache.set("no-metrics", {"error": "LLM failed"})
+    catalog = cache.catalog()
+
+    assert sorted(catalog.product_ids) == ["A", "B"]
+    profiles = [scoring.DEFAULT_WEIGHTS, {"environmental": {"ghg": 100}}]
+    ids, scores = catalog.score(profiles)
+    expected_ids, expected = scoring.score_catalog(
+        ((product_id, e) for product_id, e in cache.items() if "subMetrics" in e), profiles
+    )
+    order = [expected_ids.index(product_id) for product_id in ids]
+    np.testing.assert_allclose(scores, expected[order], rtol=1e-5)
+
+
+def test_empty_catalog(cache):
+    assert len(cache.catalog()) == 0
+
+
+def test_legacy_cache_is_migrated(tmp_path, sub_metrics):
+    path = str(tmp_path / "legacy.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE assessments (product_id TEXT PRIMARY KEY, payload TEXT NOT NULL, stored_at REAL NOT NULL)")
+    conn.execute(
+        "INSERT INTO assessments VALUES (?, ?, ?)",
+        ("OLD", json.dumps({"subMetrics": sub_metrics(4), "recommendations": []}), time.time()),
+    )
+    conn.commit()
+    conn.close()
+
+    cache = AssessmentCache(path=path)
+    assert cache.get("OLD")["subMetrics"] == sub_metrics(4)
+    np.testing.assert_array_equal(cache.catalog().matrix, np.full((1, len(scoring.METRIC_KEYS)), 4, dtype=np.float32))
+
+
+def test_lease_is_exclusive_until_released_or_expired(cache):
+    assert cache.acquire_lease("A", "worker-1", ttl=60)
+    assert not cache.acquire_lease("A", "worker-2", ttl=60)
+    # The holder renews its own lease
+    assert cache.acquire_lease("A", "worker-1", ttl=60)
+    cache.release_lease("A", "worker-1")
+    assert cache.acquire_lease("A", "worker-2", ttl=-1)
+    # An expired lease is taken over
+    assert cache.acquire_lease("A", "worker-1", ttl=60)
+
+
+def test_release_by_another_owner_keeps_the_lease(cache):
+    cache.acquire_lease("A", "worker-1", ttl=60)
+    cache.release_lease("A", "worker-2")
+    assert not cache.acquire_lease("A", "worker-2", ttl=60)
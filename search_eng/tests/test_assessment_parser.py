@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from assessment_parser import (
+    parse_assessment, parse_text, parse_json, follow_up_prompt, METRIC_LABELS, YES_NO_METRICS, ASSESSMENT_SCHEMA,
+    ASSESSMENT_EXAMPLE, YES_SCORE, NO_SCORE,
+)
+
+
+def text_reply(score=6, leave_out=(), labour="yes"):
+    lines = [
+        f"- {label}: {labour if key in YES_NO_METRICS else f'{score}/10'}"
+        for label, key in METRIC_LABELS.items() if label not in leave_out
+    ]
+    return "## Scores ##\n" + "\n".join(lines) + '\nALT: [{"product_name": "Jar", "product_score": 9, "reco_reason": "Glass"}]'
+
+
+def json_reply(score=6, **sections):
+    data = {category: {name: "no" if (category, name) in YES_NO_METRICS else score for name in schema["properties"]}
+            for category, schema in ASSESSMENT_SCHEMA["properties"].items() if category != "alternatives"}
+    data["alternatives"] = [{"product_name": "Jar", "product_score": 85, "reco_reason": "Glass"}]
+    data.update(sections)
+    return json.dumps(data)
+
+
+def test_text_reply_is_parsed_completely():
+    parsed = parse_assessment(text_reply())
+    assert parsed.missing == []
+    assert parsed.sub_metrics["environmental"]["ghg"] == 6
+    assert parsed.sub_metrics["social"]["labour"] == YES_SCORE
+    # Alternatives scored out of 10 are moved to the 0-100 scale
+    assert parsed.recommendations == [{"product_name": "Jar", "product_score": 90, "reco_reason": "Glass"}]
+
+
+def test_missing_and_invalid_fields_are_reported():
+    text = text_reply(leave_out={"Water Usage"}).replace("- Innovation/R&D: 6/10", "- Innovation/R&D: n/a")
+    parsed = parse_assessment(text)
+    assert parsed.missing == ["environmental.water", "governance.innovation"]
+    assert parsed.sub_metrics["environmental"]["water"] is None
+
+
+def test_labels_are_matched_in_any_case_and_markdown():
+    parsed = parse_text("**greenhouse gas emissions**: **8**\nFAIR LABOUR (YES/NO): No")
+    assert parsed.sub_metrics["environmental"]["ghg"] == 8
+    assert parsed.sub_metrics["social"]["labour"] == NO_SCORE
+
+
+def test_first_occurrence_wins_and_scores_are_clamped():
+    parsed = parse_text("- Water Usage: 14/10\n- Water Usage: 2/10\n- Fair Trade: 0")
+    assert parsed.sub_metrics["environmental"]["water"] == 10
+    assert parsed.sub_metrics["social"]["trade"] == 1
+
+
+def test_broken_alternatives_are_dropped():
+    parsed = parse_text(text_reply().split("ALT:")[0] + "ALT: [{broken")
+    assert parsed.recommendations == []
+    assert parsed.missing == []
+
+
+def test_structured_reply_is_parsed():
+    parsed = parse_assessment(json_reply(7))
+    assert parsed.missing == []
+    assert parsed.sub_metrics["governance"]["local"] == 7
+    assert parsed.sub_metrics["social"]["labour"] == NO_SCORE
+    assert parsed.recommendations[0]["product_score"] == 85
+
+
+def test_structured_reply_in_a_code_fence():
+    assert parse_assessment("```json\n" + json_reply() + "\n```").missing == []
+
+
+def test_structured_reply_with_wrong_types_reports_them_missing():
+    parsed = parse_assessment(json_reply(social={"labour": 5, "safety": True}))
+    assert "social.labour" in parsed.missing
+    assert "social.safety" in parsed.missing
+    assert "environmental.ghg" not in parsed.missing
+
+
+def test_parse_json_rejects_non_objects():
+    with pytest.raises(ValueError):
+        parse_json("[1, 2]")
+
+
+def test_example_follows_the_schema():
+    example = json.loads(ASSESSMENT_EXAMPLE)
+    assert set(example) == set(ASSESSMENT_SCHEMA["properties"])
+
+
+def test_follow_up_fills_only_the_missing_fields():
+    first = text_reply(score=6, leave_out={"Water Usage", "Fair Labour (yes/no)"})
+    follow_up = "- Water Usage: 3/10\n- Fair Labour (yes/no): no\n- Greenhouse Gas Emissions: 1/10"
+    parsed = parse_assessment(first, follow_up)
+    assert parsed.missing == []
+    assert parsed.sub_metrics["environmental"]["water"] == 3
+    assert parsed.sub_metrics["social"]["labour"] == NO_SCORE
+    # Fields the first reply answered keep its value
+    assert parsed.sub_metrics["environmental"]["ghg"] == 6
+
+
+def test_follow_up_that_still_leaves_gaps():
+    parsed = parse_assessment(text_reply(leave_out={"Water Usage", "Fair Trade"}), "- Water Usage: 3/10")
+    assert parsed.missing == ["social.trade"]
+
+
+def test_follow_up_prompt_asks_in_the_text_format():
+    prompt = follow_up_prompt(["environmental.water", "social.labour"])
+    assert "- Water Usage: {score/10}" in prompt
+    assert "- Fair Labour (yes/no): {yes/no}" in prompt
+    assert "Greenhouse" not in prompt
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+
+import async_runtime
+
+
+def test_run_executes_on_the_shared_loop():
+    async def which_loop():
+        return asyncio.get_running_loop()
+
+    assert async_runtime.run(which_loop()) is async_runtime.get_loop()
+    assert async_runtime.run(which_loop()) is async_runtime.get_loop()
+
+
+def test_run_times_out_and_cancels():
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(TimeoutError):
+        async_runtime.run(slow(), timeout=0.05)
+    assert cancelled.wait(1)
+
+
+def test_run_blocking_leaves_the_loop_free():
+    release = threading.Event()
+
+    async def main():
+        blocked = asyncio.ensure_future(async_runtime.run_blocking(release.wait, 5))
+        # The loop keeps serving other work while the call blocks a worker thread
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        release.set()
+        return await blocked
+
+    assert asyncio.run(main()) is True
+
+
+def test_run_blocking_passes_keyword_arguments():
+    assert asyncio.run(async_runtime.run_blocking(int, "ff", base=16)) == 255
+
+
+def test_adopting_a_second_loop_is_refused():
+    async_runtime.get_loop()
+
+    async def adopt():
+        async_runtime.adopt_running_loop()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(adopt())
@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+import pytest
+
+from run_bench import percentile, stage_means, compare
+from stubs import CANNED_ASSESSMENT, SearchStub, OpenAIStub, product_html, start_stub
+from assessment_parser import parse_assessment
+from extract import extract_text
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(handler, **attributes):
+        server, url = start_stub(handler, **attributes)
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_percentile():
+    values = [0.1 * i for i in range(1, 101)]
+    assert percentile(values, 50) == pytest.approx(5.0)
+    assert percentile(values, 99) == pytest.approx(9.9)
+    assert percentile([], 95) == 0.0
+
+
+def test_stage_means_from_metrics_text():
+    text = "\n".join([
+        'assessment_stage_seconds_bucket{stage="llm",le="1"} 2',
+        'assessment_stage_seconds_sum{stage="llm"} 3.0',
+        'assessment_stage_seconds_count{stage="llm"} 2',
+        'assessment_stage_seconds_sum{stage="fetch"} 1.0',
+        'assessment_stage_seconds_count{stage="fetch"} 0',
+    ])
+    assert stage_means(text) == {"llm": 1.5}
+
+
+def test_compare_reports_regressions_beyond_the_tolerance(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"phases": [{"phase": "cold", "p95": 1.0, "rps": 10.0}]}))
+    assert compare([{"phase": "cold", "p95": 1.1, "rps": 9.0}], baseline, 0.2) == []
+    assert compare([{"phase": "cold", "p95": 1.5, "rps": 5.0}], baseline, 0.2) == [
+        "cold: p95 1000.0 ms -> 1500.0 ms",
+        "cold: req/s 10.0 -> 5.0",
+    ]
+    assert compare([{"phase": "batch", "p95": 9.0, "rps": 0.1}], baseline, 0.2) == []
+
+
+def test_canned_assessment_parses_completely():
+    assert parse_assessment(CANNED_ASSESSMENT.format(ghg=3)).missing == []
+
+
+def test_product_page_is_large_but_extracts_to_the_product_sections():
+    html = product_html("ABC", 200_000)
+    assert len(html) >= 200_000
+    text = extract_text(html, "https://www.amazon.com/dp/ABC")
+    assert "Made from 80% recycled stainless steel" in text
+    assert "Great bottle" not in text
+
+
+def test_search_stub_links_to_its_pages(stub):
+    url = stub(SearchStub, page_size=10_000)
+    request = urllib.request.Request(f"{url}/search", data=b"q=Amazon+UPC+1&format=json")
+    with urllib.request.urlopen(request) as response:
+        results = json.loads(response.read())["results"]
+    assert len(results) == SearchStub.results_per_query
+    with urllib.request.urlopen(results[0]["url"]) as response:
+        assert response.headers["ETag"]
+        assert b"productTitle" in response.read()
+
+
+def test_openai_stub_answers_each_batched_product(stub):
+    url = stub(OpenAIStub, latency=0.0, jitter=0.0)
+    body = {"model": "gpt-test", "messages": [{"role": "user", "content": "### PRODUCT 1 ###\na\n### PRODUCT 2 ###\nb"}]}
+    request = urllib.request.Request(
+        f"{url}/v1/chat/completions", data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        completion = json.loads(response.read())
+    content = completion["choices"][0]["message"]["content"]
+    assert content.count("### PRODUCT") == 2
+    assert completion["usage"]["total_tokens"] > 0
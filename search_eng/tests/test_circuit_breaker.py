@@ -0,0 +1,91 @@
+import pytest
+
+from circuit_breaker import CircuitBreaker, BreakerRegistry
+from metrics import circuit_events
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+
+
+def expire(breaker):
+    # Moves the clock of an open breaker past its reset timeout
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_opens_after_consecutive_failures(breaker):
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through(breaker):
+    for _ in range(3):
+        breaker.record_failure()
+    expire(breaker)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes(breaker):
+    for _ in range(3):
+        breaker.record_failure()
+    expire(breaker)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_failed_probe_opens_again(breaker):
+    for _ in range(3):
+        breaker.record_failure()
+    expire(breaker)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_lost_probe_does_not_block_probing_forever(breaker):
+    for _ in range(3):
+        breaker.record_failure()
+    expire(breaker)
+    assert breaker.allow()
+    # The probe's caller never reports back
+    breaker.probe_started -= breaker.reset_timeout
+    assert breaker.allow()
+
+
+def test_transitions_and_rejections_are_counted():
+    breaker = CircuitBreaker("test_events", failure_threshold=1)
+    breaker.record_failure()
+    breaker.allow()
+    assert circuit_events.value(breaker="test_events", event="open") == 1
+    assert circuit_events.value(breaker="test_events", event="rejected") == 1
+
+
+def test_registry_keeps_one_breaker_per_key():
+    registry = BreakerRegistry("fetch", failure_threshold=1)
+    first = registry.get("shop.test")
+    assert registry.get("shop.test") is first
+    assert registry.get("other.test") is not first
+    first.record_failure()
+    assert not first.allow()
+    assert registry.get("other.test").allow()
+    assert repr(first) == "fetch:shop.test"
@@ -0,0 +1,51 @@
+import math
+import time
+
+import pytest
+
+import deadline as deadline_module
+from deadline import Deadline
+
+
+def test_unlimited_deadline():
+    unlimited = Deadline()
+    assert unlimited.unlimited
+    assert unlimited.remaining() == math.inf
+    assert unlimited.timeout() is None
+    assert unlimited.timeout(cap=10) == 10
+    assert not unlimited.expired()
+
+
+def test_remaining_keeps_the_reserve_and_never_goes_negative():
+    deadline = Deadline(10)
+    assert deadline.remaining() == pytest.approx(10, abs=0.1)
+    assert deadline.remaining(reserve=4) == pytest.approx(6, abs=0.1)
+    assert deadline.remaining(reserve=20) == 0.0
+
+
+def test_timeout_is_capped():
+    deadline = Deadline(10)
+    assert deadline.timeout(cap=2) == 2
+    assert deadline.timeout(reserve=9, cap=2) == pytest.approx(1, abs=0.1)
+
+
+def test_expired_deadline():
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+    assert deadline.expired()
+    assert deadline.remaining() == 0.0
+    assert deadline.timeout(cap=5) == 0.0
+
+
+def test_from_request_defaults_and_caps(monkeypatch):
+    monkeypatch.setattr(deadline_module, "ASSESS_DEADLINE", 20)
+    monkeypatch.setattr(deadline_module, "ASSESS_DEADLINE_MAX", 60)
+    assert Deadline.from_request(None).remaining() == pytest.approx(20, abs=0.1)
+    assert Deadline.from_request(5).remaining() == pytest.approx(5, abs=0.1)
+    assert Deadline.from_request(600).remaining() == pytest.approx(60, abs=0.1)
+
+
+@pytest.mark.parametrize("value", [0, -1, "10", True, [5]])
+def test_from_request_rejects_invalid_values(value):
+    with pytest.raises(ValueError, match="deadline must be a positive number of seconds"):
+        Deadline.from_request(value)
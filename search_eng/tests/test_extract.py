@@ -0,0 +1,86 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from extract import TextExtractor, AmazonExtractor, SKIP_TAGS, extract_text, extractor_for
+
+
+def soup_text(html):
+    """
+    The text BeautifulSoup gives for a page with the skipped subtrees removed, which the
+    streaming extractor replaces.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+    return soup.get_text(separator="\n", strip=True)
+
+
+def streamed(html, chunk_size, extractor=TextExtractor):
+    extractor = extractor()
+    for start in range(0, len(html), chunk_size):
+        extractor.feed(html[start:start + chunk_size])
+    return extractor.result()
+
+
+PAGES = [
+    "<html><head><title>Bottle</title><style>p{}</style></head><body><p>Steel &amp; glass</p></body></html>",
+    "<body><nav><a>Home</a></nav><header>Logo</header><main><h1>Bottle</h1><p>Recycled <b>steel</b></p></main>"
+    "<footer>Contact</footer></body>",
+    "<script>var html = '<p>not text</p></div>';</script><p>After script</p>",
+    "<nav><nav>inner</nav>still nav</nav>after",
+    "<ul><li>one<li>two</ul><p>three<br>four<br/>five</p><img src=x alt=y>",
+    "<svg><text>icon</text></svg><iframe>frame</iframe><noscript>js</noscript><template>t</template>Body",
+    # Skipped elements the page never closes end with their parent
+    "<div><nav>links</div><p>Real text</p>",
+    "<body><header><a>Home</a><div>x</div><main><p>Body</p></main></body>",
+    "<div><span><nav>n</span>after span</div>after div",
+    "<section><header>t<div>u</section><p>v</p>",
+    "<table><tr><td>a<td>b</table><footer>f<p>g</footer>h",
+    # Stray end tags are ignored
+    "<div>x</nav>y</div></p>z",
+    "<nav/>self closed<p>p</p>",
+    "<html><body><div><nav>unclosed to the end<p>lost</p>",
+]
+
+
+@pytest.mark.parametrize("html", PAGES)
+@pytest.mark.parametrize("chunk_size", [1, 7, 10_000])
+def test_matches_beautifulsoup(html, chunk_size):
+    assert streamed(html, chunk_size) == soup_text(html)
+
+
+def test_text_split_across_chunks_stays_one_line():
+    assert streamed("<p>Stainless steel bottle</p>", 3) == "Stainless steel bottle"
+
+
+AMAZON_PAGE = (
+    "<div id=nav-belt><a>Sign in</a></div>"
+    "<span id=productTitle> Steel Bottle </span>"
+    "<div id=feature-bullets><ul><li>Recycled steel<li>BPA free</ul></div>"
+    "<div class=reviews><p>Great bottle</p></div>"
+    "<table id=productDetails_techSpec_section_1><tr><td>Material</td><td>Steel</td></tr></table>"
+    "<div id=productDescription><p>Made in Portugal</p></div>"
+)
+
+
+def test_amazon_keeps_only_the_product_sections():
+    assert extract_text(AMAZON_PAGE, "https://www.amazon.com/dp/B0") == (
+        "Steel Bottle\nRecycled steel\nBPA free\nMaterial\nSteel\nMade in Portugal"
+    )
+
+
+def test_amazon_section_ends_with_its_parent():
+    html = "<div><div id=feature-bullets><ul><li>a<li>b</div>reviews<p>more</p></div><span id=productTitle>T</span>"
+    assert streamed(html, 5, AmazonExtractor) == "a\nb\nT"
+
+
+def test_amazon_page_without_sections_keeps_all_text():
+    html = "<p>Enter the characters you see below</p><nav>menu</nav>"
+    assert extract_text(html, "https://www.amazon.co.uk/dp/B0") == "Enter the characters you see below"
+
+
+def test_extractor_for_picks_by_host():
+    assert isinstance(extractor_for("https://www.amazon.de/dp/B0"), AmazonExtractor)
+    assert isinstance(extractor_for("https://smile.amazon.com/dp/B0"), AmazonExtractor)
+    assert type(extractor_for("https://amazon.example.com/dp/B0")) is TextExtractor
+    assert type(extractor_for("not a url")) is TextExtractor
@@ -0,0 +1,206 @@
+import time
+import asyncio
+import itertools
+
+import pytest
+from aiohttp import web
+
+import get_documents
+from page_cache import PageCache
+from circuit_breaker import CircuitBreaker, BreakerRegistry
+from deadline import Deadline
+
+
+_paths = itertools.count()
+
+
+def unique_path(name):
+    # Page text outlives a test in the shared page cache, so every test fetches its own URLs
+    return f"/{name}-{next(_paths)}-{time.time_ns()}"
+
+
+def page_app(pages, delay=0.0, requests=None):
+    async def handler(request):
+        if requests is not None:
+            requests.append(request.path)
+        await asyncio.sleep(delay)
+        body = pages.get(request.path)
+        if body is None:
+            return web.Response(status=404)
+        return web.Response(text=body, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    return app
+
+
+def test_fetch_text_extracts_visible_text(serve, run_async):
+    path = unique_path("page")
+    html = "<html><head><script>var x;</script></head><body><nav>Menu</nav><p>Steel bottle</p></body></html>"
+
+    async def main():
+        async with serve(page_app({path: html})) as base:
+            return await get_documents.fetch_text(base + path)
+
+    assert run_async(main()) == "Steel bottle"
+
+
+def test_fetch_page_reads_at_most_max_bytes(serve, run_async):
+    path = unique_path("large")
+    html = "<p>" + "a" * 100 + "</p>" + "<p>" + "b" * 500_000 + "</p>"
+
+    async def main():
+        async with serve(page_app({path: html})) as base:
+            return await get_documents.fetch_page(base + path, max_bytes=1000)
+
+    status, text, _ = run_async(main())
+    assert status == 200
+    assert text.startswith("a" * 100)
+    assert len(text) < 1000
+
+
+def test_fetch_texts_runs_concurrently_and_keeps_order(serve, run_async):
+    paths = [unique_path("slow") for _ in range(5)]
+    pages = {path: f"<p>{index}</p>" for index, path in enumerate(paths)}
+
+    async def main():
+        async with serve(page_app(pages, delay=0.3)) as base:
+            start = time.perf_counter()
+            texts = await get_documents.fetch_texts([base + path for path in paths])
+            return texts, time.perf_counter() - start
+
+    texts, elapsed = run_async(main())
+    assert texts == ["0", "1", "2", "3", "4"]
+    assert elapsed < 1.0
+
+
+def test_missing_page_gives_empty_text(serve, run_async):
+    path = unique_path("missing")
+
+    async def main():
+        async with serve(page_app({})) as base:
+            return await get_documents.fetch_text(base + path)
+
+    assert run_async(main()) == ""
+
+
+def test_stale_page_is_revalidated_with_its_etag(serve, run_async, tmp_path, monkeypatch):
+    monkeypatch.setattr(get_documents, "page_cache", PageCache(path=str(tmp_path / "pages.sqlite3"), page_ttl=-1))
+    path = unique_path("etag")
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.Response(text="<p>Original text</p>", content_type="text/html", headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get(path, handler)
+
+    async def main():
+        async with serve(app) as base:
+            return [await get_documents.fetch_text(base + path) for _ in range(2)]
+
+    assert run_async(main()) == ["Original text", "Original text"]
+    assert seen == [None, '"v1"']
+
+
+def test_fresh_page_is_served_from_the_cache(serve, run_async):
+    path = unique_path("fresh")
+    requests = []
+
+    async def main():
+        async with serve(page_app({path: "<p>Cached</p>"}, requests=requests)) as base:
+            return [await get_documents.fetch_text(base + path) for _ in range(2)]
+
+    assert run_async(main()) == ["Cached", "Cached"]
+    assert requests == [path]
+
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    """
+    Gives get_documents its own page cache and breakers, so failures do not leak into other tests.
+    """
+    monkeypatch.setattr(get_documents, "page_cache", PageCache(path=str(tmp_path / "pages.sqlite3")))
+    monkeypatch.setattr(get_documents, "search_breaker", CircuitBreaker("search", failure_threshold=2))
+    monkeypatch.setattr(get_documents, "fetch_breakers", BreakerRegistry("fetch", failure_threshold=2))
+
+
+def failing_app(status=500):
+    requests = []
+
+    async def handler(request):
+        requests.append(request.path)
+        return web.Response(status=status)
+
+    app = web.Application()
+    app.router.add_route("*", "/{name}", handler)
+    return app, requests
+
+
+def test_failed_fetch_is_not_retried_within_the_negative_ttl(isolated, serve, run_async):
+    app, requests = failing_app(404)
+
+    async def main():
+        async with serve(app) as base:
+            return [await get_documents.fetch_text(f"{base}/gone") for _ in range(2)]
+
+    assert run_async(main()) == ["", ""]
+    assert requests == ["/gone"]
+
+
+def test_failing_host_is_skipped_once_its_breaker_opens(isolated, serve, run_async):
+    app, requests = failing_app(503)
+
+    async def main():
+        async with serve(app) as base:
+            return [await get_documents.fetch_text(f"{base}/page-{index}") for index in range(4)]
+
+    assert run_async(main()) == [""] * 4
+    assert requests == ["/page-0", "/page-1"]
+
+
+def test_failed_search_is_negative_cached_and_opens_the_breaker(isolated, serve, run_async, monkeypatch):
+    app, requests = failing_app(500)
+
+    async def main():
+        async with serve(app) as base:
+            monkeypatch.setattr(get_documents, "SEARCH_URL", f"{base}/search")
+            return [await get_documents.search(product) for product in ("A", "A", "B", "C")]
+
+    assert run_async(main()) == [([], [])] * 4
+    # A is remembered as failed, B's failure opens the breaker so C is not sent
+    assert requests == ["/search", "/search"]
+    assert get_documents.search_breaker.state == "open"
+
+
+def test_expired_deadline_sends_no_request(isolated, serve, run_async, monkeypatch):
+    app, requests = failing_app(200)
+    expired = Deadline(0)
+
+    async def main():
+        async with serve(app) as base:
+            monkeypatch.setattr(get_documents, "SEARCH_URL", f"{base}/search")
+            return await get_documents.fetch_text(f"{base}/page", deadline=expired), await get_documents.search("A", deadline=expired)
+
+    assert run_async(main()) == ("", ([], []))
+    assert requests == []
+    # Running out of time is not held against the host or SearxNG
+    assert get_documents.search_breaker.failures == 0
+
+
+def test_deadline_timeout_is_never_zero(isolated, monkeypatch, run_async):
+    timeouts = []
+
+    class Session:
+        def get(self, url, **kwargs):
+            timeouts.append(kwargs["timeout"].total)
+            raise get_documents.aiohttp.ClientError("refused")
+
+    monkeypatch.setattr(get_documents, "get_session", Session)
+    # Not expired when checked, but out of time by the moment the timeout is computed
+    monkeypatch.setattr(Deadline, "expired", lambda self: False)
+    run_async(get_documents.fetch_text("http://shop.test/late", deadline=Deadline(0)))
+    assert timeouts == [get_documents.MIN_TIMEOUT]
@@ -0,0 +1,120 @@
+import asyncio
+
+from llm_batcher import LLMBatcher, split_sections, BATCH_INSTRUCTIONS
+from llm_client import Completion
+
+
+class FakeCompletions:
+    """
+    Answers single prompts with "single:<prompt>" and batched ones with a section per product,
+    leaving out the products listed in drop.
+    """
+
+    def __init__(self, drop=(), fail_batch=False):
+        self.drop = set(drop)
+        self.fail_batch = fail_batch
+        self.calls = []
+
+    async def __call__(self, api_key, messages, deadline=None):
+        self.calls.append(messages)
+        user = messages[-1]["content"]
+        if BATCH_INSTRUCTIONS not in messages[0]["content"]:
+            return f"single:{user}"
+        if self.fail_batch:
+            raise RuntimeError("provider error")
+        sections = split_sections(user)
+        return Completion(
+            "\n".join(f"### PRODUCT {n} ###\nbatched:{content}" for n, content in sections.items() if content not in self.drop),
+            "gpt-test", {"total_tokens": 100},
+        )
+
+
+def batcher(complete, window_ms=50, max_items=8):
+    return LLMBatcher(complete, "Assess", lambda section: section.startswith("batched:"), window_ms=window_ms, max_items=max_items)
+
+
+def test_split_sections():
+    text = "### PRODUCT 1 ###\nfirst\n###  product 2  ###\nsecond\n"
+    assert split_sections(text) == {1: "first", 2: "second"}
+    assert split_sections("no sections") == {}
+
+
+def test_without_a_window_every_prompt_is_sent_on_its_own():
+    complete = FakeCompletions()
+    llm = batcher(complete, window_ms=0)
+
+    async def main():
+        return await asyncio.gather(llm.submit("key", "a"), llm.submit("key", "b"))
+
+    assert asyncio.run(main()) == ["single:a", "single:b"]
+    assert len(complete.calls) == 2
+
+
+def test_prompts_within_the_window_share_one_completion():
+    complete = FakeCompletions()
+    llm = batcher(complete)
+
+    async def main():
+        return await asyncio.gather(*(llm.submit("key", prompt) for prompt in "abc"))
+
+    results = asyncio.run(main())
+    assert results == ["batched:a", "batched:b", "batched:c"]
+    assert len(complete.calls) == 1
+    assert results[0].model == "gpt-test"
+    assert results[0].batch_size == 3
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    complete = FakeCompletions()
+    llm = batcher(complete, window_ms=10_000, max_items=2)
+
+    async def main():
+        return await asyncio.wait_for(asyncio.gather(llm.submit("key", "a"), llm.submit("key", "b")), 1)
+
+    assert asyncio.run(main()) == ["batched:a", "batched:b"]
+
+
+def test_missing_sections_fall_back_to_single_completions():
+    complete = FakeCompletions(drop={"b"})
+    llm = batcher(complete)
+
+    async def main():
+        return await asyncio.gather(*(llm.submit("key", prompt) for prompt in "abc"))
+
+    assert asyncio.run(main()) == ["batched:a", "single:b", "batched:c"]
+    assert len(complete.calls) == 2
+
+
+def test_failed_batch_falls_back_to_single_completions():
+    complete = FakeCompletions(fail_batch=True)
+    llm = batcher(complete)
+
+    async def main():
+        return await asyncio.gather(llm.submit("key", "a"), llm.submit("key", "b"))
+
+    assert asyncio.run(main()) == ["single:a", "single:b"]
+
+
+def test_api_keys_are_batched_apart():
+    complete = FakeCompletions()
+    llm = batcher(complete)
+
+    async def main():
+        return await asyncio.gather(llm.submit("key1", "a"), llm.submit("key2", "b"))
+
+    # Alone in its batch, each prompt goes out as a single completion
+    assert asyncio.run(main()) == ["single:a", "single:b"]
+
+
+def test_caller_giving_up_leaves_the_batch_running():
+    complete = FakeCompletions()
+    llm = batcher(complete, window_ms=100)
+
+    async def main():
+        impatient = llm.submit("key", "a", deadline=0.01)
+        patient = llm.submit("key", "b")
+        return await asyncio.gather(impatient, patient, return_exceptions=True)
+
+    impatient, patient = asyncio.run(main())
+    assert isinstance(impatient, asyncio.TimeoutError)
+    assert patient == "batched:b"
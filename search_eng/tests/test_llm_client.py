@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import asyncio
+import subprocess
+
+import pytest
+from aiohttp import web
+
+import llm_client
+from llm_client import LLMClient, LLMError, LLMRateLimitError, LLMDeadlineError, parse_duration, retry_after
+from rate_limiter import RateLimiter
+
+
+MESSAGES = [{"role": "user", "content": "Assess the bottle"}]
+
+
+def openai_app(responses, delay=0.0):
+    """
+    Serves the given (status, body, headers) responses in turn, repeating the last one.
+    """
+    requests = []
+
+    async def handler(request):
+        requests.append(await request.json())
+        status, body, headers = responses[min(len(requests), len(responses)) - 1]
+        await asyncio.sleep(delay)
+        return web.Response(status=status, text=json.dumps(body), content_type="application/json", headers=headers)
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", handler)
+    return app, requests
+
+
+def completion(text="ok", model="gpt-test"):
+    usage = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    return 200, {"model": model, "choices": [{"message": {"content": text}}], "usage": usage}, {}
+
+
+RATE_LIMITED = (429, {"error": {"message": "Rate limit reached"}}, {"retry-after-ms": "50"})
+
+
+def client(base, **kwargs):
+    llm = LLMClient(url=f"{base}/v1/chat/completions", limiter=RateLimiter(), **kwargs)
+    # Retries in tests wait milliseconds, not the production backoff
+    llm.backoff = lambda attempt: 0.01
+    return llm
+
+
+def call(serve, run_async, responses, delay=0.0, deadline=None, **kwargs):
+    app, requests = openai_app(responses, delay)
+
+    async def main():
+        async with serve(app) as base:
+            llm = client(base, **kwargs)
+            try:
+                return await llm.complete("key", MESSAGES, "gpt-test", deadline=deadline), llm
+            except LLMError as e:
+                return e, llm
+
+    result, llm = run_async(main())
+    return result, requests, llm
+
+
+def test_completion_keeps_model_and_usage(serve, run_async):
+    result, requests, _ = call(serve, run_async, [completion("Scores", model="gpt-test-2024")])
+    assert result == "Scores"
+    assert result.model == "gpt-test-2024"
+    assert result.usage["total_tokens"] == 15
+    assert requests[0]["messages"] == MESSAGES
+
+
+def test_rate_limit_is_retried_after_the_reported_wait(serve, run_async, monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_BACKOFF_BASE", 0.01)
+    result, requests, _ = call(serve, run_async, [RATE_LIMITED, completion()])
+    assert result == "ok"
+    assert len(requests) == 2
+
+
+def test_exhausted_quota_is_not_retried(serve, run_async):
+    quota = (429, {"error": {"code": "insufficient_quota"}}, {})
+    result, requests, _ = call(serve, run_async, [quota, completion()])
+    assert isinstance(result, LLMRateLimitError)
+    assert result.retryable is False
+    assert len(requests) == 1
+
+
+def test_client_errors_are_not_retried(serve, run_async):
+    result, requests, _ = call(serve, run_async, [(400, {"error": "bad request"}, {}), completion()])
+    assert isinstance(result, LLMError)
+    assert result.status == 400
+    assert len(requests) == 1
+
+
+def test_server_errors_are_retried_up_to_max_retries(serve, run_async):
+    result, requests, _ = call(serve, run_async, [(503, {"error": "overloaded"}, {})], max_retries=2)
+    assert isinstance(result, LLMError)
+    assert result.status == 503
+    assert len(requests) == 3
+
+
+def test_deadline_bounds_the_whole_call(serve, run_async):
+    result, _, _ = call(serve, run_async, [completion()], delay=1.0, deadline=0.2)
+    assert isinstance(result, LLMDeadlineError)
+    assert isinstance(result, TimeoutError)
+
+
+def test_expired_deadline_makes_no_request(serve, run_async):
+    result, requests, _ = call(serve, run_async, [completion()], deadline=0)
+    assert isinstance(result, LLMDeadlineError)
+    assert requests == []
+
+
+def test_reported_limits_are_adopted(serve, run_async):
+    headers = {"x-ratelimit-limit-requests": "500", "x-ratelimit-remaining-requests": "499"}
+    status, body, _ = completion()
+    _, _, llm = call(serve, run_async, [(status, body, headers)])
+    assert llm.limiter.requests.capacity == 500
+
+
+@pytest.mark.parametrize("value, seconds", [("1s", 1), ("6m0s", 360), ("20ms", 0.02), ("1h2m", 3720), ("2.5", 2.5), ("", None), ("soon", None)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == (pytest.approx(seconds) if seconds is not None else None)
+
+
+def test_retry_after_prefers_the_explicit_headers():
+    assert retry_after({"retry-after-ms": "250", "retry-after": "3"}) == 0.25
+    assert retry_after({"retry-after": "3"}) == 3
+    assert retry_after({"x-ratelimit-reset-requests": "1s", "x-ratelimit-reset-tokens": "6m0s"}) == 360
+    assert retry_after({}) is None
+
+
+def test_importing_the_client_leaves_the_page_cache_alone():
+    code = "import sys, llm_client; sys.exit('get_documents' in sys.modules or 'page_cache' in sys.modules)"
+    directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, "-c", code], cwd=directory).returncode == 0
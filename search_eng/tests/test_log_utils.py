@@ -0,0 +1,16 @@
+import logging
+
+from log_utils import sampled
+
+
+def test_sampled_needs_the_level_enabled():
+    logger = logging.getLogger("test_log_utils.quiet")
+    logger.setLevel(logging.INFO)
+    assert not sampled(logger, rate=1.0)
+
+
+def test_sampled_follows_the_rate():
+    logger = logging.getLogger("test_log_utils.debug")
+    logger.setLevel(logging.DEBUG)
+    assert sampled(logger, rate=1.0)
+    assert not sampled(logger, rate=0.0)
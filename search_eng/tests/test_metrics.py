@@ -0,0 +1,52 @@
+import pytest
+
+import metrics
+from metrics import Counter, Histogram
+
+
+def test_counter_counts_per_label_set():
+    counter = Counter("test_events_total", "Test events.")
+    counter.inc(cache="page", result="hit")
+    counter.inc(2, result="hit", cache="page")
+    counter.inc(cache="page", result="miss")
+    assert counter.value(cache="page", result="hit") == 3
+    assert counter.value(result="miss", cache="page") == 1
+    assert counter.value(cache="search", result="hit") == 0
+    assert counter.render() == [
+        "# HELP test_events_total Test events.",
+        "# TYPE test_events_total counter",
+        'test_events_total{cache="page",result="hit"} 3',
+        'test_events_total{cache="page",result="miss"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Test latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, stage="llm")
+    assert histogram.render() == [
+        "# HELP test_seconds Test latency.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="llm",le="0.1"} 1',
+        'test_seconds_bucket{stage="llm",le="1"} 2',
+        'test_seconds_bucket{stage="llm",le="+Inf"} 3',
+        'test_seconds_sum{stage="llm"} 5.55',
+        'test_seconds_count{stage="llm"} 3',
+    ]
+
+
+def test_histogram_times_a_block_that_raises():
+    histogram = Histogram("test_block_seconds", "Test block latency.")
+    with pytest.raises(ValueError):
+        with histogram.time(stage="parse"):
+            raise ValueError
+    assert histogram.render()[-1] == 'test_block_seconds_count{stage="parse"} 1'
+
+
+def test_render_includes_the_pipeline_metrics():
+    metrics.stage_seconds.observe(0.2, stage="search")
+    text = metrics.render()
+    assert text.endswith("\n")
+    for name in ("assessment_stage_seconds", "cache_requests_total", "llm_tokens_total", "circuit_breaker_events_total"):
+        assert f"# TYPE {name} " in text
+    assert 'assessment_stage_seconds_count{stage="search"}' in text
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from page_cache import PageCache
+
+
+@pytest.fixture
+def pages(tmp_path):
+    return PageCache(path=str(tmp_path / "pages.sqlite3"), search_ttl=60, page_ttl=60, negative_ttl=60)
+
+
+def test_search_results_round_trip(pages):
+    results = [{"title": "Bottle", "url": "http://shop.test/bottle"}]
+    pages.set_search("Amazon UPC 1", results)
+    assert pages.get_search("Amazon UPC 1") == results
+    assert pages.get_search("Amazon UPC 2") is None
+
+
+def test_expired_search_results_are_not_returned(tmp_path):
+    pages = PageCache(path=str(tmp_path / "pages.sqlite3"), search_ttl=-1)
+    pages.set_search("q", [])
+    assert pages.get_search("q") is None
+
+
+def test_page_keeps_text_and_validators(pages):
+    pages.set_page("http://shop.test/a", "Steel bottle ü", etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    assert pages.get_page("http://shop.test/a") == {
+        "text": "Steel bottle ü",
+        "etag": '"v1"',
+        "last_modified": "Mon, 01 Jan 2024 00:00:00 GMT",
+        "fresh": True,
+    }
+    assert pages.get_page("http://shop.test/b") is None
+
+
+def test_stale_page_is_returned_for_revalidation_and_touched(tmp_path):
+    pages = PageCache(path=str(tmp_path / "pages.sqlite3"), page_ttl=1)
+    pages.set_page("http://shop.test/a", "text")
+    conn = pages._connect()
+    with conn:
+        conn.execute("UPDATE pages SET stored_at = ?", (time.time() - 10,))
+    assert pages.get_page("http://shop.test/a")["fresh"] is False
+    pages.touch_page("http://shop.test/a")
+    assert pages.get_page("http://shop.test/a")["fresh"] is True
+
+
+def test_failures_are_remembered_per_kind_for_the_negative_ttl(tmp_path):
+    pages = PageCache(path=str(tmp_path / "pages.sqlite3"), negative_ttl=60)
+    pages.set_failed("page", "http://shop.test/a")
+    assert pages.has_failed("page", "http://shop.test/a")
+    assert not pages.has_failed("search", "http://shop.test/a")
+
+    expired = PageCache(path=str(tmp_path / "pages.sqlite3"), negative_ttl=-1)
+    assert not expired.has_failed("page", "http://shop.test/a")
+
+
+def test_purge_drops_expired_entries(tmp_path):
+    pages = PageCache(path=str(tmp_path / "pages.sqlite3"), search_ttl=60, page_ttl=60, negative_ttl=60)
+    pages.set_search("old", [])
+    pages.set_page("http://shop.test/old", "text")
+    pages.set_page("http://shop.test/stale", "text")
+    pages.set_failed("page", "http://shop.test/old")
+    conn = pages._connect()
+    with conn:
+        conn.execute("UPDATE searches SET stored_at = ?", (time.time() - 120,))
+        conn.execute("UPDATE pages SET stored_at = ? WHERE url LIKE '%old'", (time.time() - 180,))
+        conn.execute("UPDATE pages SET stored_at = ? WHERE url LIKE '%stale'", (time.time() - 90,))
+        conn.execute("UPDATE failures SET failed_at = ?", (time.time() - 120,))
+    pages.purge()
+
+    assert pages.get_search("old") is None
+    assert pages.get_page("http://shop.test/old") is None
+    # Stale for less than an extra TTL, still kept for revalidation
+    assert pages.get_page("http://shop.test/stale") is not None
+    assert not pages.has_failed("page", "http://shop.test/old")
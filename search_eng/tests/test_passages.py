@@ -0,0 +1,46 @@
+from passages import split_passages, bm25_scores, select_passages, tokenize, CHARS_PER_TOKEN
+
+
+def test_split_keeps_lines_whole():
+    text = "\n".join(["one two three"] * 5 + ["", "four five"])
+    passages = split_passages(text, passage_words=6)
+    assert passages == ["one two three\none two three", "one two three\none two three", "one two three\nfour five"]
+
+
+def test_bm25_ranks_matching_passages_first():
+    passages = ["recycled steel bottle", "customer reviews and ratings", "steel"]
+    scores = bm25_scores(passages, tokenize("recycled steel"))
+    assert scores[0] > scores[2] > scores[1] == 0
+
+
+def test_bm25_of_no_passages():
+    assert bm25_scores([], ["steel"]) == []
+
+
+def test_select_keeps_relevant_passages_in_document_order():
+    documents = [
+        "Add to cart\nCustomer reviews",
+        "Made from recycled materials\nPlastic-free packaging",
+        "Shipping and returns",
+    ]
+    selected = select_passages(documents, title="bottle", token_budget=100)
+    assert selected == "Made from recycled materials\nPlastic-free packaging"
+
+
+def test_select_drops_repeated_passages():
+    documents = ["Organic cotton tote", "Organic cotton tote"]
+    assert select_passages(documents) == "Organic cotton tote"
+
+
+def test_select_stays_within_the_token_budget():
+    documents = ["\n".join(f"recycled packaging line {i} " + "filler " * 60 for i in range(50))]
+    budget = 200
+    selected = select_passages(documents, token_budget=budget)
+    assert selected
+    assert len(selected) <= budget * CHARS_PER_TOKEN
+
+
+def test_title_terms_favour_the_product():
+    documents = ["Recycled steel bottle\n" + "x " * 60, "Recycled cotton shirt\n" + "y " * 60]
+    selected = select_passages(documents, title="steel bottle", token_budget=40)
+    assert selected.startswith("Recycled steel bottle")
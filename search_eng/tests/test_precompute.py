@@ -0,0 +1,69 @@
+import io
+import json
+import asyncio
+
+import pytest
+
+import app
+import precompute
+
+
+def test_read_product_ids_accepts_plain_and_jsonl_lines():
+    lines = ["B001\n", "# comment\n", "\n", '{"upc": "B002"}\n', '{"asin": "B003"}\n', "B001\n", '{"other": 1}\n']
+    assert list(precompute.read_product_ids(lines)) == ["B001", "B002", "B003"]
+
+
+def test_checkpoint_keeps_only_successful_llm_results(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"upc": "done", "subMetrics": {}}),
+        json.dumps({"upc": "failed", "error": "LLM failed"}),
+        json.dumps({"upc": "estimate", "provisional": True}),
+        '{"upc": "cut sh',
+    ]))
+    assert precompute.read_checkpoint(str(path)) == {"done"}
+    assert precompute.read_checkpoint(str(tmp_path / "missing.jsonl")) == set()
+
+
+@pytest.fixture
+def assessed(monkeypatch, cache):
+    calls = []
+
+    async def request_and_cache_sub_metrics(api_key, product_id, deadline=None, on_provisional=None):
+        calls.append(product_id)
+        if product_id.startswith("ERR"):
+            return {"error": "No search results found for the product."}
+        entry = {"subMetrics": {}, "recommendations": [], "provisional": product_id.startswith("EST")}
+        cache.set(product_id, entry)
+        return entry
+
+    monkeypatch.setattr(app, "assessment_cache", cache)
+    monkeypatch.setattr(app.assessment_flights, "cache", cache)
+    monkeypatch.setattr(app, "request_and_cache_sub_metrics", request_and_cache_sub_metrics)
+    return calls
+
+
+def run(product_ids, force=False, concurrency=2):
+    output = io.StringIO()
+    progress = precompute.Progress(len(product_ids), interval=3600)
+    asyncio.run(precompute.precompute(product_ids, output, "key", concurrency, force, progress))
+    records = {json.loads(line)["upc"]: json.loads(line) for line in output.getvalue().splitlines()}
+    return records, progress
+
+
+def test_precompute_writes_one_line_per_product_and_counts_results(assessed, cache):
+    cache.set("CACHED", {"subMetrics": {}, "recommendations": []})
+    records, progress = run(["NEW", "CACHED", "ERR1", "EST1"])
+
+    assert set(records) == {"NEW", "CACHED", "ERR1", "EST1"}
+    assert "error" in records["ERR1"]
+    assert sorted(assessed) == ["ERR1", "EST1", "NEW"]
+    # Estimates stand in for a failed LLM call and are retried on the next run
+    assert (progress.assessed, progress.cached, progress.failed) == (1, 1, 2)
+
+
+def test_force_reassesses_cached_products(assessed, cache):
+    cache.set("CACHED", {"subMetrics": {}, "recommendations": []})
+    records, progress = run(["CACHED"], force=True)
+    assert assessed == ["CACHED"]
+    assert progress.assessed == 1
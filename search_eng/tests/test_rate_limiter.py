@@ -0,0 +1,97 @@
+import time
+import asyncio
+
+import pytest
+
+from rate_limiter import TokenBucket, RateLimiter
+
+
+def test_bucket_starts_full_and_refills_at_its_rate():
+    bucket = TokenBucket(60)
+    assert bucket.delay(60) == 0.0
+    bucket.take(60)
+    assert bucket.delay(1) == pytest.approx(1.0, abs=0.05)
+    bucket.updated -= 30
+    assert bucket.delay(30) == pytest.approx(0.0, abs=0.05)
+
+
+def test_amounts_above_capacity_wait_for_a_full_bucket():
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.delay(1000) == pytest.approx(60.0, abs=0.1)
+
+
+def test_reported_limit_is_capped_by_the_ceiling():
+    bucket = TokenBucket(100, ceiling=100)
+    bucket.update(50)
+    assert bucket.capacity == 50
+    bucket.update(1000)
+    assert bucket.capacity == 100
+    bucket.update(None, remaining=10)
+    assert bucket.level == pytest.approx(10, abs=1)
+
+
+def test_acquire_waits_for_tokens():
+    limiter = RateLimiter(tokens_per_minute=600)
+
+    async def main():
+        await limiter.acquire(600)
+        start = time.monotonic()
+        await limiter.acquire(2)
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) == pytest.approx(0.2, abs=0.1)
+
+
+def test_acquire_waits_for_requests():
+    limiter = RateLimiter(requests_per_minute=600)
+
+    async def main():
+        for _ in range(600):
+            await limiter.acquire()
+        start = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) == pytest.approx(0.1, abs=0.08)
+
+
+def test_pause_holds_every_caller_back():
+    limiter = RateLimiter()
+
+    async def main():
+        limiter.pause(0.2)
+        start = time.monotonic()
+        await asyncio.gather(limiter.acquire(), limiter.acquire())
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.19
+
+
+def test_unlimited_limiter_never_waits():
+    limiter = RateLimiter()
+
+    async def main():
+        start = time.monotonic()
+        for _ in range(1000):
+            await limiter.acquire(10_000)
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) < 0.5
+
+
+def test_observe_adopts_reported_limits_within_the_configured_ones():
+    limiter = RateLimiter(requests_per_minute=100)
+    limiter.observe(limit_requests=5000, remaining_requests=3, limit_tokens=90_000, remaining_tokens=1000)
+    assert limiter.requests.capacity == 100
+    assert limiter.requests.level == pytest.approx(3, abs=0.1)
+    # Without a configured token limit the provider's is used as reported
+    assert limiter.tokens.capacity == 90_000
+    assert limiter.tokens.level == pytest.approx(1000, abs=10)
+
+
+def test_adjust_charges_the_actual_usage():
+    limiter = RateLimiter(tokens_per_minute=600)
+    limiter.adjust(300)
+    assert limiter.tokens.level == pytest.approx(300, abs=1)
+    RateLimiter().adjust(300)
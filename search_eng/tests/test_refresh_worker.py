@@ -0,0 +1,93 @@
+import asyncio
+
+from refresh_worker import RefreshWorker
+
+
+class Recorder:
+    def __init__(self, delay=0.0, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.done = []
+        self.running = 0
+        self.peak = 0
+
+    async def __call__(self, key, *args):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if key in self.fail:
+                raise RuntimeError("refresh failed")
+            self.done.append((key, args))
+        finally:
+            self.running -= 1
+
+
+def test_most_requested_products_are_refreshed_first():
+    recorder = Recorder()
+    worker = RefreshWorker(recorder, concurrency=1)
+
+    async def main():
+        # Queued before the worker gets to run, so the order is decided by request counts alone
+        for key in ["rare", "popular", "medium", "popular", "medium", "popular"]:
+            worker.enqueue(key, "api-key")
+        while len(recorder.done) < 3:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert recorder.done == [("popular", ("api-key",)), ("medium", ("api-key",)), ("rare", ("api-key",))]
+
+
+def test_concurrency_is_bounded():
+    recorder = Recorder(delay=0.05)
+    worker = RefreshWorker(recorder, concurrency=2)
+
+    async def main():
+        for index in range(6):
+            worker.enqueue(f"P{index}")
+        while len(recorder.done) < 6:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert recorder.peak == 2
+
+
+def test_product_being_refreshed_is_not_queued_again():
+    recorder = Recorder(delay=0.05)
+    worker = RefreshWorker(recorder, concurrency=1)
+
+    async def main():
+        worker.enqueue("A")
+        await asyncio.sleep(0.01)
+        worker.enqueue("A")
+        assert len(worker) == 0
+        while not recorder.done:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert recorder.done == [("A", ())]
+
+
+def test_full_queue_drops_new_products():
+    worker = RefreshWorker(Recorder(), concurrency=1, max_queued=2)
+
+    async def main():
+        for key in "ABC":
+            worker.enqueue(key)
+        return len(worker), set(worker._queued)
+
+    assert asyncio.run(main()) == (2, {"A", "B"})
+
+
+def test_failed_refresh_does_not_stop_the_worker():
+    recorder = Recorder(fail={"bad"})
+    worker = RefreshWorker(recorder, concurrency=1)
+
+    async def main():
+        worker.enqueue("bad")
+        worker.enqueue("good")
+        while not recorder.done:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert recorder.done == [("good", ())]
@@ -0,0 +1,105 @@
+import io
+import gzip
+import json
+import time
+
+import pytest
+
+import app as app_module
+import rescore
+from assessment_parser import METRIC_LABELS, YES_NO_METRICS
+from llm_client import Completion
+from response_archive import ResponseArchive
+
+
+def reply(score=7, leave_out=()):
+    return "\n".join(
+        f"- {label}: {'yes' if key in YES_NO_METRICS else score}"
+        for label, key in METRIC_LABELS.items() if label not in leave_out
+    )
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return ResponseArchive(str(tmp_path / "archive"))
+
+
+def test_records_are_read_back_by_product_and_time(archive):
+    completion = Completion("reply one", model="gpt-test", usage={"total_tokens": 12})
+    first = archive.append("A", completion, "prompt A", "hash-a", title="Bottle")
+    archive.append("B", "reply two", "prompt B", "hash-b")
+    time.sleep(0.01)
+    archive.append("A", "reply three", "prompt A", "hash-a")
+
+    assert [record["completion"] for record in archive.history("A")] == ["reply one", "reply three"]
+    assert archive.history("A", until=first["createdAt"]) == [first]
+    assert first["model"] == "gpt-test"
+    assert first["usage"] == {"total_tokens": 12}
+    assert first["title"] == "Bottle"
+    assert archive.latest("A")["completion"] == "reply three"
+    assert archive.latest("missing") is None
+    assert sorted(record["completion"] for record in archive.latest_records()) == ["reply three", "reply two"]
+
+
+def test_segments_are_gzip_jsonl_and_rotate(tmp_path):
+    archive = ResponseArchive(str(tmp_path / "archive"), segment_bytes=1)
+    for i in range(3):
+        archive.append(f"P{i}", f"reply {i}", "prompt", None)
+    assert len(archive.segments()) == 3
+    with gzip.open(tmp_path / "archive" / archive.segments()[0], "rt", encoding="utf-8") as f:
+        assert json.loads(f.readline())["upc"] == "P0"
+    assert [record["upc"] for record in archive.scan()] == ["P0", "P1", "P2"]
+
+
+def test_scan_stops_at_a_record_cut_short(archive, tmp_path):
+    archive.append("A", "complete", "prompt", None)
+    archive.append("B", "cut short", "prompt", None)
+    path = tmp_path / "archive" / archive.segments()[0]
+    path.write_bytes(path.read_bytes()[:-10])
+    assert [record["upc"] for record in archive.scan()] == ["A"]
+
+
+@pytest.fixture
+def app_cache(cache, monkeypatch):
+    monkeypatch.setattr(app_module, "assessment_cache", cache)
+    return cache
+
+
+def test_regenerate_parses_with_the_follow_up_and_keeps_the_reply_time(archive, app_cache):
+    archive.append("A", reply(), "prompt A", "hash-a", title="Steel bottle", skipped=[])
+    archive.append("B", reply(leave_out=["Water Usage"]), "prompt B", "hash-b", followUp="- Water Usage: 2")
+    archive.append("C", reply(leave_out=["Water Usage"]), "prompt C", "hash-c")
+
+    regenerated, failed = rescore.regenerate(archive.latest_records())
+    assert failed == ["C"]
+    entries = {product_id: entry for product_id, entry, _ in regenerated}
+    assert entries["B"]["subMetrics"]["environmental"]["water"] == 2
+    assert entries["A"]["fingerprint"] == "hash-a"
+    assert entries["A"]["title"] == "Steel bottle"
+
+    assert rescore.store(regenerated) == 2
+    created_at = next(created for product_id, _, created in regenerated if product_id == "A")
+    _, age, partial = app_cache.get_with_age("A")
+    assert age == pytest.approx(time.time() - created_at, abs=1)
+    assert partial is False
+
+
+def test_store_keeps_the_freshness_of_a_reused_prompt(archive, app_cache):
+    archive.append("A", reply(), "prompt A", "hash-a")
+    regenerated, _ = rescore.regenerate(archive.latest_records())
+    (_, entry, _), = regenerated
+    # The reply is an hour old, but a reused prompt refreshed the entry ten minutes ago
+    app_cache.set("A", entry, stored_at=time.time() - 600)
+
+    assert rescore.store([("A", entry, time.time() - 3600)]) == 0
+    assert app_cache.get_with_age("A")[1] == pytest.approx(600, abs=1)
+
+
+def test_write_scores_outputs_one_line_per_product(archive, app_cache):
+    archive.append("A", reply(score=7), "prompt A", "hash-a")
+    regenerated, _ = rescore.regenerate(archive.latest_records())
+    output = io.StringIO()
+    rescore.write_scores(regenerated, None, output)
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines[0]["upc"] == "A"
+    assert lines[0]["environmental"] == 70
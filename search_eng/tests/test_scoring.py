@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import scoring
+from scoring import DEFAULT_WEIGHTS, METRIC_KEYS, SubMetricCatalog
+
+
+def test_missing_weights_take_the_defaults():
+    assert scoring.normalize_weights(None) == scoring.normalize_weights({}) == {
+        category: {name: pytest.approx(value) for name, value in metrics.items()}
+        for category, metrics in DEFAULT_WEIGHTS.items()
+    }
+
+
+def test_each_category_is_rescaled_to_100():
+    normalized = scoring.normalize_weights({"environmental": {"ghg": 1, "material": 1, "water": 0, "packaging": 0, "eol": 2}})
+    assert normalized["environmental"] == {"ghg": 25, "material": 25, "water": 0, "packaging": 0, "eol": 50}
+    for metrics in normalized.values():
+        assert sum(metrics.values()) == pytest.approx(100)
+
+
+def test_missing_metrics_of_a_category_take_their_defaults():
+    normalized = scoring.normalize_weights({"governance": {"local": 0}})
+    expected = {**DEFAULT_WEIGHTS["governance"], "local": 0}
+    total = sum(expected.values())
+    assert normalized["governance"] == {name: pytest.approx(value * 100 / total) for name, value in expected.items()}
+
+
+@pytest.mark.parametrize("weights, message", [
+    ([], "weights must be an object"),
+    ({"social": 5}, "weights.social must be an object"),
+    ({"social": {"labour": -1}}, "weights.social.labour must be a non-negative number"),
+    ({"social": {"labour": "10"}}, "weights.social.labour must be a non-negative number"),
+    ({"social": {"labour": True}}, "weights.social.labour must be a non-negative number"),
+    ({"social": {"labour": float("nan")}}, "weights.social.labour must be a non-negative number"),
+    ({"social": {"labour": float("inf")}}, "weights.social.labour must be a non-negative number"),
+    ({"environmental": {"ghg": 0, "material": 0, "water": 0, "packaging": 0, "eol": 0}}, "weights.environmental must not all be 0"),
+])
+def test_invalid_weights_are_rejected(weights, message):
+    with pytest.raises(ValueError, match=message):
+        scoring.normalize_weights(weights)
+
+
+def test_score_is_the_weighted_mean_times_ten(sub_metrics):
+    scores = scoring.score(sub_metrics(5, environmental_ghg=10), {"environmental": {"ghg": 1, "material": 1, "water": 0, "packaging": 0, "eol": 0}})
+    assert scores["environmental"] == pytest.approx(75)
+    assert scores["social"] == pytest.approx(50)
+    assert scores["governance"] == pytest.approx(50)
+
+
+def test_score_matrix_scores_every_product_against_every_profile(sub_metrics):
+    products = scoring.sub_metric_matrix([sub_metrics(2), sub_metrics(8)])
+    profiles = [DEFAULT_WEIGHTS, {"social": {"labour": 1, "safety": 0, "trade": 0, "sourcing": 0, "community": 0, "health": 0}}]
+    scores = scoring.score_matrix(products, scoring.weights_matrix(profiles))
+    assert scores.shape == (2, 2, 3)
+    np.testing.assert_allclose(scores[0], 20)
+    np.testing.assert_allclose(scores[1], 80)
+
+
+def test_sub_metric_vector_follows_metric_keys(sub_metrics):
+    vector = scoring.sub_metric_vector(sub_metrics(1, governance_innovation=9))
+    assert vector.dtype == np.float32
+    assert vector.shape == (len(METRIC_KEYS),)
+    assert vector[METRIC_KEYS.index(("governance", "innovation"))] == 9
+
+
+def test_catalog_matches_score_catalog(sub_metrics):
+    entries = [(f"P{i}", {"subMetrics": sub_metrics(1 + i % 10, social_trade=10 - i % 10)}) for i in range(40)]
+    catalog = SubMetricCatalog()
+    for product_id, entry in entries:
+        catalog.set(product_id, entry["subMetrics"])
+    profiles = [DEFAULT_WEIGHTS, {"environmental": {"ghg": 100}}]
+    ids, scores = catalog.score(profiles)
+    expected_ids, expected = scoring.score_catalog(entries, profiles)
+    assert ids == expected_ids
+    np.testing.assert_allclose(scores, expected, rtol=1e-6)
+
+
+def test_catalog_set_replaces_a_product_in_place(sub_metrics):
+    catalog = SubMetricCatalog()
+    catalog.set("A", sub_metrics(1))
+    catalog.set("A", scoring.sub_metric_vector(sub_metrics(9)))
+    assert len(catalog) == 1
+    np.testing.assert_array_equal(catalog.matrix, np.full((1, len(METRIC_KEYS)), 9))
+
+
+def test_catalog_remove_keeps_rows_contiguous(sub_metrics):
+    catalog = SubMetricCatalog()
+    for index, product_id in enumerate("ABC"):
+        catalog.set(product_id, sub_metrics(index + 1))
+    catalog.remove("A")
+    catalog.remove("missing")
+    assert catalog.product_ids == ["C", "B"]
+    np.testing.assert_array_equal(catalog.matrix[:, 0], [3, 2])
+    catalog.set("D", sub_metrics(4))
+    assert catalog.product_ids == ["C", "B", "D"]
+    np.testing.assert_array_equal(catalog.matrix[:, 0], [3, 2, 4])
+
+
+def test_empty_catalog_scores_to_an_empty_array():
+    ids, scores = SubMetricCatalog().score([DEFAULT_WEIGHTS])
+    assert ids == []
+    assert scores.shape == (0, 1, 3)
@@ -0,0 +1,74 @@
+import os
+import time
+import runpy
+import asyncio
+import multiprocessing
+
+from assessment_cache import AssessmentCache
+from deadline import ASSESS_DEADLINE_MAX
+from single_flight import SingleFlight
+
+
+SEARCH_ENG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def assess_in_worker(cache_path, runs_path, key):
+    """
+    One server worker process: assesses key through SingleFlight on the shared cache, recording
+    every run of the actual work in runs_path.
+    """
+    cache = AssessmentCache(path=cache_path)
+    flights = SingleFlight(cache, poll_interval=0.02)
+
+    async def work():
+        with open(runs_path, "a") as runs:
+            runs.write(f"{os.getpid()}\n")
+        await asyncio.sleep(0.3)
+        entry = {"subMetrics": None, "assessedBy": os.getpid()}
+        cache.set(key, entry)
+        return entry
+
+    return asyncio.run(flights.do(key, work))
+
+
+def test_workers_sharing_the_cache_assess_a_product_once(tmp_path):
+    cache_path = str(tmp_path / "assessments.sqlite3")
+    runs_path = str(tmp_path / "runs.txt")
+    AssessmentCache(path=cache_path)
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(4) as pool:
+        results = pool.starmap(assess_in_worker, [(cache_path, runs_path, "B0SHARED")] * 4)
+
+    with open(runs_path) as runs:
+        assert len(runs.read().split()) == 1
+    assert len({result["assessedBy"] for result in results}) == 1
+
+
+def test_entries_written_by_one_process_are_read_by_another(tmp_path):
+    path = str(tmp_path / "assessments.sqlite3")
+    writer = AssessmentCache(path=path)
+    reader = AssessmentCache(path=path)
+    writer.set("A", {"subMetrics": None, "title": "Bottle"})
+    assert reader.get("A")["title"] == "Bottle"
+    assert reader._connect().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_gunicorn_config(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setenv("ACCESS_LOG", "")
+    config = runpy.run_path(os.path.join(SEARCH_ENG_DIR, "gunicorn.conf.py"))
+    assert config["workers"] == 3
+    assert config["worker_class"] == "uvicorn_worker.UvicornWorker"
+    # Each worker opens its own loop, session and SQLite connections
+    assert config["preload_app"] is False
+    assert config["timeout"] > ASSESS_DEADLINE_MAX
+    assert config["accesslog"] is None
+
+
+def test_lease_expiry_uses_wall_clock_time(tmp_path):
+    # Leases are compared across processes, so they must not use a per-process monotonic clock
+    cache = AssessmentCache(path=str(tmp_path / "assessments.sqlite3"))
+    cache.acquire_lease("A", "w1", 60)
+    (expires_at,) = cache._connect().execute("SELECT expires_at FROM leases").fetchone()
+    assert abs(expires_at - (time.time() + 60)) < 5
@@ -0,0 +1,129 @@
+import time
+import asyncio
+
+from single_flight import SingleFlight
+
+
+class Worker(SingleFlight):
+    """
+    SingleFlight with a fixed owner, standing in for another server process sharing the cache.
+    """
+
+    def __init__(self, owner, cache=None, **kwargs):
+        super().__init__(cache, **kwargs)
+        self._owner = owner
+
+    @property
+    def owner(self):
+        return self._owner
+
+
+def counting(cache, key, entry, delay=0.0):
+    calls = []
+
+    async def work():
+        calls.append(time.monotonic())
+        await asyncio.sleep(delay)
+        if cache is not None:
+            cache.set(key, entry)
+        return entry
+
+    return work, calls
+
+
+def test_concurrent_calls_share_one_run():
+    flights = SingleFlight()
+    work, calls = counting(None, "A", {"score": 1}, delay=0.05)
+
+    async def main():
+        return await asyncio.gather(*(flights.do("A", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"score": 1}] * 5
+    assert len(calls) == 1
+    assert flights._inflight == {}
+
+
+def test_a_caller_giving_up_does_not_cancel_the_work():
+    flights = SingleFlight()
+    work, calls = counting(None, "A", {"score": 1}, delay=0.1)
+
+    async def main():
+        impatient = asyncio.ensure_future(flights.do("A", work))
+        patient = asyncio.ensure_future(flights.do("A", work))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(main()) == {"score": 1}
+
+
+def test_cached_entry_is_returned_without_running(cache):
+    cache.set("A", {"score": 1})
+    work, calls = counting(cache, "A", {"score": 2})
+    assert asyncio.run(Worker("w1", cache).do("A", work)) == {"score": 1}
+    assert calls == []
+
+
+def test_force_runs_despite_a_cached_entry(cache):
+    cache.set("A", {"score": 1})
+    work, calls = counting(cache, "A", {"score": 2})
+    assert asyncio.run(Worker("w1", cache).do("A", work, force=True)) == {"score": 2}
+    assert len(calls) == 1
+
+
+def test_other_worker_waits_for_the_lease_holder(cache):
+    first = Worker("w1", cache, poll_interval=0.02)
+    second = Worker("w2", cache, poll_interval=0.02)
+    work, calls = counting(cache, "A", {"score": 1}, delay=0.2)
+
+    async def main():
+        holder = asyncio.ensure_future(first.do("A", work))
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(holder, second.do("A", work))
+
+    assert asyncio.run(main()) == [{"score": 1}, {"score": 1}]
+    assert len(calls) == 1
+
+
+def test_lease_is_renewed_while_the_work_outlives_its_ttl(cache):
+    first = Worker("w1", cache, lease_ttl=0.3, poll_interval=0.02)
+    second = Worker("w2", cache, lease_ttl=0.3, poll_interval=0.02)
+    work, calls = counting(cache, "A", {"score": 1}, delay=1.0)
+
+    async def main():
+        holder = asyncio.ensure_future(first.do("A", work))
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(holder, second.do("A", work))
+
+    assert asyncio.run(main()) == [{"score": 1}, {"score": 1}]
+    assert len(calls) == 1
+
+
+def test_lease_of_a_dead_worker_is_taken_over(cache):
+    cache.acquire_lease("A", "crashed", 0.2)
+    work, calls = counting(cache, "A", {"score": 1})
+    start = time.monotonic()
+    assert asyncio.run(Worker("w1", cache, poll_interval=0.02).do("A", work)) == {"score": 1}
+    assert len(calls) == 1
+    assert calls[0] - start >= 0.15
+
+
+def test_lease_is_released_after_the_work(cache):
+    work, _ = counting(cache, "A", {"score": 1})
+    asyncio.run(Worker("w1", cache).do("A", work))
+    assert cache.acquire_lease("A", "w2", 60)
+
+
+def test_forced_waiter_takes_the_new_result_not_the_old_entry(cache):
+    cache.set("A", {"score": 1})
+    first = Worker("w1", cache, poll_interval=0.02)
+    second = Worker("w2", cache, poll_interval=0.02)
+    work, calls = counting(cache, "A", {"score": 2}, delay=0.2)
+
+    async def main():
+        holder = asyncio.ensure_future(first.do("A", work, force=True))
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(holder, second.do("A", work, force=True))
+
+    assert asyncio.run(main()) == [{"score": 2}, {"score": 2}]
+    assert len(calls) == 1
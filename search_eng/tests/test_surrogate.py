@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+import scoring
+import train_surrogate
+from surrogate import SurrogateModel, features, load_surrogate
+from assessment_parser import METRIC_LABELS, YES_NO_METRICS
+
+
+N_FEATURES = 2 ** 10
+
+GREEN = "Recycled stainless steel bottle, plastic free packaging, made locally"
+BROWN = "Single use plastic bottle, shrink wrapped, shipped from overseas"
+
+
+@pytest.fixture
+def examples(sub_metrics):
+    return [(GREEN, sub_metrics(9, social_labour=10))] * 5 + [(BROWN, sub_metrics(2, social_labour=1))] * 5
+
+
+@pytest.fixture
+def model(examples):
+    return SurrogateModel.train(examples, N_FEATURES, epochs=20)
+
+
+def test_features_are_normalized_and_deterministic():
+    indices, values = features(GREEN, N_FEATURES)
+    assert len(indices) == len(values) > 0
+    assert indices.max() < N_FEATURES
+    assert np.linalg.norm(values) == pytest.approx(1)
+    again = features(GREEN, N_FEATURES)
+    assert np.array_equal(indices, again[0]) and np.array_equal(values, again[1])
+    assert len(features("", N_FEATURES)[0]) == 0
+
+
+def test_predictions_have_the_shape_and_range_of_parsed_replies(model):
+    for text in (GREEN, BROWN, "", "completely unrelated words"):
+        predicted = model.predict(text)
+        assert {category: set(metrics) for category, metrics in predicted.items()} == {
+            category: set(metrics) for category, metrics in scoring.DEFAULT_WEIGHTS.items()
+        }
+        for category, name in METRIC_LABELS.values():
+            value = predicted[category][name]
+            assert isinstance(value, int)
+            assert value in (1, 10) if (category, name) in YES_NO_METRICS else 1 <= value <= 10
+
+
+def test_training_separates_the_examples(model):
+    assert model.predict(GREEN)["environmental"]["ghg"] >= 8
+    assert model.predict(BROWN)["environmental"]["ghg"] <= 3
+    assert model.predict(GREEN)["social"]["labour"] == 10
+    assert model.predict(BROWN)["social"]["labour"] == 1
+    assert model.info["examples"] == 10
+
+
+def test_saved_model_loads_back(model, tmp_path):
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = load_surrogate(path)
+    assert loaded.n_features == N_FEATURES
+    assert loaded.info == model.info
+    assert loaded.predict(GREEN) == model.predict(GREEN)
+
+
+def test_missing_or_unreadable_model_loads_as_none(tmp_path):
+    assert load_surrogate(str(tmp_path / "missing.npz")) is None
+    broken = tmp_path / "broken.npz"
+    broken.write_bytes(b"not a model")
+    assert load_surrogate(str(broken)) is None
+
+
+def reply(score):
+    return "\n".join(f"- {label}: {'yes' if key in YES_NO_METRICS else score}" for label, key in METRIC_LABELS.items())
+
+
+def test_examples_are_complete_replies_latest_first_wins():
+    records = [
+        {"upc": "A", "createdAt": 1, "prompt": "text A", "promptHash": "a", "completion": reply(3)},
+        {"upc": "A", "createdAt": 2, "prompt": "text A", "promptHash": "a", "completion": reply(6)},
+        {"upc": "B", "createdAt": 1, "prompt": "text B", "promptHash": "b", "completion": "- Water Usage: 4"},
+        {"upc": "C", "createdAt": 1, "prompt": "", "completion": reply(5)},
+    ]
+    examples = train_surrogate.read_examples(records)
+    assert [(product_id, text) for product_id, text, _ in examples] == [("A", "text A")]
+    assert examples[0][2]["environmental"]["ghg"] == 6
+
+
+def test_held_out_products_are_not_trained_on(sub_metrics):
+    examples = [(f"P{i % 10}", f"text {i}", sub_metrics()) for i in range(40)]
+    train, test = train_surrogate.split_by_product(examples, 0.2, seed=1)
+    assert len(test) == 8 and len(train) == 32
+    test_texts = {text for text, _ in test}
+    held_out = {product_id for product_id, text, _ in examples if text in test_texts}
+    assert len(held_out) == 2
+    assert not any(product_id in held_out for product_id, text, _ in examples if text not in test_texts)
+
+
+def test_model_error_beats_the_average_baseline(model, sub_metrics):
+    error, baseline = train_surrogate.mean_absolute_error(model, [(GREEN, sub_metrics(9, social_labour=10))])
+    assert error.mean() < baseline.mean()
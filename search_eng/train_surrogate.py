@@ -0,0 +1,99 @@
+"""
+Offline training of the surrogate model from the response archive.
+
+Every archived reply that the current parser reads completely becomes one example: the prompt
+(the product's retrieved text) and the 16 sub-metric scores of the reply. A share of the
+products is held out to report the model's mean absolute error next to that of always
+predicting the average, so a model that does not beat the average is easy to spot. The model is
+written to --output, where the server loads it at startup.
+
+Usage (from search_eng/, with the usual archive settings):
+    python train_surrogate.py
+    python train_surrogate.py --epochs 8 --holdout 0.2 --output /srv/models/surrogate_model.npz
+"""
+import os
+import sys
+import random
+import argparse
+
+import numpy as np
+
+import scoring
+from assessment_parser import parse_assessment
+from log_utils import configure_logging
+from response_archive import ResponseArchive
+from surrogate import SurrogateModel, DEFAULT_FEATURES, DEFAULT_MODEL_PATH, target_vector
+
+
+def read_examples(records):
+    """
+    Returns (product_id, prompt, sub_metrics) for every distinct prompt with a complete reply, latest reply first wins.
+    """
+    examples = {}
+    for record in records:
+        if not record.get("prompt"):
+            continue
+        parsed = parse_assessment(record["completion"], record.get("followUp"))
+        if parsed.missing:
+            continue
+        key = record.get("promptHash") or record["prompt"]
+        previous = examples.get(key)
+        if previous is None or previous[0] <= record["createdAt"]:
+            examples[key] = (record["createdAt"], record["upc"], record["prompt"], parsed.sub_metrics)
+    return [example[1:] for example in examples.values()]
+
+
+def split_by_product(examples, holdout, seed):
+    # Whole products are held out, so refreshes of one product cannot end up on both sides
+    products = sorted({product_id for product_id, _, _ in examples})
+    random.Random(seed).shuffle(products)
+    held_out = set(products[:int(len(products) * holdout)])
+    train = [(text, sub_metrics) for product_id, text, sub_metrics in examples if product_id not in held_out]
+    test = [(text, sub_metrics) for product_id, text, sub_metrics in examples if product_id in held_out]
+    return train, test
+
+
+def mean_absolute_error(model, examples):
+    """
+    Returns the model's and the average baseline's mean absolute error per sub-metric, on the 1-10 scale.
+    """
+    predicted = np.stack([scoring.sub_metric_matrix([model.predict(text)])[0] for text, _ in examples])
+    actual = np.stack([target_vector(sub_metrics) for _, sub_metrics in examples])
+    return np.abs(predicted - actual).mean(axis=0), np.abs(model.bias - actual).mean(axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the surrogate sub-metric model on archived LLM replies.")
+    parser.add_argument("--archive", help="Archive directory (default RESPONSE_ARCHIVE_DIR)")
+    parser.add_argument("--output", default=os.getenv("SURROGATE_MODEL_PATH", DEFAULT_MODEL_PATH), help="Model file to write")
+    parser.add_argument("--features", type=int, default=DEFAULT_FEATURES, help="Hashed feature dimensions (a power of 2)")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--holdout", type=float, default=0.1, help="Share of products held out to measure the error")
+    parser.add_argument("--min-examples", type=int, default=200, help="Refuse to write a model trained on fewer examples")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.features & (args.features - 1):
+        parser.error("--features must be a power of 2")
+
+    configure_logging()
+    examples = read_examples(ResponseArchive(args.archive).scan())
+    train, test = split_by_product(examples, args.holdout, args.seed)
+    print(f"{len(examples)} examples, {len(train)} for training, {len(test)} held out", file=sys.stderr)
+    if len(train) < args.min_examples:
+        print(f"Not enough examples to train on (--min-examples {args.min_examples})", file=sys.stderr)
+        sys.exit(1)
+
+    model = SurrogateModel.train(train, args.features, args.epochs, seed=args.seed)
+    if test:
+        error, baseline = mean_absolute_error(model, test)
+        model.info.update(mae=float(error.mean()), baselineMae=float(baseline.mean()))
+        print(f"  {'sub-metric':<26}{'model':>6}{'average':>8}", file=sys.stderr)
+        for (category, name), metric_error, metric_baseline in zip(scoring.METRIC_KEYS, error, baseline):
+            print(f"  {category + '.' + name:<26}{metric_error:>6.2f}{metric_baseline:>8.2f}", file=sys.stderr)
+        print(f"Mean absolute error {error.mean():.2f} (average baseline {baseline.mean():.2f})", file=sys.stderr)
+    model.save(args.output)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
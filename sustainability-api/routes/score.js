@@ -2,13 +2,14 @@
 
 const express = require('express');
 const crypto = require('crypto');
+const { Readable } = require('stream');
 const { get, set } = require('../utils/cache');
-const { fetchScoresForUpc } = require('../services/lcaService'); // It imports the function
+const { fetchScoresForUpc, fetchScoresForBatch } = require('../services/lcaService'); // It imports the function
 const router = express.Router();
 
 router.post('/', async (req, res, next) => {
     try {
-        const { upc, weights } = req.body;
+        const { upc, weights, provisional } = req.body;
         console.log(`Received request for UPC: ${upc}`);
 
         if (!upc) {
@@ -16,7 +17,8 @@ router.post('/', async (req, res, next) => {
         }
 
         const weightsHash = crypto.createHash('md5').update(JSON.stringify(weights || {})).digest('hex');
-        const cacheKey = `score:${upc}:${weightsHash}`;
+        // Provisional requests are cached apart, so they never pick up or hand out another mode's answer
+        const cacheKey = `score:${upc}:${weightsHash}${provisional === true ? ':provisional' : ''}`;
 
         let payload = get(cacheKey);
         if (payload) {
@@ -26,7 +28,12 @@ router.post('/', async (req, res, next) => {
             console.log("No cache hit. Fetching from service for key:", cacheKey);
             // This call correctly passes the whole body object
             payload = await fetchScoresForUpc(req.body);
-            set(cacheKey, payload);
+            // Errors such as LLM rate limits are transient and must not be served from the cache,
+            // provisional estimates are replaced by the full assessment on the next request, and
+            // stale or partial (skipped) payloads by the background refresh the Python server started for them
+            if (!payload.error && !payload.provisional && !payload.stale && !payload.skipped?.length) {
+                set(cacheKey, payload);
+            }
             res.json(payload);
         }
     } catch (err) {
@@ -35,4 +42,23 @@ router.post('/', async (req, res, next) => {
     }
 });
 
+router.post('/batch', async (req, res, next) => {
+    try {
+        const { upcs, weights, stream } = req.body;
+
+        if (!Array.isArray(upcs) || upcs.length === 0) {
+            return res.status(400).json({ error: 'Missing upcs list in body' });
+        }
+
+        // The Python server dedupes and serves its own cache, so the batch is passed straight through
+        const response = await fetchScoresForBatch({ upcs, weights, stream });
+        res.status(response.status);
+        res.set('Content-Type', response.headers.get('content-type'));
+        Readable.fromWeb(response.body).pipe(res);
+    } catch (err) {
+        console.error('Error fetching batch scores:', err);
+        next(err);
+    }
+});
+
 module.exports = router;
\ No newline at end of file
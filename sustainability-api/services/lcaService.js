@@ -4,13 +4,15 @@
 // async function fetchScoresForUpc(upc) {
 
 // AFTER (The corrected version)
-async function fetchScoresForUpc({ upc, weights }) { // <-- The ONLY line that needs to change
+async function fetchScoresForUpc({ upc, weights, provisional }) { // <-- The ONLY line that needs to change
   console.log("Fetching scores for UPC:", upc);
 
   // The rest of the function can now access 'upc' and 'weights' correctly
   const bodyPayload = {
     upc: upc,
     weights: weights,
+    // Lets the Python server answer a cache miss with its quick estimate
+    provisional: provisional === true,
   };
 
   // This fetch call goes to your Python server
@@ -27,4 +29,22 @@ async function fetchScoresForUpc({ upc, weights }) { // <-- The ONLY line that n
   return response.json();
 }
 
-module.exports = { fetchScoresForUpc };
\ No newline at end of file
+// Forwards a batch of UPCs to the Python server. The raw response is returned so
+// NDJSON results can be streamed back to the client as they complete.
+async function fetchScoresForBatch({ upcs, weights, stream }) {
+  console.log(`Fetching scores for batch of ${upcs.length} UPCs`);
+
+  const response = await fetch("http://127.0.0.1:5001/api/assess/batch", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ upcs, weights, stream }),
+  });
+
+  if (!response.ok) {
+    throw new Error(`Python server returned an error: ${response.statusText}`);
+  }
+
+  return response;
+}
+
+module.exports = { fetchScoresForUpc, fetchScoresForBatch };
\ No newline at end of file
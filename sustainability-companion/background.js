@@ -25,7 +25,8 @@ chrome.runtime.onMessage.addListener((msg, sender, sendResponse) => {
                 // 2. Prepare the request body
                 const bodyPayload = {
                     upc: msg.upc,
-                    weights: prefs.weights
+                    weights: prefs.weights,
+                    provisional: msg.provisional === true
                 };
                 
                 console.log(`[Eco] Fetching score for UPC ${msg.upc} with custom weights...`);
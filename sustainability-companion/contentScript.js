@@ -66,9 +66,19 @@ function waitForElement(selector, timeout = 10000) {
   injectSkeleton();
 
 
-  // 5) Fetch the scores
+  // 6) Compute grade & inject UI
+  function renderScores(data) {
+    const { environmentalScore, socialScore, governanceScore, recommendations } = data;
+    const avg = (environmentalScore + socialScore + governanceScore) / 3;
+
+    renderDetailPanel(data, preferredMetric, avg)
+    findAndRenderAlternatives(recommendations, avg);
+  }
+
+  // 5) Fetch the scores. A new product gets a provisional estimate straight away, which is
+  // replaced once the full assessment is ready.
   chrome.runtime.sendMessage(
-    { action: 'fetchScore', upc },
+    { action: 'fetchScore', upc, provisional: true },
     resp => {
       removeSkeleton();
 
@@ -77,13 +87,19 @@ function waitForElement(selector, timeout = 10000) {
         return;
       }
       console.log('✅ [Eco] Score data:', resp.data);
-
-      // 6) Compute grade & inject UI
-      const { environmentalScore, socialScore, governanceScore, recommendations } = resp.data;
-      const avg = (environmentalScore + socialScore + governanceScore) / 3;
-
-      renderDetailPanel(resp.data, preferredMetric, avg)
-      findAndRenderAlternatives(recommendations, avg);
+      renderScores(resp.data);
+
+      if (resp.data.provisional) {
+        chrome.runtime.sendMessage({ action: 'fetchScore', upc }, final => {
+          if (!final?.success || final.data.error) {
+            console.warn('⚠️ [Eco] Keeping the provisional scores:', final?.error || final?.data?.error);
+            return;
+          }
+          console.log('✅ [Eco] Final score data:', final.data);
+          document.getElementById('eco-detail')?.remove();
+          renderScores(final.data);
+        });
+      }
     }
   );
 })();
@@ -174,7 +190,7 @@ function renderDetailPanel(data, focus, avg) {
   ).join('')}
       </div>
       <small class="meta">
-        Source: ${data.source} • Updated: ${new Date(data.fetchedAt).toLocaleDateString()}
+        Source: ${data.provisional ? 'provisional estimate' : data.source} • Updated: ${new Date(data.fetchedAt).toLocaleDateString()}
       </small>
 
       <div id="eco-alts"></div>